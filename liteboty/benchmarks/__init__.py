@@ -0,0 +1,5 @@
+"""
+LiteBoty 基准测试
+
+各子模块提供 run() 返回结果行（dict 列表），也可通过 python -m liteboty.benchmarks.<name> 直接运行。
+"""
@@ -0,0 +1,59 @@
+"""消息载荷压缩的传输字节数与 CPU 开销对比"""
+import time
+
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from liteboty.core.message import Message, MessageType
+from liteboty.core.compression import available_compressors, get_compressor
+
+
+def sample_payloads() -> Dict[str, Message]:
+    """典型载荷：原始 BGR 相机帧、ReLU 后的 float32 特征图、检测结果 JSON"""
+    rng = np.random.default_rng(0)
+    height, width = 480, 640
+    gradient = np.linspace(0, 200, width, dtype=np.float32)[None, :, None]
+    frame = (gradient + rng.integers(0, 4, (height, width, 3))).astype(np.uint8)
+    feature_map = np.maximum(rng.standard_normal((64, 135, 240), dtype=np.float32), 0)
+    detections = [
+        {"label": "person", "score": round(float(score), 4), "bbox": [int(v) for v in box]}
+        for score, box in zip(rng.random(200), rng.integers(0, 1920, (200, 4)))
+    ]
+    return {
+        "frame_640x480_u8": Message(frame, MessageType.NUMPY),
+        "feature_map_64x135x240_f32": Message(feature_map, MessageType.NUMPY),
+        "detections_json_200": Message(detections, MessageType.JSON),
+    }
+
+
+def _best_of(func, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run(repeat: int = 5, compressors: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    rows = []
+    for payload_name, message in sample_payloads().items():
+        for name in [None] + (compressors or available_compressors()):
+            compressor = get_compressor(name) if name else None
+            encoded = Message.encode(message, compression=compressor, compression_threshold=0)
+            encode_s = _best_of(lambda: Message.encode(message, compression=compressor, compression_threshold=0), repeat)
+            decode_s = _best_of(lambda: Message.decode(encoded).data, repeat)
+            rows.append({
+                "payload": payload_name,
+                "compression": name or "none",
+                "bytes": len(encoded),
+                "encode_ms": round(encode_s * 1000, 3),
+                "decode_ms": round(decode_s * 1000, 3),
+            })
+    return rows
+
+
+if __name__ == "__main__":
+    for row in run():
+        print("{payload:<30} {compression:<6} {bytes:>12} B  encode {encode_ms:>9.3f} ms  decode {decode_ms:>9.3f} ms".format(**row))
@@ -0,0 +1,114 @@
+"""Message.encode / Message.decode 吞吐与内存分配：全部 MessageType，载荷从 100 B 到 50 MB"""
+import time
+import tracemalloc
+
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from liteboty.core.codecs import available_codecs
+from liteboty.core.message import Message, MessageType
+
+PAYLOAD_SIZES = {
+    "100B": 100,
+    "10KB": 10 * 1024,
+    "1MB": 1 << 20,
+    "10MB": 10 << 20,
+    "50MB": 50 << 20,
+}
+# 单个用例的计时预算（秒），大载荷在达到预算后提前结束重复
+TIME_BUDGET = 2.0
+
+
+def sample_payload(msg_type: MessageType, nbytes: int) -> Any:
+    """构造序列化后约为 nbytes 的载荷"""
+    rng = np.random.default_rng(0)
+    if msg_type == MessageType.JSON:
+        # 每条检测结果序列化后约 64 字节
+        count = max(1, nbytes // 64)
+        scores = rng.random(count).round(4).tolist()
+        boxes = rng.integers(0, 1920, (count, 4)).tolist()
+        return [{"id": i, "label": "person", "score": s, "bbox": b} for i, (s, b) in enumerate(zip(scores, boxes))]
+    if msg_type == MessageType.NUMPY:
+        return rng.standard_normal(max(1, nbytes // 4), dtype=np.float32)
+    # IMAGE 载荷为已编码的图像字节，与 BINARY 一样按不透明字节处理
+    return rng.integers(0, 256, nbytes, dtype=np.uint8).tobytes()
+
+
+def _measure(func: Callable[[], Any], repeat: int) -> Tuple[float, float, int]:
+    """返回 (最短耗时, 平均耗时, 实际重复次数)，超过 TIME_BUDGET 后不再重复"""
+    timings = []
+    deadline = time.perf_counter() + TIME_BUDGET
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+        if time.perf_counter() > deadline:
+            break
+    return min(timings), sum(timings) / len(timings), len(timings)
+
+
+def _peak_allocation(func: Callable[[], Any]) -> int:
+    """单次调用期间新增内存分配的峰值（字节），含 NumPy 缓冲区"""
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        baseline, _ = tracemalloc.get_traced_memory()
+        result = func()
+        _, peak = tracemalloc.get_traced_memory()
+        del result
+    finally:
+        tracemalloc.stop()
+    return peak - baseline
+
+
+def _cases(types: Optional[Sequence[str]], codecs: Optional[Sequence[str]]) -> List[Tuple[MessageType, Optional[str]]]:
+    cases = []
+    for msg_type in MessageType:
+        if types and msg_type.name.lower() not in {t.lower() for t in types}:
+            continue
+        if msg_type == MessageType.JSON:
+            cases.extend((msg_type, codec) for codec in (codecs or available_codecs()))
+        else:
+            cases.append((msg_type, None))
+    return cases
+
+
+def run(repeat: int = 10, sizes: Optional[Sequence[str]] = None, types: Optional[Sequence[str]] = None,
+        codecs: Optional[Sequence[str]] = None, allocations: bool = True) -> List[Dict[str, Any]]:
+    rows = []
+    for size_name in sizes or PAYLOAD_SIZES:
+        nbytes = PAYLOAD_SIZES[size_name]
+        payloads = {}
+        for msg_type, codec in _cases(types, codecs):
+            if msg_type not in payloads:
+                payloads[msg_type] = sample_payload(msg_type, nbytes)
+            message = Message(payloads[msg_type], msg_type, codec=codec)
+
+            encoded = Message.encode(message)
+            encode_best, encode_mean, runs = _measure(lambda: Message.encode(message), repeat)
+            decode_best, decode_mean, _ = _measure(lambda: Message.decode(encoded).data, repeat)
+            row = {
+                "type": msg_type.name,
+                "codec": codec or "-",
+                "size": size_name,
+                "bytes": len(encoded),
+                "runs": runs,
+                "encode_ms": round(encode_best * 1000, 4),
+                "encode_mean_ms": round(encode_mean * 1000, 4),
+                "decode_ms": round(decode_best * 1000, 4),
+                "decode_mean_ms": round(decode_mean * 1000, 4),
+                "encode_mb_s": round(len(encoded) / encode_best / 1e6, 1),
+                "decode_mb_s": round(len(encoded) / decode_best / 1e6, 1),
+            }
+            if allocations:
+                row["encode_alloc_bytes"] = _peak_allocation(lambda: Message.encode(message))
+                row["decode_alloc_bytes"] = _peak_allocation(lambda: Message.decode(encoded).data)
+            rows.append(row)
+    return rows
+
+
+if __name__ == "__main__":
+    for row in run():
+        print("{type:<7} {codec:<8} {size:>5} {bytes:>10} B  encode {encode_ms:>10.4f} ms {encode_mb_s:>8.1f} MB/s  "
+              "decode {decode_ms:>10.4f} ms {decode_mb_s:>8.1f} MB/s".format(**row))
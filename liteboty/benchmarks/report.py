@@ -0,0 +1,49 @@
+"""基准测试结果的 JSON 报告，附带运行环境信息，便于在版本之间比对回归"""
+import json
+import platform
+import time
+
+from typing import Any, Dict, List
+
+REPORT_VERSION = 1
+
+
+def _liteboty_version() -> str:
+    try:
+        from importlib.metadata import version
+        return version("liteboty")
+    except Exception:
+        import liteboty
+        return liteboty.__version__
+
+
+def environment() -> Dict[str, Any]:
+    import numpy as np
+    import cv2
+
+    return {
+        "liteboty": _liteboty_version(),
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+    }
+
+
+def build_report(suites: Dict[str, List[Dict[str, Any]]]) -> Dict[str, Any]:
+    return {
+        "report_version": REPORT_VERSION,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "environment": environment(),
+        "suites": suites,
+    }
+
+
+def write_report(path: str, suites: Dict[str, List[Dict[str, Any]]]) -> Dict[str, Any]:
+    report = build_report(suites)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    return report
@@ -72,3 +72,69 @@ def run(config):
     except KeyboardInterrupt:
         click.echo("Shutting down...")
         asyncio.run(bot.stop())
+
+
+@cli.group()
+def bench():
+    """运行基准测试"""
+    pass
+
+
+def _split_option(value):
+    return [item.strip() for item in value.split(",") if item.strip()] if value else None
+
+
+def _print_rows(title, rows):
+    click.echo(f"== {title} ==")
+    if not rows:
+        return
+    columns = list(rows[0])
+    widths = {col: max(len(col), *(len(str(row.get(col, ""))) for row in rows)) for col in columns}
+    click.echo("  ".join(col.ljust(widths[col]) for col in columns))
+    for row in rows:
+        click.echo("  ".join(str(row.get(col, "")).ljust(widths[col]) for col in columns))
+    click.echo()
+
+
+@bench.command()
+@click.option('--sizes', default=None, help='Comma separated payload sizes, e.g. 100B,1MB (default: all)')
+@click.option('--types', default=None, help='Comma separated message types, e.g. json,numpy (default: all)')
+@click.option('--codecs', default=None, help='Comma separated JSON codecs (default: all available)')
+@click.option('--repeat', default=10, show_default=True, help='Max repetitions per case')
+@click.option('--no-alloc', is_flag=True, help='Skip allocation measurement')
+@click.option('--no-images', is_flag=True, help='Skip cv_convertors image codec benchmark')
+@click.option('--json', 'json_path', default=None, help='Write machine-readable report to this file')
+def codec(sizes, types, codecs, repeat, no_alloc, no_images, json_path):
+    """Message 编解码与图像编解码基准测试"""
+    from liteboty.benchmarks import message_codecs, image_codecs
+    from liteboty.benchmarks.report import write_report
+
+    suites = {
+        "message_codecs": message_codecs.run(
+            repeat=repeat, sizes=_split_option(sizes), types=_split_option(types),
+            codecs=_split_option(codecs), allocations=not no_alloc,
+        ),
+    }
+    if not no_images:
+        suites["image_codecs"] = image_codecs.run(repeat=min(repeat, 5))
+
+    for name, rows in suites.items():
+        _print_rows(name, rows)
+    if json_path:
+        write_report(json_path, suites)
+        click.echo(f"Report written to {json_path}")
+
+
+@bench.command()
+@click.option('--repeat', default=5, show_default=True, help='Repetitions per case')
+@click.option('--json', 'json_path', default=None, help='Write machine-readable report to this file')
+def compression(repeat, json_path):
+    """载荷压缩基准测试"""
+    from liteboty.benchmarks import compression as compression_bench
+    from liteboty.benchmarks.report import write_report
+
+    suites = {"compression": compression_bench.run(repeat=repeat)}
+    _print_rows("compression", suites["compression"])
+    if json_path:
+        write_report(json_path, suites)
+        click.echo(f"Report written to {json_path}")
@@ -3,10 +3,9 @@ import importlib
 import time
 import asyncio
 import logging.config
-import json
 
 from pathlib import Path
-from typing import Optional, Set, List, Tuple
+from typing import Dict, Optional, Set, List, Tuple
 
 import redis.asyncio as aioredis
 
@@ -16,8 +15,15 @@ from watchdog.events import FileSystemEventHandler
 from .config import BotConfig
 from .registry import ServiceRegistry
 from .exceptions import LiteBotyException
-from .utils import get_service_name_from_path
+from .utils import get_service_name_from_path, TimerLoop
 from .process_service import ProcessServiceProxy
+from .service import Service
+from .local_bus import LocalBus
+from .pubsub_hub import PubSubHub
+from .prometheus import MetricsServer, render_metrics
+from .scheduler import OverrunPolicy
+from .heartbeat import write_heartbeats
+from .cluster import NodeRegistry
 
 
 class ConfigFileHandler(FileSystemEventHandler):
@@ -101,10 +107,17 @@ class Bot:
         self.registry = ServiceRegistry()
         self._running = True
 
+        # 进程内总线：同一 Bot 内服务之间直接传递 Message 对象
+        self.local_bus: Optional[LocalBus] = None
+        if self.config.LOCAL_BUS.enabled:
+            self.local_bus = LocalBus(numsub_ttl=self.config.LOCAL_BUS.numsub_ttl)
+
         self.need_to_reload = False
 
         # Add Redis client for service list management
         self.redis_client = None
+        self.connection_pool: Optional[aioredis.ConnectionPool] = None
+        self.pubsub_hub: Optional[PubSubHub] = None
         self._init_redis()
 
         # 设置日志配置
@@ -123,12 +136,21 @@ class Bot:
             30
         )
         self._service_update_task = None
+        # 服务路径 -> 注册表中的服务名
+        self._service_names: Dict[str, str] = {}
+        # 本节点在 Redis 中的服务注册表（每个服务一个哈希字段，服务启停时增量更新）
+        if self.redis_client is not None:
+            self.registry.node_registry = NodeRegistry(self.redis_client, self.config.NODE_ID,
+                                                       ttl=self.service_ttl_seconds)
+        self.metrics_server: Optional[MetricsServer] = None
+        # 本进程内所有服务的心跳由 Bot 合并为一次流水线写入
+        self._heartbeat_timer: Optional[TimerLoop] = None
 
     def _init_redis(self) -> None:
         """Initialize Redis connection for service list management"""
         try:
             redis_config = self.config.REDIS.model_dump()
-            self.redis_client = aioredis.Redis(
+            connection_kwargs = dict(
                 host=redis_config.get('host', 'localhost'),
                 port=redis_config.get('port', 6379),
                 password=redis_config.get('password'),
@@ -137,49 +159,97 @@ class Bot:
                 socket_connect_timeout=redis_config.get('socket_connect_timeout'),
                 decode_responses=redis_config.get('decode_responses', False)
             )
+            if redis_config.get('shared_connections'):
+                # 进程内服务共用一个连接池和一个订阅连接
+                self.connection_pool = aioredis.ConnectionPool(
+                    max_connections=redis_config.get('max_connections'), **connection_kwargs
+                )
+                self.redis_client = aioredis.Redis(connection_pool=self.connection_pool)
+                self.pubsub_hub = PubSubHub(self.redis_client)
+                if self.local_bus is not None:
+                    self.local_bus.hub = self.pubsub_hub
+            else:
+                self.redis_client = aioredis.Redis(**connection_kwargs)
         except Exception as e:
             self.logger.warning(f"Failed to initialize Redis client: {e}")
             self.redis_client = None
 
-    async def _update_service_list_in_redis(self, action: str = "update") -> None:
-        """Update service list in Redis
+    def collect_metrics(self) -> str:
+        """所有服务（包括独立进程中的服务）与 Bot 级组件的 Prometheus 文本格式指标"""
+        snapshots = []
+        for service in self.registry.get_all_services():
+            if hasattr(service, "metrics_snapshot"):
+                try:
+                    snapshots.append(service.metrics_snapshot())
+                except Exception as e:
+                    self.logger.warning(f"Failed to collect metrics from {service.name}: {e}")
+        bot_stats = {
+            "local_bus": self.local_bus.get_stats() if self.local_bus is not None else None,
+            "pubsub_hub": self.pubsub_hub.get_stats() if self.pubsub_hub is not None else None,
+        }
+        return render_metrics(snapshots, bot_stats)
 
-        Args:
-            action: "update" for full update, "remove_all" for cleanup
-        """
-        if not self.redis_client:
+    async def _start_metrics_server(self) -> None:
+        metrics_config = self.config.METRICS
+        if not metrics_config.enabled:
             return
-
+        self.metrics_server = MetricsServer(self.collect_metrics, metrics_config.host, metrics_config.port)
         try:
-            service_key = "liteboty:services"
-
-            if action == "remove_all":
-                await self.redis_client.delete(service_key)
-                self.logger.info("Cleared liteboty service list from Redis")
-                return
+            await self.metrics_server.start()
+        except OSError as e:
+            self.logger.error(f"Failed to start metrics endpoint on {metrics_config.host}:{metrics_config.port}: {e}")
+            self.metrics_server = None
+
+    def _manage_heartbeat(self, service, service_config: dict) -> None:
+        """由 Bot 接管服务的心跳写入（配置了独立 REDIS 的服务仍自己写入）"""
+        if (self.redis_client is not None and self.config.HEARTBEAT.enabled and "REDIS" not in service_config
+                and hasattr(service, "use_bot_heartbeat")):
+            service.use_bot_heartbeat()
+
+    async def _write_heartbeats(self, stopping: bool = False) -> None:
+        """一次流水线写入所有由 Bot 接管心跳的服务的心跳"""
+        payloads = []
+        for service in self.registry.get_all_services():
+            if getattr(service, "_heartbeat_managed", False):
+                payload = service.heartbeat_payload()
+                if stopping:
+                    payload["status"] = "stopping"
+                payloads.append(payload)
+        if not payloads:
+            return
+        try:
+            await write_heartbeats(self.redis_client, payloads, self.config.HEARTBEAT.interval * 2)
+            self.logger.debug(f"Wrote heartbeats for {len(payloads)} services")
+        except Exception as e:
+            self.logger.error(f"心跳发送失败: {e}")
 
-            # Get all services from registry
-            services = self.registry.get_all_services()
-            service_list = []
-
-            for service in services:
-                service_info = {
-                    "name": service.name,
-                    "status": "running" if service._running else "stopped",
-                    "start_time": getattr(service, '_start_time', None),
-                    "uptime": time.time() - getattr(service, '_start_time', time.time()),
-                    "last_update": time.time()
-                }
-                service_list.append(service_info)
-
-            # Store as JSON string in Redis
-            await self.redis_client.set(service_key, json.dumps(service_list))
-            # short TTL so it expires if bot crashes; kept alive by periodic refresh
-            await self.redis_client.expire(service_key, self.service_ttl_seconds)
-            self.logger.debug(f"Updated liteboty service list in Redis: {len(service_list)} services")
+    def _start_heartbeat(self) -> None:
+        heartbeat_config = self.config.HEARTBEAT
+        if self.redis_client is None or not heartbeat_config.enabled:
+            return
+        self._heartbeat_timer = TimerLoop("heartbeat", heartbeat_config.interval, self._write_heartbeats,
+                                          policy=OverrunPolicy.SKIP, jitter=heartbeat_config.jitter)
+        self._heartbeat_timer.start()
 
+    async def _stop_heartbeat(self) -> None:
+        """停止心跳定时器，并为仍在运行的服务写入最终心跳"""
+        if self._heartbeat_timer is None:
+            return
+        task = self._heartbeat_timer.stop()
+        if task is not None:
+            await asyncio.gather(task, return_exceptions=True)
+        self._heartbeat_timer = None
+        await self._write_heartbeats(stopping=True)
+
+    async def _clear_node_registry(self) -> None:
+        """从 Redis 中删除本节点的注册表"""
+        if self.registry.node_registry is None:
+            return
+        try:
+            await self.registry.node_registry.clear()
+            self.logger.info(f"Cleared service registry of node {self.registry.node_registry.node_id} from Redis")
         except Exception as e:
-            self.logger.error(f"Failed to update service list in Redis: {e}")
+            self.logger.error(f"Failed to clear service registry in Redis: {e}")
 
     def set_reload_config(self):
         self.need_to_reload = True
@@ -193,10 +263,10 @@ class Bot:
             await asyncio.sleep(0.5)
 
     async def _service_list_updater(self) -> None:
-        """Periodically refresh service list in Redis to keep TTL alive"""
+        """定期续期本节点注册表的 TTL"""
         while self._running:
             try:
-                await self._update_service_list_in_redis()
+                await self.registry.node_registry.refresh()
             except Exception as e:
                 self.logger.error(f"Service list updater error: {e}")
             await asyncio.sleep(self.service_update_interval)
@@ -254,25 +324,25 @@ class Bot:
                 try:
                     service_name = get_service_name_from_path(service_path)
                     await self.registry.stop_service(service_name)
+                    self._service_names.pop(service_path, None)
                     self.logger.info(f"服务已停止: {service_name}")
                 except Exception as e:
                     self.logger.error(f"关闭服务 {service_path} 失败: {e}")
 
-            # 启动新增的服务（按优先级排序）
-            sorted_services_to_start = sorted(
-                services_to_start,
-                key=lambda s: new_config.SERVICE_PRIORITIES.get(s, 100)
-            )
-
-            for service_path in sorted_services_to_start:
+            # 启动新增的服务：与启动时相同，按优先级、depends_on 分批并发启动，并应用 start_timeout
+            new_service_names = []
+            for service_path in sorted(services_to_start, key=lambda s: new_config.SERVICE_PRIORITIES.get(s, 100)):
                 try:
-                    await self._load_service(service_path)
-                    service_name = get_service_name_from_path(service_path)
-                    if service := self.registry.get_service(service_name):
-                        await service.start()
-                        self.logger.info(f"新服务已启动: {service_name}")
+                    await self._load_service(service_path, new_config)
+                    new_service_names.append(self._service_names[service_path])
                 except Exception as e:
                     self.logger.error(f"启动服务 {service_path} 失败: {e}")
+            if new_service_names:
+                try:
+                    await self.registry.start_services(new_service_names, **self._startup_plan(new_config))
+                    self.logger.info(f"新服务已启动: {new_service_names}")
+                except Exception as e:
+                    self.logger.error(f"启动新服务失败: {e}")
 
             # 重启配置变更的服务
             for service_path in changed_services:
@@ -290,20 +360,58 @@ class Bot:
             self.config = new_config
             self.logger.info("配置重新加载完成")
 
-            # Update service list in Redis after reload
-            await self._update_service_list_in_redis()
-
         except Exception as e:
             self.logger.error(f"重新加载配置失败: {e}")
             import traceback
             self.logger.error(traceback.format_exc())
 
-    async def _load_service(self, service_path: str) -> None:
-        """加载单个服务，支持本地包和标准包，自动注册到 registry"""
+    @staticmethod
+    def _import_service_module(service_path: str):
+        """导入服务包，以 "." 开头的路径从当前工作目录导入"""
+        if service_path.startswith('.'):
+            package_name = service_path.lstrip('.')
+            sys.path.insert(0, str(Path.cwd()))
+            try:
+                return importlib.import_module(package_name)
+            finally:
+                sys.path.pop(0)
+        return importlib.import_module(service_path)
+
+    def _resolve_service_name(self, service_ref: str) -> str:
+        """把配置中的服务路径或名称转换为注册表中的服务名"""
+        if service_ref in self._service_names:
+            return self._service_names[service_ref]
+        ref_name = get_service_name_from_path(service_ref)
+        for service_path, service_name in self._service_names.items():
+            if get_service_name_from_path(service_path) == ref_name:
+                return service_name
+        return service_ref
+
+    def _startup_plan(self, config: Optional[BotConfig] = None) -> dict:
+        """start_all / start_services 的参数：以服务名为键的优先级、依赖与启动超时"""
+        config = config or self.config
+        return {
+            "priorities": {
+                name: config.SERVICE_PRIORITIES.get(path, 100) for path, name in self._service_names.items()
+            },
+            "dependencies": {
+                self._resolve_service_name(path): [self._resolve_service_name(dep) for dep in deps]
+                for path, deps in config.SERVICE_DEPENDENCIES.items() if path in self._service_names
+            },
+            "timeouts": {
+                self._resolve_service_name(path): timeout
+                for path, timeout in config.SERVICE_START_TIMEOUTS.items() if path in self._service_names
+            },
+            "default_timeout": config.SERVICE_START_TIMEOUT,
+        }
+
+    async def _load_service(self, service_path: str, config: Optional[BotConfig] = None) -> None:
+        """加载单个服务，支持本地包和标准包，自动注册到 registry；config 为重新加载时的新配置"""
+        config = config or self.config
         try:
             # 先根据路径取配置与名称
             service_name = get_service_name_from_path(service_path)
-            service_config = self.config.get_service_config(service_name)
+            service_config = config.get_service_config(service_name)
 
             # 若配置要求在独立进程中运行，则注册为进程代理
             if bool(service_config.get("run_in_separate_process", False)):
@@ -311,29 +419,30 @@ class Bot:
                     service_path=service_path,
                     service_name=service_name,
                     config=service_config,
-                    global_config=self.config.model_dump(),
+                    global_config=config.model_dump(),
                 )
+                self._manage_heartbeat(service, service_config)
                 self.registry.register(service)
+                self._service_names[service_path] = service.name
                 self.logger.info(f"Loaded service (process): {service_path}")
                 return
 
             # 否则正常加载为当前进程内服务
-            if service_path.startswith('.'):
-                package_name = service_path.lstrip('.')
-                sys.path.insert(0, str(Path.cwd()))
-                try:
-                    module = importlib.import_module(package_name)
-                finally:
-                    sys.path.pop(0)
-            else:
-                module = importlib.import_module(service_path)
+            module = self._import_service_module(service_path)
 
             if not hasattr(module, "service_entry"):
                 raise ImportError(f"Service 包 {service_path} 必须在 __init__.py 暴露 service_entry")
             service_class = getattr(module, "service_entry")
 
-            service = service_class(config=service_config, global_config=self.config.model_dump())
+            service = service_class(config=service_config, global_config=config.model_dump())
+            if self.local_bus is not None and isinstance(service, Service):
+                service.local_bus = self.local_bus
+            # 配置了独立 REDIS 的服务仍使用自己的连接
+            if self.pubsub_hub is not None and isinstance(service, Service) and "REDIS" not in service_config:
+                service.use_shared_connections(self.redis_client, self.pubsub_hub)
+            self._manage_heartbeat(service, service_config)
             self.registry.register(service)
+            self._service_names[service_path] = service.name
             self.logger.info(f"Loaded service: {service_path}")
 
         except Exception as e:
@@ -346,6 +455,8 @@ class Bot:
         sorted_services = self.config.get_sorted_services()
         self.logger.info(f"Loading services in order: {sorted_services}")
 
+        # 服务包在主线程中按顺序导入：导入时的副作用（signal.signal、get_event_loop 等）只能在主线程执行，
+        # 并发导入还会在共享的 sys.path 上互相干扰
         for service_path in sorted_services:
             try:
                 await self._load_service(service_path)
@@ -355,9 +466,6 @@ class Bot:
                 self.logger.error(traceback.format_exc())
                 continue
 
-        # Update service list in Redis after loading all services
-        await self._update_service_list_in_redis()
-
     async def run(self) -> None:
         """运行机器人"""
         self.logger.info("Starting LiteBoty...")
@@ -365,13 +473,13 @@ class Bot:
         try:
             await self._load_services()
             self.observer.start()
-            await self.registry.start_all()
-
-            # Update service list after all services started
-            await self._update_service_list_in_redis()
+            await self.registry.start_all(**self._startup_plan())
+            self._start_heartbeat()
+            await self._start_metrics_server()
 
-            # start periodic refresh to keep 'liteboty:services' fresh with short TTL
-            self._service_update_task = asyncio.create_task(self._service_list_updater())
+            # 定期续期本节点注册表，Bot 异常退出时注册表在 TTL 后过期
+            if self.registry.node_registry is not None:
+                self._service_update_task = asyncio.create_task(self._service_list_updater())
 
             check_reload_loop = asyncio.create_task(self._check_reload())
 
@@ -390,13 +498,20 @@ class Bot:
             self.logger.info("Shutting down...")
             self.observer.stop()
             self.observer.join()
+            if self.metrics_server is not None:
+                await self.metrics_server.close()
+                self.metrics_server = None
+            await self._stop_heartbeat()
             await self.registry.stop_all()
 
-            # Clean up service list from Redis
-            await self._update_service_list_in_redis(action="remove_all")
+            await self._clear_node_registry()
 
+            if self.pubsub_hub is not None:
+                await self.pubsub_hub.close()
             if self.redis_client:
                 await self.redis_client.aclose()
+            if self.connection_pool is not None:
+                await self.connection_pool.disconnect()
 
             if check_reload_loop is not None:
                 check_reload_loop.cancel()
@@ -414,8 +529,9 @@ class Bot:
                 await self._service_update_task
             except asyncio.CancelledError:
                 pass
+        await self._stop_heartbeat()
         await self.registry.stop_all()
-        await self._update_service_list_in_redis(action="remove_all")
+        await self._clear_node_registry()
 
     def get_loop(self):
         return self._loop
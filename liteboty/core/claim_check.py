@@ -0,0 +1,105 @@
+"""
+Claim-check 模式
+
+超过阈值的载荷只写入一次带 TTL 的 Redis key，pub/sub 上只发布携带 key 的引用消息。
+订阅方通过流水线 GET 取回载荷；同一进程内多个处理函数解析同一引用时共享一次请求，并由一个小型 LRU 缓存去重。
+"""
+import asyncio
+import uuid
+
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set
+
+from .exceptions import CodecError
+
+CLAIM_KEY_PREFIX = "liteboty:claim:"
+DEFAULT_CLAIM_TTL = 60
+DEFAULT_CLAIM_CACHE_SIZE = 32
+
+
+class ClaimExpiredError(CodecError):
+    """引用的载荷已过期或不存在"""
+    pass
+
+
+class _LRUCache:
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._items: "OrderedDict[str, bytes]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[bytes]:
+        value = self._items.get(key)
+        if value is not None:
+            self._items.move_to_end(key)
+        return value
+
+    def put(self, key: str, value: bytes) -> None:
+        self._items[key] = value
+        self._items.move_to_end(key)
+        while len(self._items) > self.maxsize:
+            self._items.popitem(last=False)
+
+
+# 进程内共享的缓存与进行中的请求
+_cache = _LRUCache(DEFAULT_CLAIM_CACHE_SIZE)
+_inflight: Dict[str, asyncio.Future] = {}
+# 每个 Redis 客户端在当前事件循环轮次中待取回的 key，一轮内的请求合并为一个 pipeline
+_pending: Dict[int, List[str]] = {}
+_flush_tasks: Set[asyncio.Task] = set()
+
+
+def new_claim_key() -> str:
+    return f"{CLAIM_KEY_PREFIX}{uuid.uuid4().hex}"
+
+
+def set_claim_cache_size(maxsize: int) -> None:
+    _cache.maxsize = maxsize
+
+
+async def fetch_claim(redis_client, key: str) -> bytes:
+    """取回引用对应的载荷"""
+    cached = _cache.get(key)
+    if cached is not None:
+        return cached
+
+    future = _inflight.get(key)
+    if future is None:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        _inflight[key] = future
+        keys = _pending.setdefault(id(redis_client), [])
+        if not keys:
+            # 在下一轮事件循环中统一发送，期间到达的其他请求合并进同一个 pipeline
+            task = loop.create_task(_flush(redis_client))
+            _flush_tasks.add(task)
+            task.add_done_callback(_flush_tasks.discard)
+        keys.append(key)
+    return await asyncio.shield(future)
+
+
+async def _flush(redis_client) -> None:
+    keys = _pending.pop(id(redis_client), [])
+    if not keys:
+        return
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        for key in keys:
+            pipe.get(key)
+        values = await pipe.execute()
+    except Exception as e:
+        for key in keys:
+            future = _inflight.pop(key, None)
+            if future is not None and not future.done():
+                future.set_exception(e)
+        return
+
+    for key, value in zip(keys, values):
+        future = _inflight.pop(key, None)
+        if value is not None:
+            _cache.put(key, value)
+        if future is None or future.done():
+            continue
+        if value is None:
+            future.set_exception(ClaimExpiredError(f"Claim {key} expired or not found"))
+        else:
+            future.set_result(value)
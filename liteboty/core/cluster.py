@@ -0,0 +1,103 @@
+"""
+节点服务注册表
+
+每个 Bot（节点）在 Redis 中有一个自己的哈希 liteboty:node:{节点 ID}，每个服务一个字段（值为 JSON），
+服务启动、停止、重启时只更新对应字段；定期刷新只续期哈希的 TTL，不重写内容。
+有序集合 liteboty:nodes 记录各节点哈希的过期时间戳（刷新时间 + 该节点的 TTL），cluster_view() 据此合并所有存活节点的服务列表；
+各节点的 TTL 可以不同，清理索引时只删除已过期的节点。
+不同节点写入不同的键，不会互相覆盖。
+"""
+import os
+import json
+import time
+import socket
+
+from typing import Any, Dict, Optional
+
+from .process_service import ProcessServiceProxy
+
+NODE_KEY_PREFIX = "liteboty:node:"
+NODE_INDEX_KEY = "liteboty:nodes"
+DEFAULT_NODE_TTL = 30
+
+
+def default_node_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def service_info(service, status: str) -> Dict[str, Any]:
+    """写入注册表的服务信息，运行时长由读取方根据 start_time 计算"""
+    pid = os.getpid()
+    if isinstance(service, ProcessServiceProxy) and service._process is not None:
+        pid = service._process.pid
+    return {
+        "name": service.name,
+        "status": status,
+        "start_time": getattr(service, "_start_time", None),
+        "pid": pid,
+        "last_update": time.time(),
+    }
+
+
+class NodeRegistry:
+    """本节点在 Redis 中的服务注册表
+
+    Args:
+        redis_client: Redis 客户端
+        node_id: 节点 ID，默认 "主机名:进程号"
+        ttl: 节点哈希的过期时间（秒），需大于刷新间隔；节点异常退出后其服务在 TTL 后从集群视图中消失
+    """
+
+    def __init__(self, redis_client, node_id: Optional[str] = None, ttl: float = DEFAULT_NODE_TTL):
+        self.redis_client = redis_client
+        self.node_id = node_id or default_node_id()
+        self.ttl = int(ttl)
+        self.key = f"{NODE_KEY_PREFIX}{self.node_id}"
+
+    def _touch(self, pipe) -> None:
+        now = time.time()
+        pipe.expire(self.key, self.ttl)
+        pipe.zadd(NODE_INDEX_KEY, {self.node_id: now + self.ttl})
+        pipe.zremrangebyscore(NODE_INDEX_KEY, "-inf", f"({now}")
+
+    async def set_service(self, service, status: str = "running") -> None:
+        """写入（或覆盖）一个服务的字段"""
+        pipe = self.redis_client.pipeline(transaction=False)
+        pipe.hset(self.key, service.name, json.dumps(service_info(service, status)))
+        self._touch(pipe)
+        await pipe.execute()
+
+    async def remove_service(self, service_name: str) -> None:
+        await self.redis_client.hdel(self.key, service_name)
+
+    async def refresh(self) -> None:
+        """续期节点哈希并更新节点索引，不重写服务字段"""
+        pipe = self.redis_client.pipeline(transaction=False)
+        self._touch(pipe)
+        await pipe.execute()
+
+    async def clear(self) -> None:
+        """节点退出时删除自己的哈希与索引项"""
+        pipe = self.redis_client.pipeline(transaction=False)
+        pipe.delete(self.key)
+        pipe.zrem(NODE_INDEX_KEY, self.node_id)
+        await pipe.execute()
+
+
+def _text(value) -> str:
+    return value.decode() if isinstance(value, bytes) else value
+
+
+async def cluster_view(redis_client) -> Dict[str, Dict[str, Dict[str, Any]]]:
+    """合并所有存活（索引中尚未过期）节点的注册表：{节点 ID: {服务名: 服务信息}}"""
+    nodes = [_text(node) for node in await redis_client.zrangebyscore(NODE_INDEX_KEY, time.time(), "+inf")]
+    if not nodes:
+        return {}
+    pipe = redis_client.pipeline(transaction=False)
+    for node in nodes:
+        pipe.hgetall(f"{NODE_KEY_PREFIX}{node}")
+    view = {}
+    for node, fields in zip(nodes, await pipe.execute()):
+        if fields:
+            view[node] = {_text(name): json.loads(value) for name, value in fields.items()}
+    return view
@@ -0,0 +1,129 @@
+import json
+import pickle
+import struct
+
+from typing import Any, Dict, List, Optional, Union
+
+from .exceptions import CodecError
+
+BytesLike = Union[bytes, bytearray, memoryview]
+
+DEFAULT_CODEC = "json"
+
+
+class Codec:
+    """MessageType.JSON 载荷的序列化器基类
+
+    子类需设置 name 并实现 encode / decode。name 会写入消息信封，接收端据此自动选择解码器。
+    """
+    name: str = ""
+
+    def encode(self, obj: Any) -> BytesLike:
+        raise NotImplementedError
+
+    def encode_parts(self, obj: Any) -> List[BytesLike]:
+        """返回若干段缓冲区，由 Message 在拼接信封时一次性拷贝；默认只有一段"""
+        return [self.encode(obj)]
+
+    def decode(self, data: memoryview) -> Any:
+        raise NotImplementedError
+
+
+class JsonCodec(Codec):
+    name = "json"
+
+    def encode(self, obj: Any) -> bytes:
+        return json.dumps(obj).encode("utf-8")
+
+    def decode(self, data: memoryview) -> Any:
+        return json.loads(bytes(data))
+
+
+class OrjsonCodec(Codec):
+    name = "orjson"
+
+    def __init__(self):
+        import orjson
+        self._orjson = orjson
+
+    def encode(self, obj: Any) -> bytes:
+        return self._orjson.dumps(obj, option=self._orjson.OPT_SERIALIZE_NUMPY)
+
+    def decode(self, data: memoryview) -> Any:
+        return self._orjson.loads(data)
+
+
+class MsgpackCodec(Codec):
+    name = "msgpack"
+
+    def __init__(self):
+        import msgpack
+        self._packer = msgpack.Packer(use_bin_type=True)
+        self._msgpack = msgpack
+
+    def encode(self, obj: Any) -> bytes:
+        return self._packer.pack(obj)
+
+    def decode(self, data: memoryview) -> Any:
+        return self._msgpack.unpackb(data, raw=False)
+
+
+class PickleCodec(Codec):
+    """pickle protocol 5，大块缓冲区（如 np.ndarray）以 out-of-band 方式传输，不经过 pickle 流拷贝
+
+    帧格式: count(uint32) + 各段长度(uint64 * count) + pickle 流 + out-of-band 缓冲区。
+    pickle 反序列化可以执行任意代码，因此默认不注册，只能在可信网络中通过 register_codec 显式启用。
+    """
+    name = "pickle5"
+
+    def encode(self, obj: Any) -> bytes:
+        return b"".join(self.encode_parts(obj))
+
+    def encode_parts(self, obj: Any) -> List[BytesLike]:
+        buffers = []
+        stream = pickle.dumps(obj, protocol=5, buffer_callback=buffers.append)
+        raws = [buffer.raw() for buffer in buffers]
+        lengths = [len(stream)] + [raw.nbytes for raw in raws]
+        header = struct.pack(f"<I{len(lengths)}Q", len(lengths), *lengths)
+        return [header, stream, *raws]
+
+    def decode(self, data: memoryview) -> Any:
+        count, = struct.unpack_from("<I", data)
+        lengths = struct.unpack_from(f"<{count}Q", data, 4)
+        pos = 4 + 8 * count
+        segments = []
+        for length in lengths:
+            segments.append(data[pos:pos + length])
+            pos += length
+        return pickle.loads(segments[0], buffers=segments[1:])
+
+
+_CODECS: Dict[str, Codec] = {}
+
+
+def register_codec(codec: Codec, name: Optional[str] = None) -> None:
+    """注册编解码器，同名注册会覆盖已有实现"""
+    name = name or codec.name
+    if not name:
+        raise CodecError(f"Codec {codec!r} has no name")
+    _CODECS[name] = codec
+
+
+def get_codec(name: Optional[str] = None) -> Codec:
+    """按名称获取编解码器，name 为空时返回默认的 json"""
+    try:
+        return _CODECS[name or DEFAULT_CODEC]
+    except KeyError:
+        raise CodecError(f"Unknown codec: {name}") from None
+
+
+def available_codecs() -> List[str]:
+    return list(_CODECS)
+
+
+register_codec(JsonCodec())
+for _optional_codec in (OrjsonCodec, MsgpackCodec):
+    try:
+        register_codec(_optional_codec())
+    except ImportError:
+        pass
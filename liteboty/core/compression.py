@@ -0,0 +1,113 @@
+import zlib
+
+from functools import lru_cache
+from typing import Dict, List, Optional, Union
+
+from .exceptions import CodecError
+
+BytesLike = Union[bytes, bytearray, memoryview]
+
+# 载荷小于该字节数时不压缩，压缩小消息通常得不偿失
+DEFAULT_COMPRESSION_THRESHOLD = 4096
+
+
+class Compressor:
+    """消息载荷压缩器基类
+
+    子类需设置 name 并实现 compress / decompress。name 会写入消息信封，接收端据此自动解压。
+    """
+    name: str = ""
+    default_level: Optional[int] = None
+
+    def __init__(self, level: Optional[int] = None):
+        self.level = self.default_level if level is None else level
+
+    def compress(self, data: BytesLike) -> bytes:
+        raise NotImplementedError
+
+    def decompress(self, data: memoryview) -> bytes:
+        raise NotImplementedError
+
+
+class ZlibCompressor(Compressor):
+    name = "zlib"
+    default_level = 1
+
+    def compress(self, data: BytesLike) -> bytes:
+        return zlib.compress(data, self.level)
+
+    def decompress(self, data: memoryview) -> bytes:
+        return zlib.decompress(data)
+
+
+class Lz4Compressor(Compressor):
+    name = "lz4"
+    default_level = 0
+
+    def __init__(self, level: Optional[int] = None):
+        super().__init__(level)
+        import lz4.frame
+        self._lz4 = lz4.frame
+
+    def compress(self, data: BytesLike) -> bytes:
+        return self._lz4.compress(data, compression_level=self.level, store_size=True)
+
+    def decompress(self, data: memoryview) -> bytes:
+        return self._lz4.decompress(data)
+
+
+class ZstdCompressor(Compressor):
+    name = "zstd"
+    default_level = 1
+
+    def __init__(self, level: Optional[int] = None):
+        super().__init__(level)
+        import zstandard
+        self._compressor = zstandard.ZstdCompressor(level=self.level)
+        self._decompressor = zstandard.ZstdDecompressor()
+
+    def compress(self, data: BytesLike) -> bytes:
+        return self._compressor.compress(data)
+
+    def decompress(self, data: memoryview) -> bytes:
+        return self._decompressor.decompress(data)
+
+
+_COMPRESSORS: Dict[str, Compressor] = {}
+
+
+def register_compressor(compressor: Compressor, name: Optional[str] = None) -> None:
+    """注册压缩器，同名注册会覆盖已有实现"""
+    name = name or compressor.name
+    if not name:
+        raise CodecError(f"Compressor {compressor!r} has no name")
+    _COMPRESSORS[name] = compressor
+    _compressor_with_level.cache_clear()
+
+
+def get_compressor(name: str, level: Optional[int] = None) -> Compressor:
+    """按名称获取压缩器，指定 level 时返回对应压缩级别的实例"""
+    try:
+        compressor = _COMPRESSORS[name]
+    except KeyError:
+        raise CodecError(f"Unknown compressor: {name}") from None
+    if level is None or level == compressor.level:
+        return compressor
+    return _compressor_with_level(name, level)
+
+
+@lru_cache(maxsize=32)
+def _compressor_with_level(name: str, level: int) -> Compressor:
+    return type(_COMPRESSORS[name])(level=level)
+
+
+def available_compressors() -> List[str]:
+    return list(_COMPRESSORS)
+
+
+register_compressor(ZlibCompressor())
+for _optional_compressor in (Lz4Compressor, ZstdCompressor):
+    try:
+        register_compressor(_optional_compressor())
+    except ImportError:
+        pass
@@ -22,6 +22,9 @@ class RedisConfig(BaseModel):
     socket_timeout: Optional[float] = None
     socket_connect_timeout: Optional[float] = None
     decode_responses: bool = False
+    # 进程内服务共用 Bot 的连接池与一个多路复用的订阅连接
+    shared_connections: bool = False
+    max_connections: Optional[int] = None  # 共享连接池的最大连接数
 
 
 class LogConfig(BaseModel):
@@ -33,10 +36,39 @@ class LogConfig(BaseModel):
     backup_count: int = 5
 
 
+class LocalBusConfig(BaseModel):
+    """进程内总线配置"""
+    enabled: bool = False
+    numsub_ttl: float = 1.0  # PUBSUB NUMSUB 结果的缓存时间（秒）
+
+
+class TracingConfig(BaseModel):
+    """链路追踪配置"""
+    enabled: bool = False
+    max_hops: int = 16  # 消息信封中保留的最近发布环节数
+
+
+class MetricsConfig(BaseModel):
+    """Prometheus 指标端点配置"""
+    enabled: bool = False
+    host: str = "127.0.0.1"
+    port: int = 9464
+    child_report_interval: float = 5.0  # 独立进程服务向父进程上报指标的间隔（秒）
+
+
+class HeartbeatConfig(BaseModel):
+    """服务心跳配置"""
+    enabled: bool = True
+    interval: int = 30  # 心跳间隔（秒），心跳键的 TTL 为间隔的 2 倍
+    jitter: float = 0.0  # 每次心跳额外的随机延迟上限（秒）
+
+
 class ServiceItem(BaseModel):
     """服务项配置"""
     enabled: bool = True
     priority: int = 100  # 服务启动优先级，数字越小优先级越高
+    depends_on: List[str] = []  # 依赖的服务（路径或名称），这些服务启动完成后才启动本服务
+    start_timeout: Optional[float] = None  # 启动超时（秒），默认使用 SERVICE_START_TIMEOUT
     config: Dict[str, Any] = {}
 
 
@@ -90,10 +122,16 @@ class BotConfig(BaseSettings):
     version: str = "1.0"
     REDIS: RedisConfig = Field(default_factory=RedisConfig)
     LOGGING: LogConfig = Field(default_factory=LogConfig)
+    LOCAL_BUS: LocalBusConfig = Field(default_factory=LocalBusConfig)
+    TRACING: TracingConfig = Field(default_factory=TracingConfig)
+    METRICS: MetricsConfig = Field(default_factory=MetricsConfig)
+    HEARTBEAT: HeartbeatConfig = Field(default_factory=HeartbeatConfig)
 
     # runtime service list refresh/expiry (seconds)
     SERVICE_LIST_UPDATE_INTERVAL: int = 15
     SERVICE_LIST_TTL_SECONDS: int = 30
+    # 节点 ID，用于 Redis 中的节点注册表 liteboty:node:{NODE_ID}，默认 "主机名:进程号"
+    NODE_ID: Optional[str] = None
 
     # 支持新旧两种配置格式
     SERVICES: Union[List[str], Dict[str, ServiceItem]] = Field(default_factory=list)
@@ -102,6 +140,11 @@ class BotConfig(BaseSettings):
 
     # 服务优先级映射
     SERVICE_PRIORITIES: Dict[str, int] = Field(default_factory=dict)
+    # 服务依赖映射：服务路径 -> 依赖的服务路径或名称
+    SERVICE_DEPENDENCIES: Dict[str, List[str]] = Field(default_factory=dict)
+    # 服务启动超时：服务路径 -> 秒
+    SERVICE_START_TIMEOUTS: Dict[str, float] = Field(default_factory=dict)
+    SERVICE_START_TIMEOUT: Optional[float] = None  # 默认不限制启动时间
 
     @model_validator(mode="before")
     @classmethod
@@ -122,6 +165,8 @@ class BotConfig(BaseSettings):
             service_config = {}
             config_map = {}
             service_priorities = {}
+            service_dependencies = {}
+            service_start_timeouts = {}
 
             for service_path, service_item in services_dict.items():
                 if isinstance(service_item, dict) and service_item.get("enabled", True):
@@ -138,6 +183,11 @@ class BotConfig(BaseSettings):
                     priority = service_item.get("priority", 100)
                     service_priorities[service_path] = priority
 
+                    if service_item.get("depends_on"):
+                        service_dependencies[service_path] = list(service_item["depends_on"])
+                    if service_item.get("start_timeout") is not None:
+                        service_start_timeouts[service_path] = service_item["start_timeout"]
+
                 config_map[service_name] = service_path
 
             # 更新配置
@@ -145,6 +195,8 @@ class BotConfig(BaseSettings):
             values["SERVICE_CONFIG"] = service_config
             values["CONFIG_MAP"] = config_map
             values["SERVICE_PRIORITIES"] = service_priorities
+            values["SERVICE_DEPENDENCIES"] = service_dependencies
+            values["SERVICE_START_TIMEOUTS"] = service_start_timeouts
 
         return values
 
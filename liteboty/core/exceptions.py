@@ -11,3 +11,18 @@ class ServiceError(LiteBotyException):
 class ConfigError(LiteBotyException):
     """配置相关错误"""
     pass
+
+
+class CodecError(LiteBotyException):
+    """消息编解码相关错误"""
+    pass
+
+
+class RPCError(ServiceError):
+    """请求 / 响应错误，响应方处理请求时抛出异常也以此异常返回给请求方"""
+    pass
+
+
+class RPCTimeoutError(RPCError):
+    """请求在超时时间内没有收到响应"""
+    pass
@@ -0,0 +1,56 @@
+"""
+服务心跳
+
+每个服务的心跳写入 liteboty:heartbeat:{服务名}（SET ... EX，TTL 为心跳间隔的 2 倍），
+同时写入有序集合 liteboty:heartbeat:index（成员为服务名，分数为该心跳的过期时间戳，即写入时间 + TTL），
+查询存活服务只需一次 ZRANGEBYSCORE，无需 SCAN 整个键空间。索引由使用不同心跳间隔的多个 Bot 共用，
+每条的过期时间由写入方按自己的 TTL 决定，清理时只删除已过期的条目。
+
+Bot 在一个流水线中写入本进程内所有服务（包括独立进程中运行的服务）的心跳，
+单独使用的 Service 仍由自己的定时器写入。
+"""
+import json
+import time
+
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+HEARTBEAT_KEY_PREFIX = "liteboty:heartbeat:"
+HEARTBEAT_INDEX_KEY = "liteboty:heartbeat:index"
+DEFAULT_HEARTBEAT_INTERVAL = 30
+
+
+def queue_heartbeat(pipe, payload: Dict[str, Any], ttl: float, key_prefix: str = HEARTBEAT_KEY_PREFIX,
+                    index_key: str = HEARTBEAT_INDEX_KEY) -> None:
+    """把一条心跳（SET EX 与索引 ZADD，分数为过期时间）加入流水线"""
+    ttl = max(int(ttl), 1)
+    pipe.set(f"{key_prefix}{payload['name']}", json.dumps(payload), ex=ttl)
+    pipe.zadd(index_key, {payload["name"]: time.time() + ttl})
+
+
+async def write_heartbeats(redis_client, payloads: Iterable[Dict[str, Any]], ttl: float,
+                           key_prefix: str = HEARTBEAT_KEY_PREFIX, index_key: str = HEARTBEAT_INDEX_KEY) -> int:
+    """在一次往返中写入多条心跳，并从索引中清除已过期的服务，返回写入的条数"""
+    pipe = redis_client.pipeline(transaction=False)
+    count = 0
+    for payload in payloads:
+        queue_heartbeat(pipe, payload, ttl, key_prefix, index_key)
+        count += 1
+    pipe.zremrangebyscore(index_key, "-inf", f"({time.time()}")
+    await pipe.execute()
+    return count
+
+
+async def live_services(redis_client, index_key: str = HEARTBEAT_INDEX_KEY) -> List[Tuple[str, float]]:
+    """心跳尚未过期的服务 [(服务名, 心跳过期时间戳), ...]，按过期时间升序"""
+    entries = await redis_client.zrangebyscore(index_key, time.time(), "+inf", withscores=True)
+    return [(name.decode() if isinstance(name, bytes) else name, score) for name, score in entries]
+
+
+async def read_heartbeats(redis_client, names: Iterable[str],
+                          key_prefix: str = HEARTBEAT_KEY_PREFIX) -> Dict[str, Optional[Dict[str, Any]]]:
+    """批量读取心跳内容（一次 MGET），已过期的服务对应 None"""
+    names = list(names)
+    if not names:
+        return {}
+    values = await redis_client.mget([f"{key_prefix}{name}" for name in names])
+    return {name: json.loads(value) if value is not None else None for name, value in zip(names, values)}
@@ -0,0 +1,122 @@
+"""
+进程内消息总线
+
+同一个 Bot 中的服务之间发布消息时，Message 对象直接放入本地订阅（decode=True 的订阅与批量订阅）的入站队列，
+不经过编码、Redis 往返和解码。只有频道上还有其他订阅方（其他进程 / 主机，或 decode=False 的本地订阅）时才同时发布到 Redis，
+远端订阅数通过 PUBSUB NUMSUB 获取并短时缓存。
+
+经 Redis 发布的消息在信封中携带本总线的 origin，本地订阅收到带有自身 origin 的 Redis 消息时直接丢弃，避免重复处理。
+
+每个本地订阅收到 Message 的浅拷贝，metadata 与经 Redis 传输时相同（带 timestamp / version，值均为 str）；
+data（包括 NumPy 数组）与发布方共享，双方都应将其视为只读。
+"""
+import time
+import uuid
+
+from typing import Any, Dict, List, Optional, Tuple
+
+from .message import Message, ORIGIN_ATTRIBUTE
+from .subscription import Subscription
+
+# 原始消息字典中携带已解码 Message 的键（进程内投递，或共享订阅连接上多个订阅共享一次解析）
+LOCAL_MESSAGE_KEY = "local_message"
+DEFAULT_NUMSUB_TTL = 1.0
+
+
+class LocalBus:
+    """Bot 内服务共享的进程内总线
+
+    Args:
+        numsub_ttl: PUBSUB NUMSUB 结果的缓存时间（秒），新的远端订阅方最多在该时间后开始收到消息
+    """
+
+    def __init__(self, numsub_ttl: float = DEFAULT_NUMSUB_TTL):
+        self.origin = uuid.uuid4().hex
+        self.numsub_ttl = numsub_ttl
+        self._subscribers: Dict[str, List[Subscription]] = {}
+        self._numsub_cache: Dict[str, Tuple[float, int]] = {}
+        # Bot 开启共享连接时的 PubSubHub，此时本地订阅在 Redis 上只占用一个订阅连接
+        self.hub = None
+        self.delivered = 0        # 本地投递的消息数
+        self.redis_skipped = 0    # 因没有远端订阅方而省去的 Redis 发布次数
+
+    def register(self, channel: str, subscription: Subscription) -> None:
+        """注册接收 Message 对象的本地订阅，并让其丢弃本总线经 Redis 发出的重复消息"""
+        subscribers = self._subscribers.setdefault(channel, [])
+        if subscription not in subscribers:
+            subscribers.append(subscription)
+        subscription.drop_filter = self.is_own_message
+
+    def unregister(self, channel: str, subscription: Subscription) -> None:
+        subscribers = self._subscribers.get(channel)
+        if subscribers and subscription in subscribers:
+            subscribers.remove(subscription)
+            if not subscribers:
+                del self._subscribers[channel]
+        subscription.drop_filter = None
+
+    def has_subscribers(self, channel: str) -> bool:
+        return bool(self._subscribers.get(channel))
+
+    async def deliver(self, channel: str, message: Any) -> int:
+        """把 Message 的浅拷贝放入频道所有本地订阅的入站队列，返回投递的订阅数"""
+        subscribers = self._subscribers.get(channel)
+        if not subscribers:
+            return 0
+        timestamp = int(time.time() * 1000)
+        for subscription in list(subscribers):
+            # 每个订阅各收到一份与经 Redis 解码结果一致的浅拷贝，修改 metadata 不会影响发布方和其他订阅方
+            await subscription.dispatch({
+                "type": "message",
+                "pattern": None,
+                "channel": channel.encode(),
+                "data": None,
+                LOCAL_MESSAGE_KEY: Message.delivery_copy(message, timestamp),
+            })
+        self.delivered += 1
+        return len(subscribers)
+
+    async def has_remote_subscribers(self, channel: str, redis_client) -> bool:
+        """频道上是否还有本总线之外的 Redis 订阅方"""
+        if self.hub is not None and self.hub.has_raw_subscribers(channel):
+            # 共享连接上 decode=False 的本地订阅只能经 Redis 收到消息
+            return True
+        now = time.monotonic()
+        cached = self._numsub_cache.get(channel)
+        if cached is None or cached[0] <= now:
+            result = await redis_client.pubsub_numsub(channel)
+            count = int(result[0][1]) if result else 0
+            self._numsub_cache[channel] = (now + self.numsub_ttl, count)
+        else:
+            count = cached[1]
+        # 本地订阅的 Redis 订阅连接也计入 NUMSUB：共享连接时只有一个，否则每个订阅各一个
+        if self.hub is not None:
+            local = 1 if self.hub.is_subscribed(channel) else 0
+        else:
+            local = len(self._subscribers.get(channel, ()))
+        remote = count - local
+        if remote <= 0:
+            self.redis_skipped += 1
+        return remote > 0
+
+    def is_own_message(self, raw_message: Dict[str, Any]) -> bool:
+        """Redis 消息是否由本总线发出（已在本地投递过）"""
+        data = raw_message.get("data")
+        if data is None or raw_message.get("type") != "message":
+            return False
+        try:
+            return Message.peek_envelope(data).get(ORIGIN_ATTRIBUTE) == self.origin
+        except Exception:
+            return False
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "channels": {channel: len(subscribers) for channel, subscribers in self._subscribers.items()},
+            "delivered": self.delivered,
+            "redis_skipped": self.redis_skipped,
+        }
+
+
+def local_message(raw_message: Dict[str, Any]) -> Optional[Any]:
+    """原始消息中已解码的 Message，需要自行解码时返回 None"""
+    return raw_message.get(LOCAL_MESSAGE_KEY)
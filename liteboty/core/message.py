@@ -1,14 +1,57 @@
 import json
 import time
+import struct
 
 from enum import Enum
 
 import numpy as np
 
-from typing import Any, Optional, Dict
+from typing import Any, Optional, Dict, Iterable, List, Tuple, Union
 
 from .protos.message_pb2 import Message as ProtoMessage
 from .protos.message_pb2 import Metadata as ProtoMetadata
+from .codecs import Codec, get_codec, DEFAULT_CODEC
+from .compression import Compressor, get_compressor, DEFAULT_COMPRESSION_THRESHOLD
+from .shm import SharedMemoryRing, read_frame
+from .exceptions import CodecError
+
+
+BytesLike = Union[bytes, bytearray, memoryview]
+
+# ProtoMessage.data (field 3, length-delimited) 的 wire tag
+_DATA_FIELD_TAG = b"\x1a"
+
+# NUMPY 帧格式: magic(4) + version(1) + ndim(1) + header_len(2) + shape(int64 * ndim) + dtype_len(1) + dtype + padding
+# header_len 为包含对齐填充在内的帧头总长度，数组数据从 header_len 处开始
+NDARRAY_MAGIC = b"LBND"
+NDARRAY_FRAME_VERSION = 1
+_NDARRAY_PREFIX = struct.Struct("<4sBBH")
+# 数组数据在整个编码消息中的对齐字节数，保证接收端 np.frombuffer 得到对齐的视图
+_NDARRAY_ALIGNMENT = 16
+
+# 由框架写入 metadata.attributes 的信封字段，编码时忽略用户传入的同名键，解码时从 metadata 中移除
+CODEC_ATTRIBUTE = "lb.codec"
+COMPRESSION_ATTRIBUTE = "lb.compression"
+SHM_ATTRIBUTE = "lb.shm"
+CLAIM_ATTRIBUTE = "lb.claim"
+# 发布方进程内总线的标识，用于接收端去重；只对当次发布有效，解码得到的 Message.envelope 中不保留
+ORIGIN_ATTRIBUTE = "lb.origin"
+# 请求 / 响应：请求方的关联 ID 与回复频道，响应方出错时的错误信息
+CORRELATION_ATTRIBUTE = "lb.corr"
+REPLY_TO_ATTRIBUTE = "lb.reply_to"
+ERROR_ATTRIBUTE = "lb.error"
+# 链路追踪：trace ID、经过的发布环节（服务@频道@微秒时间戳，逗号分隔）、本次发布的微秒时间戳
+TRACE_ATTRIBUTE = "lb.trace"
+HOPS_ATTRIBUTE = "lb.hops"
+SENT_AT_ATTRIBUTE = "lb.sent_us"
+# 由框架写入 Message.envelope、编码时原样写出的信封字段
+_PASSTHROUGH_ATTRIBUTES = (ORIGIN_ATTRIBUTE, CORRELATION_ATTRIBUTE, REPLY_TO_ATTRIBUTE, ERROR_ATTRIBUTE,
+                           TRACE_ATTRIBUTE, HOPS_ATTRIBUTE, SENT_AT_ATTRIBUTE)
+# 只对当次发布有效的信封字段，解码后不再随消息转发
+_HOP_ATTRIBUTES = (ORIGIN_ATTRIBUTE,)
+_ENVELOPE_ATTRIBUTES = frozenset(
+    (CODEC_ATTRIBUTE, COMPRESSION_ATTRIBUTE, SHM_ATTRIBUTE, CLAIM_ATTRIBUTE) + _PASSTHROUGH_ATTRIBUTES
+)
 
 
 class MessageType(Enum):
@@ -18,72 +61,425 @@ class MessageType(Enum):
     NUMPY = ProtoMessage.NUMPY
 
 
+def _encode_varint(value: int) -> bytes:
+    out = bytearray()
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+def _read_varint(buf: memoryview, pos: int) -> Tuple[int, int]:
+    result = 0
+    shift = 0
+    while True:
+        byte = buf[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return result, pos
+        shift += 7
+
+
+def _split_envelope(data: BytesLike) -> Tuple[bytes, memoryview]:
+    """将编码后的消息拆分为信封（type + metadata）与 data 字段
+
+    data 字段以 memoryview 的形式返回，不发生拷贝；信封部分很小，交给 protobuf 解析。
+    """
+    view = memoryview(data).cast("B")
+    end = len(view)
+    pos = 0
+    payload = view[0:0]
+    envelope_parts = []
+    while pos < end:
+        field_start = pos
+        tag, pos = _read_varint(view, pos)
+        wire_type = tag & 0x07
+        if wire_type == 0:
+            _, pos = _read_varint(view, pos)
+        elif wire_type == 1:
+            pos += 8
+        elif wire_type == 2:
+            length, pos = _read_varint(view, pos)
+            if tag >> 3 == 3:
+                payload = view[pos:pos + length]
+                pos += length
+                continue
+            pos += length
+        elif wire_type == 5:
+            pos += 4
+        else:
+            raise ValueError(f"Unsupported protobuf wire type: {wire_type}")
+        envelope_parts.append(view[field_start:pos])
+
+    if pos > end:
+        raise ValueError("Truncated message")
+    return b"".join(envelope_parts), payload
+
+
+def _ndarray_frame_header(array: np.ndarray, offset: int) -> bytes:
+    """生成 NUMPY 帧头，offset 为帧在整个编码消息中的起始位置，用于计算对齐填充"""
+    dtype = array.dtype.str.encode("ascii")
+    body = struct.pack(f"<{array.ndim}q", *array.shape) + struct.pack("<B", len(dtype)) + dtype
+    header_len = _NDARRAY_PREFIX.size + len(body)
+    header_len += -(offset + header_len) % _NDARRAY_ALIGNMENT
+    prefix = _NDARRAY_PREFIX.pack(NDARRAY_MAGIC, NDARRAY_FRAME_VERSION, array.ndim, header_len)
+    return (prefix + body).ljust(header_len, b"\x00")
+
+
+def _decode_ndarray(payload: memoryview) -> np.ndarray:
+    """将 NUMPY 帧解码为只读的 np.ndarray 视图"""
+    if payload[:4] != NDARRAY_MAGIC:
+        return _decode_legacy_ndarray(payload)
+
+    _, version, ndim, header_len = _NDARRAY_PREFIX.unpack_from(payload)
+    if version != NDARRAY_FRAME_VERSION:
+        raise ValueError(f"Unsupported ndarray frame version: {version}")
+    pos = _NDARRAY_PREFIX.size
+    shape = struct.unpack_from(f"<{ndim}q", payload, pos)
+    pos += 8 * ndim
+    dtype_len = payload[pos]
+    dtype = np.dtype(bytes(payload[pos + 1:pos + 1 + dtype_len]).decode("ascii"))
+
+    array = np.frombuffer(payload, dtype=dtype, offset=header_len).reshape(shape)
+    array.flags.writeable = False
+    return array
+
+
+def _decode_legacy_ndarray(payload: memoryview) -> np.ndarray:
+    """兼容旧格式: json 头 {"shape": ..., "dtype": ...} 后紧跟数组数据"""
+    meta_end = bytes(payload[:4096]).find(b"}") + 1
+    if meta_end == 0:
+        meta_end = payload.tobytes().find(b"}") + 1
+    array_meta = json.loads(bytes(payload[:meta_end]).decode("utf-8"))
+    array = np.frombuffer(payload, dtype=array_meta["dtype"], offset=meta_end).reshape(array_meta["shape"])
+    array.flags.writeable = False
+    return array
+
+
 class Message:
     def __init__(
             self,
             data: Any,
             msg_type: MessageType,
-            metadata: Optional[Dict] = None
+            metadata: Optional[Dict] = None,
+            codec: Optional[str] = None,
+            envelope: Optional[Dict[str, str]] = None,
     ):
         self.data = data
         self.msg_type = msg_type
         self.metadata = metadata or {}
+        # JSON 类型载荷使用的序列化器名称，None 表示由发布方（如频道配置）决定，最终缺省为 json
+        self.codec = codec
+        # 框架信封字段（lb.*），解码时填充，由框架读写，不属于用户元数据
+        self.envelope = envelope if envelope is not None else {}
+
+    @staticmethod
+    def encode(
+            msg: 'Message',
+            codec: Optional[Union[str, Codec]] = None,
+            compression: Optional[Union[str, Compressor]] = None,
+            compression_threshold: int = DEFAULT_COMPRESSION_THRESHOLD,
+            shm: Optional[SharedMemoryRing] = None,
+    ) -> bytes:
+        """编码消息
+
+        Args:
+            msg: Message 对象
+            codec: JSON 类型载荷的序列化器（名称或 Codec 实例），优先级低于 msg.codec
+            compression: 载荷压缩器（名称或 Compressor 实例），None 表示不压缩
+            compression_threshold: 载荷达到该字节数才压缩
+            shm: 共享内存环形缓冲区，非 JSON 载荷写入其中，消息只携带句柄
+        """
+        if isinstance(compression, str):
+            compression = get_compressor(compression)
+        return Message._encode(
+            msg, ProtoMessage(), int(time.time() * 1000), codec, compression, compression_threshold, shm
+        )
 
     @staticmethod
-    def encode(msg: 'Message') -> bytes:
+    def encode_many(
+            msgs: Iterable['Message'],
+            codec: Optional[Union[str, Codec]] = None,
+            compression: Optional[Union[str, Compressor]] = None,
+            compression_threshold: int = DEFAULT_COMPRESSION_THRESHOLD,
+            shm: Optional[SharedMemoryRing] = None,
+    ) -> List[bytes]:
+        """批量编码消息
+
+        复用同一个 protobuf 对象并共享时间戳，减少逐条编码的对象创建开销。
+        """
+        if codec is not None and not isinstance(codec, Codec):
+            codec = get_codec(codec)
+        if isinstance(compression, str):
+            compression = get_compressor(compression)
         proto_msg = ProtoMessage()
+        timestamp = int(time.time() * 1000)
+        return [
+            Message._encode(msg, proto_msg, timestamp, codec, compression, compression_threshold, shm)
+            for msg in msgs
+        ]
+
+    @staticmethod
+    def decode_many(buffers: Iterable[BytesLike], lazy: bool = False) -> List['Message']:
+        """批量解码消息，lazy 为 True 时返回 LazyMessage 列表"""
+        decode = Message.decode_lazy if lazy else Message.decode
+        return [decode(data) for data in buffers]
+
+    @staticmethod
+    def _encode(
+            msg: 'Message',
+            proto_msg: ProtoMessage,
+            timestamp: int,
+            codec: Optional[Union[str, Codec]] = None,
+            compression: Optional[Compressor] = None,
+            compression_threshold: int = DEFAULT_COMPRESSION_THRESHOLD,
+            shm: Optional[SharedMemoryRing] = None,
+    ) -> bytes:
+        attributes = Message._fill_envelope(msg, proto_msg, timestamp)
+
+        # 处理数据
+        array = None
+        if msg.msg_type == MessageType.NUMPY:
+            array = np.require(msg.data, requirements="C")  # ascontiguousarray 会把 0 维数组变为 (1,)
+            if array.dtype.fields is not None or array.dtype.hasobject:
+                # 帧头只记录 dtype.str，结构化 dtype 会变为 |V<n> 丢失字段，object 数组没有可传输的缓冲区
+                raise CodecError(f"NUMPY messages do not support structured or object dtype: {array.dtype}")
+        elif msg.msg_type == MessageType.JSON:
+            codec = msg.codec or codec
+            if not isinstance(codec, Codec):
+                codec = get_codec(codec)
+            if codec.name != DEFAULT_CODEC:
+                attributes[CODEC_ATTRIBUTE] = codec.name
+            parts = codec.encode_parts(msg.data)
+        elif msg.msg_type == MessageType.IMAGE:
+            parts = [msg.data]
+        else:
+            parts = [msg.data if isinstance(msg.data, (bytes, bytearray, memoryview)) else str(msg.data).encode()]
+
+        # 大帧写入共享内存，信封中只携带句柄；槽位不足时回退为普通传输
+        if shm is not None and msg.msg_type != MessageType.JSON:
+            frame = [_ndarray_frame_header(array, 0), array.reshape(-1).view(np.uint8)] if array is not None else parts
+            handle = shm.write(frame)
+            if handle is not None:
+                attributes[SHM_ATTRIBUTE] = handle
+                return proto_msg.SerializeToString()
+
+        # IMAGE 通常已经是 png/jpeg 等压缩格式，不再二次压缩
+        if compression is not None and msg.msg_type != MessageType.IMAGE:
+            if array is not None:
+                parts = [_ndarray_frame_header(array, 0), array.reshape(-1).view(np.uint8)]
+            length = sum(memoryview(part).nbytes for part in parts)
+            if length >= compression_threshold:
+                compressed = compression.compress(parts[0] if len(parts) == 1 else b"".join(parts))
+                # 压缩无收益时按原样发送
+                if len(compressed) < length:
+                    attributes[COMPRESSION_ATTRIBUTE] = compression.name
+                    envelope = proto_msg.SerializeToString()
+                    return b"".join((envelope, _DATA_FIELD_TAG, _encode_varint(len(compressed)), compressed))
+
+        # 信封只包含 type 和 metadata，data 字段在其后直接按 wire 格式拼接，避免大载荷经过 protobuf 拷贝
+        envelope = proto_msg.SerializeToString()
+
+        if array is not None:
+            return Message._join_ndarray(envelope, array)
+
+        length = sum(memoryview(part).nbytes for part in parts)
+        return b"".join((envelope, _DATA_FIELD_TAG, _encode_varint(length), *parts))
+
+    @staticmethod
+    def _fill_envelope(msg: 'Message', proto_msg: ProtoMessage, timestamp: int):
+        """写入消息类型与元数据，返回 attributes 以便继续写入信封字段"""
+        proto_msg.Clear()
         proto_msg.type = msg.msg_type.value
 
         # 设置元数据
-        metadata = ProtoMetadata()
-        metadata.timestamp = int(time.time() * 1000)  # 毫秒时间戳
+        metadata = proto_msg.metadata
+        metadata.timestamp = timestamp  # 毫秒时间戳
         metadata.version = msg.metadata.get('version', '1.0')
+        attributes = metadata.attributes
         for key, value in msg.metadata.items():
-            metadata.attributes[key] = str(value)
-        proto_msg.metadata.CopyFrom(metadata)
+            if key in _ENVELOPE_ATTRIBUTES:
+                continue
+            attributes[key] = value if type(value) is str else str(value)
+        if msg.envelope:
+            for key in _PASSTHROUGH_ATTRIBUTES:
+                if key in msg.envelope:
+                    attributes[key] = msg.envelope[key]
+        return attributes
 
-        # 处理数据
-        if msg.msg_type == MessageType.JSON:
-            proto_msg.data = json.dumps(msg.data).encode('utf-8')
-        elif msg.msg_type == MessageType.IMAGE:
-            proto_msg.data = msg.data
-        elif msg.msg_type == MessageType.NUMPY:
-            buffer = msg.data.tobytes()
-            shape = msg.data.shape
-            dtype = str(msg.data.dtype)
-            array_meta = json.dumps({
-                'shape': shape,
-                'dtype': dtype
-            }).encode('utf-8')
-            proto_msg.data = array_meta + buffer
-        else:
-            proto_msg.data = msg.data if isinstance(msg.data, bytes) else str(msg.data).encode()
+    @staticmethod
+    def delivery_copy(msg: 'Message', timestamp: Optional[int] = None) -> 'Message':
+        """进程内投递时订阅方收到的消息：与经 Redis 编码再解码得到的 Message 一致的浅拷贝
+
+        metadata 与 _fill_envelope 写入的内容相同（timestamp、version，其余值转为 str），信封只保留随消息转发的字段；
+        data 不复制，与发布方共享。
+        """
+        metadata = {
+            'timestamp': int(time.time() * 1000) if timestamp is None else timestamp,
+            'version': str(msg.metadata.get('version', '1.0')),
+        }
+        for key, value in msg.metadata.items():
+            if key in _ENVELOPE_ATTRIBUTES:
+                continue
+            metadata[key] = value if type(value) is str else str(value)
+        envelope = {
+            key: msg.envelope[key] for key in _PASSTHROUGH_ATTRIBUTES
+            if key in msg.envelope and key not in _HOP_ATTRIBUTES
+        }
+        return Message(msg.data, msg.msg_type, metadata, codec=msg.codec, envelope=envelope)
 
+    @staticmethod
+    def encode_claim(msg: 'Message', key: str) -> bytes:
+        """编码 claim-check 引用消息
+
+        引用消息保留原消息的类型与元数据（可据此路由或丢弃），载荷存放在 Redis 的 key 中，
+        需通过 Service.decode_message 解析。
+        """
+        proto_msg = ProtoMessage()
+        attributes = Message._fill_envelope(msg, proto_msg, int(time.time() * 1000))
+        attributes[CLAIM_ATTRIBUTE] = key
         return proto_msg.SerializeToString()
 
     @staticmethod
-    def decode(data: bytes) -> 'Message':
+    def _join_ndarray(envelope: bytes, array: np.ndarray) -> bytes:
+        """按 NUMPY 帧格式拼接消息，数组数据只在最终 join 时拷贝一次"""
+        offset = len(envelope) + len(_DATA_FIELD_TAG)
+        # varint 长度会影响对齐，迭代直到长度前缀稳定（通常两次）
+        length_prefix = b""
+        while True:
+            header = _ndarray_frame_header(array, offset + len(length_prefix))
+            new_prefix = _encode_varint(len(header) + array.nbytes)
+            if new_prefix == length_prefix:
+                break
+            length_prefix = new_prefix
+        # 以 uint8 视图导出缓冲区，兼容 datetime64 等不支持 buffer 协议的 dtype
+        raw = array.reshape(-1).view(np.uint8)
+        return b"".join((envelope, _DATA_FIELD_TAG, length_prefix, header, raw))
+
+    @staticmethod
+    def decode(data: BytesLike) -> 'Message':
+        msg_type, metadata, envelope, payload = Message._decode_envelope(data)
+        decoded_data = Message._decode_payload(msg_type, payload, envelope)
+        return Message(decoded_data, msg_type, metadata, codec=envelope.get(CODEC_ATTRIBUTE),
+                       envelope=_strip_hop_attributes(envelope))
+
+    @staticmethod
+    def peek_envelope(data: BytesLike) -> Dict[str, str]:
+        """只解析信封，返回框架信封字段（包括 lb.origin 等只对当次发布有效的字段）"""
+        return Message._decode_envelope(data)[2]
+
+    @staticmethod
+    def decode_lazy(data: BytesLike) -> 'LazyMessage':
+        """只解析信封和元数据，data 在首次访问时才反序列化
+
+        适用于只根据 metadata 路由或丢弃消息的场景。
+        """
+        msg_type, metadata, envelope, payload = Message._decode_envelope(data)
+        return LazyMessage(payload, msg_type, metadata, envelope=_strip_hop_attributes(envelope))
+
+    @staticmethod
+    def _decode_envelope(data: BytesLike) -> Tuple[MessageType, Dict, Dict[str, str], memoryview]:
+        """解析信封，返回消息类型、用户元数据、框架信封字段和未解码的载荷"""
+        envelope, payload = _split_envelope(data)
         proto_msg = ProtoMessage()
-        proto_msg.ParseFromString(data)
+        proto_msg.ParseFromString(envelope)
 
         metadata = {
             'timestamp': proto_msg.metadata.timestamp,
             'version': proto_msg.metadata.version,
             **proto_msg.metadata.attributes
         }
+        envelope_attributes = {key: metadata.pop(key) for key in _ENVELOPE_ATTRIBUTES if key in metadata}
 
-        msg_type = MessageType(proto_msg.type)
+        return MessageType(proto_msg.type), metadata, envelope_attributes, payload
 
+    @staticmethod
+    def _decode_payload(msg_type: MessageType, payload: memoryview, envelope: Dict[str, str]) -> Any:
+        if envelope:
+            if CLAIM_ATTRIBUTE in envelope:
+                raise CodecError(
+                    f"Message payload is stored in {envelope[CLAIM_ATTRIBUTE]}, use Service.decode_message to resolve it"
+                )
+            if SHM_ATTRIBUTE in envelope:
+                payload = read_frame(envelope[SHM_ATTRIBUTE])
+            if COMPRESSION_ATTRIBUTE in envelope:
+                payload = memoryview(get_compressor(envelope[COMPRESSION_ATTRIBUTE]).decompress(payload))
         if msg_type == MessageType.JSON:
-            decoded_data = json.loads(proto_msg.data.decode('utf-8'))
-        elif msg_type == MessageType.IMAGE:
-            decoded_data = proto_msg.data
+            return get_codec(envelope.get(CODEC_ATTRIBUTE)).decode(payload)
         elif msg_type == MessageType.NUMPY:
-            meta_end = proto_msg.data.find(b'}') + 1
-            array_meta = json.loads(proto_msg.data[:meta_end].decode('utf-8'))
-            buffer = proto_msg.data[meta_end:]
-            decoded_data = np.frombuffer(buffer, dtype=array_meta['dtype']).reshape(array_meta['shape'])
+            return _decode_ndarray(payload)
         else:
-            decoded_data = proto_msg.data
+            return bytes(payload)
+
+
+def _strip_hop_attributes(envelope: Dict[str, str]) -> Dict[str, str]:
+    for key in _HOP_ATTRIBUTES:
+        envelope.pop(key, None)
+    return envelope
+
+
+class LazyMessage(Message):
+    """延迟解码的消息，由 Message.decode_lazy 创建
+
+    metadata 在创建时即可用，data 在首次访问时解码并缓存，之后释放对原始载荷的引用。
+    """
+    _UNSET = object()
+
+    def __init__(
+            self,
+            payload: memoryview,
+            msg_type: MessageType,
+            metadata: Optional[Dict] = None,
+            envelope: Optional[Dict[str, str]] = None,
+    ):
+        self._payload = payload
+        self._data = self._UNSET
+        # shallow_copy 得到的副本从来源消息取解码结果，载荷只解码一次
+        self._source: Optional['LazyMessage'] = None
+        envelope = envelope or {}
+        super().__init__(self._UNSET, msg_type, metadata, codec=envelope.get(CODEC_ATTRIBUTE), envelope=envelope)
+
+    @property
+    def data(self) -> Any:
+        if self._data is self._UNSET:
+            if self._source is not None:
+                self._data = self._source.data
+                self._source = None
+            else:
+                self._data = Message._decode_payload(self.msg_type, self._payload, self.envelope)
+            self._payload = None
+        return self._data
+
+    @data.setter
+    def data(self, value: Any) -> None:
+        if value is self._UNSET:
+            return
+        self._data = value
+        self._payload = None
+        self._source = None
+
+    def shallow_copy(self) -> 'LazyMessage':
+        """同一条消息交给多个订阅时各自的副本：metadata 与 envelope 各自独立，载荷只解码一次、各副本共享"""
+        copy = LazyMessage(self._payload, self.msg_type, dict(self.metadata), dict(self.envelope))
+        if self.is_decoded:
+            copy._data = self._data
+            copy._payload = None
+        else:
+            copy._source = self
+        return copy
+
+    @property
+    def is_decoded(self) -> bool:
+        return self._data is not self._UNSET
+
+    @property
+    def claim_key(self) -> Optional[str]:
+        """claim-check 引用消息对应的 Redis key，普通消息为 None"""
+        return self.envelope.get(CLAIM_ATTRIBUTE)
 
-        return Message(decoded_data, msg_type, metadata)
+    @property
+    def payload(self) -> Optional[memoryview]:
+        """未解码的原始载荷，解码后为 None；共享内存传输的消息为空"""
+        return self._payload
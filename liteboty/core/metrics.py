@@ -0,0 +1,60 @@
+"""
+运行时指标
+
+Histogram 使用固定的桶边界统计分布，桶的语义与 Prometheus 一致（le: 小于等于边界的累计次数）。
+"""
+from bisect import bisect_left
+from typing import Any, Dict, Sequence
+
+# 批大小桶
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+# 毫秒级耗时桶
+LATENCY_MS_BUCKETS = (0.1, 0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 5000)
+
+
+class Histogram:
+    """固定桶边界的直方图
+
+    Args:
+        buckets: 递增的桶上界，超过最大上界的值计入 +Inf 桶
+    """
+
+    def __init__(self, buckets: Sequence[float] = LATENCY_MS_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self) -> Dict[str, int]:
+        """各桶的累计次数，键为桶上界（最后一个为 +Inf）"""
+        result = {}
+        total = 0
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            result[f"{bound:g}"] = total
+        result["+Inf"] = self.count
+        return result
+
+    def quantile(self, q: float) -> float:
+        """按桶估算分位数，返回对应桶的上界"""
+        if self.count == 0:
+            return 0.0
+        rank = q * self.count
+        total = 0
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            if total >= rank:
+                return float(bound)
+        return float("inf")
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "buckets": self.cumulative(),
+        }
@@ -1,12 +1,36 @@
 import asyncio
 import importlib
 import logging
+import queue
+import socket
 import time
-from multiprocessing import Process, Event
+from multiprocessing import Process, Event, Queue
 from typing import Any, Dict, Optional
 
+DEFAULT_METRICS_REPORT_INTERVAL = 5.0
 
-async def _service_main(service_entry_obj, config: Dict[str, Any], global_config: Dict[str, Any], stop_evt: Event):
+
+def _metrics_interval(global_config: Dict[str, Any]) -> Optional[float]:
+    """全局配置开启 METRICS 时子进程上报指标快照的间隔（秒），未开启时为 None"""
+    metrics = global_config.get("METRICS") or {}
+    if not metrics.get("enabled", False):
+        return None
+    return metrics.get("child_report_interval", DEFAULT_METRICS_REPORT_INTERVAL)
+
+
+def _report_metrics(service, metrics_queue: Optional[Queue]) -> None:
+    if metrics_queue is None or not hasattr(service, "metrics_snapshot"):
+        return
+    try:
+        metrics_queue.put_nowait(service.metrics_snapshot())
+    except queue.Full:
+        pass  # 父进程暂未读取，丢弃本次快照
+    except Exception as e:
+        logging.getLogger("liteboty_default").warning(f"Failed to report metrics: {e}")
+
+
+async def _service_main(service_entry_obj, config: Dict[str, Any], global_config: Dict[str, Any], stop_evt: Event,
+                        metrics_queue: Optional[Queue] = None):
     """
     Run service in child process event loop
     """
@@ -15,18 +39,25 @@ async def _service_main(service_entry_obj, config: Dict[str, Any], global_config
 
     await service.start()
 
+    report_interval = _metrics_interval(global_config)
+    next_report = time.monotonic()
     try:
         # Poll stop event
         while not stop_evt.is_set():
+            if metrics_queue is not None and time.monotonic() >= next_report:
+                _report_metrics(service, metrics_queue)
+                next_report = time.monotonic() + report_interval
             await asyncio.sleep(0.5)
     finally:
         try:
             await service.stop()
         except Exception as e:
             logging.getLogger("liteboty_default").warning(f"service.stop error: {e}")
+        _report_metrics(service, metrics_queue)
 
 
-def _service_worker(service_path: str, config: Dict[str, Any], global_config: Dict[str, Any], stop_evt: Event):
+def _service_worker(service_path: str, config: Dict[str, Any], global_config: Dict[str, Any], stop_evt: Event,
+                    metrics_queue: Optional[Queue] = None):
     """
     Process target: create loop and run service until stop event is set
     """
@@ -34,6 +65,9 @@ def _service_worker(service_path: str, config: Dict[str, Any], global_config: Di
     logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
     logger = logging.getLogger("liteboty_default")
     logger.info(f"Starting child process for service: {service_path}")
+    if metrics_queue is not None:
+        # 父进程未读取时不阻塞子进程退出
+        metrics_queue.cancel_join_thread()
 
     async def runner():
         try:
@@ -53,7 +87,7 @@ def _service_worker(service_path: str, config: Dict[str, Any], global_config: Di
                 raise ImportError(f"Service 包 {service_path} 必须在 __init__.py 暴露 service_entry")
 
             service_entry_obj = getattr(module, "service_entry")
-            await _service_main(service_entry_obj, config, global_config, stop_evt)
+            await _service_main(service_entry_obj, config, global_config, stop_evt, metrics_queue)
 
         except Exception as e:
             logger.error(f"Child process for {service_path} crashed: {e}")
@@ -78,21 +112,79 @@ class ProcessServiceProxy:
         self._running: bool = False
         self._start_time: float = time.time()
         self.logger = logging.getLogger("liteboty_default")
+        # 开启 METRICS 时子进程定期发来的指标快照
+        self._metrics_queue: Optional[Queue] = None
+        self._metrics_task: Optional[asyncio.Task] = None
+        self._last_metrics: Optional[Dict[str, Any]] = None
+        self._heartbeat_managed = False  # 由 Bot 写入心跳时子进程中的服务不再自己写入
 
     async def start(self) -> None:
         if self._running and self._process and self._process.is_alive():
             return
         self._stop_evt = Event()
+        report_interval = _metrics_interval(self.global_config)
+        self._metrics_queue = Queue(maxsize=4) if report_interval is not None else None
         self._process = Process(
             target=_service_worker,
-            args=(self.service_path, self.config, self.global_config, self._stop_evt),
+            args=(self.service_path, self.config, self._child_global_config(), self._stop_evt, self._metrics_queue),
             daemon=True,
         )
         self._process.start()
         self._running = True
         self._start_time = time.time()
+        if self._metrics_queue is not None:
+            self._metrics_task = asyncio.create_task(self._collect_metrics(report_interval))
         self.logger.info(f"Started process for service: {self.name} (pid={self._process.pid})")
 
+    def _child_global_config(self) -> Dict[str, Any]:
+        if not self._heartbeat_managed:
+            return self.global_config
+        return {**self.global_config, "HEARTBEAT": {**(self.global_config.get("HEARTBEAT") or {}), "enabled": False}}
+
+    def use_bot_heartbeat(self) -> None:
+        """改由 Bot 根据子进程状态写入心跳，需在 start() 之前调用"""
+        self._heartbeat_managed = True
+
+    def heartbeat_payload(self) -> Dict[str, Any]:
+        """心跳内容，与 Service.heartbeat_payload 格式一致，pid 为子进程"""
+        now = time.time()
+        running = bool(self._running and self._process and self._process.is_alive())
+        return {
+            "name": self.name,
+            "timestamp": now,
+            "status": "running" if running else "stopping",
+            "uptime": now - self._start_time if running else 0,
+            "host": socket.gethostname(),
+            "pid": self._process.pid if self._process else None,
+        }
+
+    async def _collect_metrics(self, interval: float) -> None:
+        """定期取出子进程发来的快照，只保留最新的一份"""
+        while True:
+            self._drain_metrics()
+            await asyncio.sleep(interval)
+
+    def _drain_metrics(self) -> None:
+        if self._metrics_queue is None:
+            return
+        while True:
+            try:
+                self._last_metrics = self._metrics_queue.get_nowait()
+            except queue.Empty:
+                return
+            except Exception as e:
+                self.logger.warning(f"Failed to read metrics from {self.name}: {e}")
+                return
+
+    def metrics_snapshot(self) -> Dict[str, Any]:
+        """子进程最近一次上报的指标快照，附带进程状态"""
+        self._drain_metrics()
+        snapshot = dict(self._last_metrics or {})
+        snapshot["name"] = self.name
+        snapshot["running"] = bool(self._running and self._process and self._process.is_alive())
+        snapshot["uptime"] = time.time() - self._start_time if snapshot["running"] else 0
+        return snapshot
+
     async def stop(self) -> None:
         if not self._process:
             self._running = False
@@ -101,6 +193,10 @@ class ProcessServiceProxy:
         self._running = False
         if self._stop_evt:
             self._stop_evt.set()
+        if self._metrics_task is not None:
+            self._metrics_task.cancel()
+            await asyncio.gather(self._metrics_task, return_exceptions=True)
+            self._metrics_task = None
 
         # Join with timeout in thread to avoid blocking event loop
         try:
@@ -117,6 +213,7 @@ class ProcessServiceProxy:
                 pass
 
         self.logger.info(f"Stopped process for service: {self.name}")
+        self._drain_metrics()
         self._process = None
         self._stop_evt = None
 
@@ -0,0 +1,200 @@
+"""
+Prometheus 文本格式的指标端点
+
+Bot 开启 METRICS 后在本地监听一个 HTTP 端口，GET /metrics 返回所有服务的指标（text/plain; version=0.0.4）。
+指标来自各服务的 metrics_snapshot()：计数器在消息处理路径上只做整数累加，格式化只在抓取时进行；
+独立进程中的服务（run_in_separate_process）定期把快照发送给父进程，由父进程一并输出。
+"""
+import asyncio
+import logging
+
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+DEFAULT_METRICS_HOST = "127.0.0.1"
+DEFAULT_METRICS_PORT = 9464
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels: Dict[str, Any]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def _number(value: float) -> str:
+    if isinstance(value, float):
+        return str(int(value)) if value.is_integer() else repr(value)
+    return str(value)
+
+
+class MetricsWriter:
+    """按指标族收集样本并输出 Prometheus 文本格式"""
+
+    def __init__(self):
+        self._families: Dict[str, Tuple[str, str, List[str]]] = {}
+
+    def _family(self, name: str, metric_type: str, help_text: str) -> List[str]:
+        family = self._families.get(name)
+        if family is None:
+            family = self._families[name] = (metric_type, help_text, [])
+        return family[2]
+
+    def counter(self, name: str, help_text: str, value: float, **labels) -> None:
+        self._family(name, "counter", help_text).append(f"{name}{_labels(labels)} {_number(value)}")
+
+    def gauge(self, name: str, help_text: str, value: float, **labels) -> None:
+        self._family(name, "gauge", help_text).append(f"{name}{_labels(labels)} {_number(value)}")
+
+    def histogram(self, name: str, help_text: str, histogram: Optional[Dict[str, Any]], scale: float = 1.0,
+                  **labels) -> None:
+        """输出 metrics.Histogram.as_dict() 的结果，scale 用于单位换算（如毫秒换算为秒）"""
+        if not histogram:
+            return
+        samples = self._family(name, "histogram", help_text)
+        for bound, count in histogram["buckets"].items():
+            le = "+Inf" if bound == "+Inf" else f"{float(bound) * scale:g}"
+            samples.append(f"{name}_bucket{_labels({**labels, 'le': le})} {count}")
+        samples.append(f"{name}_sum{_labels(labels)} {_number(histogram['sum'] * scale)}")
+        samples.append(f"{name}_count{_labels(labels)} {histogram['count']}")
+
+    def render(self) -> str:
+        lines = []
+        for name, (metric_type, help_text, samples) in self._families.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+
+def write_service_metrics(writer: MetricsWriter, snapshot: Dict[str, Any]) -> None:
+    """把一个服务的 metrics_snapshot() 写入 writer"""
+    service = snapshot["name"]
+    writer.gauge("liteboty_service_up", "Whether the service is running", 1 if snapshot.get("running") else 0,
+                 service=service)
+    writer.gauge("liteboty_service_uptime_seconds", "Seconds since the service started",
+                 round(snapshot.get("uptime", 0), 3), service=service)
+    writer.counter("liteboty_reconnects_total", "Redis reconnects of the service's own connection",
+                   snapshot.get("reconnects", 0), service=service)
+
+    for channel, stats in (snapshot.get("subscriptions") or {}).items():
+        labels = {"service": service, "channel": channel}
+        writer.counter("liteboty_messages_received_total", "Messages received by a subscription",
+                       stats.get("received", 0), **labels)
+        writer.counter("liteboty_messages_processed_total", "Messages handled successfully",
+                       stats.get("processed", 0), **labels)
+        writer.counter("liteboty_messages_dropped_total", "Messages dropped by the inbound queue overflow policy",
+                       stats.get("dropped", 0), **labels)
+        writer.counter("liteboty_messages_discarded_total", "Queued messages discarded when the subscription stopped",
+                       stats.get("discarded", 0), **labels)
+        writer.counter("liteboty_handler_errors_total", "Handler failures, including decode errors",
+                       stats.get("errors", 0), **labels)
+        writer.counter("liteboty_decode_errors_total", "Messages that failed to decode",
+                       stats.get("decode_errors", 0), **labels)
+        writer.counter("liteboty_received_bytes_total", "Bytes received from Redis",
+                       stats.get("bytes_in", 0), **labels)
+        writer.gauge("liteboty_queue_depth", "Messages waiting in the inbound queue", stats.get("depth", 0), **labels)
+        writer.gauge("liteboty_messages_in_flight", "Messages being handled", stats.get("in_flight", 0), **labels)
+        writer.histogram("liteboty_handler_duration_seconds", "Handler duration (per batch for batch subscriptions)",
+                         stats.get("handler_ms"), scale=0.001, **labels)
+
+    for channel, stats in (snapshot.get("published") or {}).items():
+        labels = {"service": service, "channel": channel}
+        writer.counter("liteboty_messages_published_total", "Messages published", stats["messages"], **labels)
+        writer.counter("liteboty_published_bytes_total", "Encoded bytes published to Redis", stats["bytes"], **labels)
+
+    for timer, stats in (snapshot.get("timers") or {}).items():
+        labels = {"service": service, "timer": timer}
+        writer.counter("liteboty_timer_runs_total", "Timer callback runs", stats.get("runs", 0), **labels)
+        writer.counter("liteboty_timer_overruns_total", "Timer callbacks that took longer than the interval",
+                       stats.get("overruns", 0), **labels)
+        writer.counter("liteboty_timer_skipped_total", "Timer ticks skipped or coalesced after an overrun",
+                       stats.get("skipped", 0), **labels)
+        writer.counter("liteboty_timer_errors_total", "Timer callbacks that raised", stats.get("errors", 0), **labels)
+        writer.histogram("liteboty_timer_lateness_seconds", "Delay between a timer deadline and the callback start",
+                         stats.get("lateness_ms"), scale=0.001, **labels)
+        writer.histogram("liteboty_timer_duration_seconds", "Timer callback duration",
+                         stats.get("duration_ms"), scale=0.001, **labels)
+
+    tracing = snapshot.get("tracing") or {}
+    for channel, stats in (tracing.get("channels") or {}).items():
+        labels = {"service": service, "channel": channel}
+        writer.histogram("liteboty_message_latency_seconds", "Publish to handler start latency",
+                         stats.get("latency_ms"), scale=0.001, **labels)
+        writer.histogram("liteboty_queue_wait_seconds", "Arrival to handler start wait",
+                         stats.get("queue_wait_ms"), scale=0.001, **labels)
+
+
+def render_metrics(snapshots: Iterable[Dict[str, Any]], bot_stats: Optional[Dict[str, Any]] = None) -> str:
+    """输出所有服务快照与 Bot 级统计（进程内总线、共享订阅连接）的 Prometheus 文本"""
+    writer = MetricsWriter()
+    for snapshot in snapshots:
+        write_service_metrics(writer, snapshot)
+    bot_stats = bot_stats or {}
+    local_bus = bot_stats.get("local_bus")
+    if local_bus:
+        writer.counter("liteboty_local_bus_delivered_total", "Messages delivered in-process",
+                       local_bus.get("delivered", 0))
+        writer.counter("liteboty_local_bus_redis_skipped_total", "Redis publishes skipped without remote subscribers",
+                       local_bus.get("redis_skipped", 0))
+    hub = bot_stats.get("pubsub_hub")
+    if hub:
+        writer.counter("liteboty_pubsub_hub_received_total", "Messages read by the shared subscriber connection",
+                       hub.get("received", 0))
+        writer.counter("liteboty_pubsub_hub_reconnects_total", "Reconnects of the shared subscriber connection",
+                       hub.get("reconnects", 0))
+    return writer.render()
+
+
+class MetricsServer:
+    """只支持 GET /metrics 的最小 HTTP 服务
+
+    Args:
+        collect: 返回 Prometheus 文本的函数，每次抓取时调用
+        host: 监听地址，默认只监听本机
+        port: 监听端口
+    """
+
+    def __init__(self, collect: Callable[[], str], host: str = DEFAULT_METRICS_HOST,
+                 port: int = DEFAULT_METRICS_PORT, logger: Optional[logging.Logger] = None):
+        self.collect = collect
+        self.host = host
+        self.port = port
+        self.logger = logger or logging.getLogger("liteboty_default")
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        self.logger.info(f"Metrics endpoint listening on http://{self.host}:{self.port}/metrics")
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            request = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), timeout=5)
+            method, path, *_ = request.split(b"\r\n", 1)[0].decode("latin-1").split(" ")
+            if method != "GET":
+                status, body, content_type = "405 Method Not Allowed", b"", "text/plain"
+            elif path.split("?", 1)[0] in ("/metrics", "/"):
+                status, body, content_type = "200 OK", self.collect().encode(), CONTENT_TYPE
+            else:
+                status, body, content_type = "404 Not Found", b"", "text/plain"
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\nContent-Length: {len(body)}\r\n"
+                f"Connection: close\r\n\r\n".encode() + body
+            )
+            await writer.drain()
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError):
+            pass
+        except Exception as e:
+            self.logger.warning(f"Metrics request failed: {e}")
+        finally:
+            writer.close()
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
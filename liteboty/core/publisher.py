@@ -0,0 +1,140 @@
+"""
+自动批量发布
+
+服务配置 publish_batching 开启后，publish / publish_message / publish_many 不再逐条等待 PUBLISH 往返，
+已编码的消息先放入缓冲区，攒够 max_batch 条或第一条消息等待超过 max_delay_us 微秒后通过一个 pipeline 发送。
+
+- 缓冲区按到达顺序发送，同一时间只有一个 pipeline 在执行，因此同一频道的消息保持发布顺序
+- pipeline 执行期间到达的消息在其完成后立即发送，不再额外等待
+- 每条消息的调用方等待自己的结果，发送失败时在调用方抛出异常
+"""
+import asyncio
+import logging
+
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from .metrics import Histogram, BATCH_SIZE_BUCKETS
+
+DEFAULT_PUBLISH_MAX_BATCH = 64
+DEFAULT_PUBLISH_MAX_DELAY_US = 200
+
+# (频道, Message, 已编码消息, 等待结果的 Future)
+_Pending = Tuple[str, Any, bytes, asyncio.Future]
+
+
+class PublishBatcher:
+    """把并发的发布合并为 Redis pipeline
+
+    Args:
+        pipeline: 创建 pipeline 的函数（每次发送时调用，以使用服务当前的 Redis 连接）
+        queue_publish: 把一条已编码消息加入 pipeline 的函数，签名同 Service._queue_publish
+        max_batch: 一个 pipeline 最多包含的消息数
+        max_delay_us: 第一条消息进入缓冲区后最长等待时间（微秒）
+        logger: 日志器
+    """
+
+    def __init__(self, pipeline: Callable[[], Any], queue_publish: Callable[[Any, str, Any, bytes], None],
+                 max_batch: int = DEFAULT_PUBLISH_MAX_BATCH, max_delay_us: float = DEFAULT_PUBLISH_MAX_DELAY_US,
+                 logger: Optional[logging.Logger] = None):
+        if max_batch < 1:
+            raise ValueError("max_batch must be >= 1")
+        self.pipeline = pipeline
+        self.queue_publish = queue_publish
+        self.max_batch = max_batch
+        self.max_delay_us = max_delay_us
+        self.logger = logger or logging.getLogger("liteboty_default")
+        self._buffer: List[_Pending] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._flush_task: Optional[asyncio.Task] = None
+        self.batches = 0
+        self.messages = 0
+        self.errors = 0
+        self.batch_size = Histogram(BATCH_SIZE_BUCKETS)
+
+    async def publish(self, channel: str, message: Any, data: bytes) -> None:
+        """缓冲一条已编码消息，等待其所在的 pipeline 执行完成，发送失败时抛出异常"""
+        await self.enqueue([(channel, message, data)])[0]
+
+    def enqueue(self, items: Iterable[Tuple[str, Any, bytes]]) -> List[asyncio.Future]:
+        """按顺序缓冲多条已编码消息，返回各自的 Future"""
+        loop = asyncio.get_running_loop()
+        futures = []
+        for channel, message, data in items:
+            future = loop.create_future()
+            self._buffer.append((channel, message, data, future))
+            futures.append(future)
+        if len(self._buffer) >= self.max_batch:
+            self._schedule_flush()
+        elif self._buffer and self._timer is None and not self._flushing():
+            self._timer = loop.call_later(self.max_delay_us / 1e6, self._schedule_flush)
+        return futures
+
+    def _flushing(self) -> bool:
+        return self._flush_task is not None and not self._flush_task.done()
+
+    def _schedule_flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._flushing():
+            self._flush_task = asyncio.get_running_loop().create_task(self._drain())
+
+    async def _drain(self) -> None:
+        # 执行期间新到达的消息在本轮循环中继续发送，保证同一时间只有一个 pipeline
+        while self._buffer:
+            batch = self._buffer[:self.max_batch]
+            del self._buffer[:self.max_batch]
+            await self._execute(batch)
+
+    async def _execute(self, batch: List[_Pending]) -> None:
+        self.batches += 1
+        self.messages += len(batch)
+        self.batch_size.observe(len(batch))
+        try:
+            pipe = self.pipeline()
+            # 一条消息可能对应多条命令（claim-check 的 SET + PUBLISH），记录每条消息的命令区间
+            spans = []
+            for channel, message, data, _ in batch:
+                start = len(pipe)
+                self.queue_publish(pipe, channel, message, data)
+                spans.append((start, len(pipe)))
+            results = await pipe.execute(raise_on_error=False)
+        except Exception as e:
+            self.errors += len(batch)
+            for *_, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (start, end), (*_, future) in zip(spans, batch):
+            error = next((r for r in results[start:end] if isinstance(r, Exception)), None)
+            if error is not None:
+                self.errors += 1
+            if future.done():
+                continue  # 调用方已取消等待
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(None)
+
+    async def flush(self) -> None:
+        """立即发送缓冲区中的全部消息并等待完成"""
+        self._schedule_flush()
+        if self._flush_task is not None:
+            await asyncio.gather(self._flush_task, return_exceptions=True)
+
+    async def close(self) -> None:
+        """服务停止时调用，发送剩余消息"""
+        if self._buffer or self._flushing():
+            await self.flush()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "buffered": len(self._buffer),
+            "batches": self.batches,
+            "messages": self.messages,
+            "errors": self.errors,
+            "max_batch": self.max_batch,
+            "max_delay_us": self.max_delay_us,
+            "batch_size": self.batch_size.as_dict(),
+        }
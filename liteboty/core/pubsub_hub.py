@@ -0,0 +1,149 @@
+"""
+多路复用的 Redis 订阅连接
+
+Bot 开启 REDIS.shared_connections 后，所有进程内服务共用 Bot 的连接池，订阅也共用一个 pub/sub 连接和一个读取任务，
+读取到的消息按频道分发到各服务的订阅队列。多个 decode=True 的订阅共享同一频道时，消息只解析一次，
+各订阅收到各自的 LazyMessage 副本（metadata 与 envelope 互不影响），载荷在首次访问 data 时解码，所有副本共享解码结果。
+"""
+import asyncio
+import logging
+
+from typing import Any, Dict, List, Optional
+
+import redis.asyncio as aioredis
+
+from .message import Message
+from .subscription import Subscription
+from .local_bus import LOCAL_MESSAGE_KEY
+
+
+class PubSubHub:
+    """Bot 内服务共享的 pub/sub 连接
+
+    Args:
+        redis_client: 使用 Bot 连接池的 Redis 客户端
+        logger: 日志器
+    """
+
+    def __init__(self, redis_client: aioredis.Redis, logger: Optional[logging.Logger] = None):
+        self.redis_client = redis_client
+        self.logger = logger or logging.getLogger("liteboty_default")
+        self._pubsub = None
+        self._channels: Dict[str, List[Subscription]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.received = 0
+        self.shared_decodes = 0  # 多个订阅共享一次解析的消息数
+        self.reconnects = 0
+
+    def _get_pubsub(self):
+        if self._pubsub is None:
+            self._pubsub = self.redis_client.pubsub()
+        return self._pubsub
+
+    async def subscribe(self, channel: str, subscription: Subscription) -> None:
+        subscriptions = self._channels.setdefault(channel, [])
+        if subscription in subscriptions:
+            return
+        subscriptions.append(subscription)
+        if len(subscriptions) == 1:
+            await self._get_pubsub().subscribe(channel)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._reader())
+
+    async def unsubscribe(self, channel: str, subscription: Subscription) -> None:
+        subscriptions = self._channels.get(channel)
+        if not subscriptions or subscription not in subscriptions:
+            return
+        subscriptions.remove(subscription)
+        if not subscriptions:
+            del self._channels[channel]
+            try:
+                await self._get_pubsub().unsubscribe(channel)
+            except Exception as e:
+                self.logger.warning(f"Failed to unsubscribe {channel}: {e}")
+
+    def is_subscribed(self, channel: str) -> bool:
+        return bool(self._channels.get(channel))
+
+    def has_raw_subscribers(self, channel: str) -> bool:
+        """频道上是否有接收 Redis 原始消息（decode=False）的订阅"""
+        return any(not subscription.decoded for subscription in self._channels.get(channel, ()))
+
+    async def _reader(self) -> None:
+        """唯一的读取任务：只负责读取并分发，连接断开时由 redis-py 重连并自动重新订阅"""
+        backoff = 1.0
+        while True:
+            try:
+                message = await self._pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                backoff = 1.0
+            except asyncio.CancelledError:
+                raise
+            except (aioredis.ConnectionError, aioredis.TimeoutError) as e:
+                self.reconnects += 1
+                self.logger.warning(f"Shared pub/sub connection lost, retrying in {backoff}s: {e}")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 30)
+                continue
+            except Exception as e:
+                # 读取任务由所有服务共用，任何错误都不能让它退出
+                self.logger.error(f"Shared pub/sub read failed, retrying in {backoff}s: {e}", exc_info=True)
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 30)
+                continue
+            if message is None or message.get("type") != "message":
+                continue
+            self.received += 1
+            try:
+                await self._dispatch(message)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.logger.error(f"Failed to dispatch message on {message.get('channel')}: {e}", exc_info=True)
+
+    async def _dispatch(self, message: Dict[str, Any]) -> None:
+        channel = message["channel"]
+        if isinstance(channel, bytes):
+            channel = channel.decode()
+        subscriptions = self._channels.get(channel)
+        if not subscriptions:
+            return
+
+        shared = None
+        if sum(1 for subscription in subscriptions if subscription.decoded) > 1:
+            try:
+                shared = Message.decode_lazy(message["data"])
+                # claim-check 引用需要各订阅通过 Service.decode_message 取回（同一进程内会合并请求）
+                if shared.claim_key is None:
+                    self.shared_decodes += 1
+                else:
+                    shared = None
+            except Exception:
+                pass  # 交给各订阅自行解码并记录错误
+
+        # 每个订阅收到自己的原始消息字典与消息副本，订阅方的修改不会影响其他订阅
+        for subscription in list(subscriptions):
+            delivered = dict(message)
+            if shared is not None:
+                delivered[LOCAL_MESSAGE_KEY] = shared.shallow_copy()
+            await subscription.dispatch(delivered)
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._pubsub is not None:
+            try:
+                await self._pubsub.aclose()
+            except Exception as e:
+                self.logger.warning(f"Failed to close shared pub/sub connection: {e}")
+            self._pubsub = None
+        self._channels.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "channels": {channel: len(subscriptions) for channel, subscriptions in self._channels.items()},
+            "received": self.received,
+            "shared_decodes": self.shared_decodes,
+            "reconnects": self.reconnects,
+        }
@@ -1,9 +1,46 @@
 import time
+import asyncio
 import logging
 
-from typing import Dict, List
+from typing import Any, Dict, List, Optional, Tuple
 from .service import Service
-from .exceptions import ServiceError
+from .cluster import NodeRegistry
+from .exceptions import ServiceError, ConfigError
+
+DEFAULT_PRIORITY = 100
+DEFAULT_START_TIMEOUT: Optional[float] = None  # 默认不限制启动时间
+
+
+def plan_startup(names: List[str], priorities: Dict[str, int],
+                 dependencies: Dict[str, List[str]]) -> List[Tuple[int, List[str]]]:
+    """计算启动批次 [(优先级, [服务名, ...]), ...]，同一批次内的服务并发启动
+
+    服务按优先级分层，同层内按依赖关系再分批；被依赖的服务优先级数字更大时提前到依赖它的服务所在层。
+    """
+    known = set(names)
+    deps = {name: [dep for dep in dependencies.get(name, ()) if dep in known and dep != name] for name in names}
+    effective = {name: priorities.get(name, DEFAULT_PRIORITY) for name in names}
+    changed = True
+    while changed:
+        changed = False
+        for name in names:
+            for dep in deps[name]:
+                if effective[dep] > effective[name]:
+                    effective[dep] = effective[name]
+                    changed = True
+
+    waves = []
+    started = set()
+    for priority in sorted(set(effective.values())):
+        remaining = [name for name in names if effective[name] == priority]
+        while remaining:
+            ready = [name for name in remaining if all(dep in started for dep in deps[name])]
+            if not ready:
+                raise ConfigError(f"Circular service dependencies: {remaining}")
+            waves.append((priority, ready))
+            started.update(ready)
+            remaining = [name for name in remaining if name not in started]
+    return waves
 
 
 class ServiceRegistry:
@@ -11,6 +48,23 @@ class ServiceRegistry:
     def __init__(self):
         self._services: Dict[str, Service] = {}
         self.logger = logging.getLogger("liteboty_default")
+        # Redis 中的节点注册表，由 Bot 设置；服务启动、停止、重启时增量更新
+        self.node_registry: Optional[NodeRegistry] = None
+        # start_all 的启动批次（停止时逆序）与各服务的启动耗时报告
+        self._start_waves: List[List[str]] = []
+        self.startup_report: List[Dict[str, Any]] = []
+
+    async def _publish_status(self, service: Service, status: Optional[str]) -> None:
+        """更新节点注册表中的服务字段，status 为 None 时删除"""
+        if self.node_registry is None:
+            return
+        try:
+            if status is None:
+                await self.node_registry.remove_service(service.name)
+            else:
+                await self.node_registry.set_service(service, status)
+        except Exception as e:
+            self.logger.error(f"Failed to update service registry in Redis for {service.name}: {e}")
 
     def register(self, service: Service) -> None:
         """注册服务"""
@@ -26,20 +80,94 @@ class ServiceRegistry:
         """获取所有服务"""
         return list(self._services.values())
 
-    async def start_all(self) -> None:
-        """启动所有服务"""
-        for service in self._services.values():
-            try:
-                await service.start()
-                self.logger.info(f"Started service: {service.name}")
-            except Exception as e:
-                self.logger.error(f"Failed to start service {service.name}: {e}")
-                raise
+    async def start_all(self, priorities: Optional[Dict[str, int]] = None,
+                        dependencies: Optional[Dict[str, List[str]]] = None,
+                        timeouts: Optional[Dict[str, float]] = None,
+                        default_timeout: Optional[float] = DEFAULT_START_TIMEOUT) -> None:
+        """按优先级分层、按依赖分批并发启动所有服务
+
+        Args:
+            priorities: 服务名 -> 优先级（数字越小越先启动），默认 100
+            dependencies: 服务名 -> 依赖的服务名列表，依赖的服务启动完成后才启动
+            timeouts: 服务名 -> 启动超时（秒），未设置的使用 default_timeout，None 表示不限
+        """
+        await self.start_services(list(self._services), priorities, dependencies, timeouts, default_timeout)
+
+    async def start_services(self, names: List[str], priorities: Optional[Dict[str, int]] = None,
+                             dependencies: Optional[Dict[str, List[str]]] = None,
+                             timeouts: Optional[Dict[str, float]] = None,
+                             default_timeout: Optional[float] = DEFAULT_START_TIMEOUT) -> None:
+        """按 start_all 的规则启动指定的已注册服务（如重新加载配置时新增的服务）
+
+        依赖不在 names 中的已注册服务视为已经启动；有服务启动失败或超时时抛出 ServiceError，之后的批次不再启动。
+        """
+        names = [name for name in names if name in self._services]
+        dependencies = dependencies or {}
+        for name, deps in dependencies.items():
+            for dep in deps:
+                if name in names and dep not in self._services:
+                    self.logger.warning(f"Service {name} depends on {dep}, which is not loaded; ignoring")
+        waves = plan_startup(names, priorities or {}, dependencies)
+        timeouts = timeouts or {}
+
+        self.startup_report = []
+        started_at = time.perf_counter()
+        for index, (priority, names) in enumerate(waves):
+            results = await asyncio.gather(*(
+                self._start_with_timeout(self._services[name], timeouts.get(name, default_timeout))
+                for name in names
+            ))
+            for result in results:
+                result.update(priority=priority, wave=index)
+            self.startup_report.extend(results)
+            self._start_waves.append(names)
+            failed = [result for result in results if result["status"] != "started"]
+            if failed:
+                raise ServiceError(
+                    "Failed to start services: " + ", ".join(f"{r['name']} ({r['error']})" for r in failed)
+                )
+
+        total_ms = (time.perf_counter() - started_at) * 1000
+        slowest = sorted(self.startup_report, key=lambda r: r["duration_ms"], reverse=True)[:3]
+        self.logger.info(
+            f"Started {len(self.startup_report)} services in {total_ms:.1f} ms ({len(waves)} waves), slowest: "
+            + ", ".join(f"{r['name']} {r['duration_ms']:.1f} ms" for r in slowest)
+        )
+
+    async def _start_with_timeout(self, service: Service, timeout: Optional[float]) -> Dict[str, Any]:
+        """启动单个服务，返回启动报告项"""
+        started_at = time.perf_counter()
+        status, error = "started", None
+        try:
+            await asyncio.wait_for(service.start(), timeout)
+        except asyncio.TimeoutError:
+            status, error = "timeout", f"timed out after {timeout}s"
+        except Exception as e:
+            status, error = "failed", str(e)
+        duration_ms = (time.perf_counter() - started_at) * 1000
+        if status == "started":
+            self.logger.info(f"Started service: {service.name} ({duration_ms:.1f} ms)")
+            await self._publish_status(service, "running")
+        else:
+            self.logger.error(f"Failed to start service {service.name}: {error}")
+        return {"name": service.name, "status": status, "duration_ms": duration_ms, "error": error}
+
+    async def start_service(self, service_name: str) -> None:
+        """启动已注册的服务"""
+        if service := self._services.get(service_name):
+            await service.start()
+            await self._publish_status(service, "running")
 
     async def stop_all(self) -> None:
-        """停止所有服务"""
-        for service_name in list(self._services.keys()):
-            await self.stop_service(service_name)
+        """按启动顺序的逆序分批并发停止所有服务（之后单独启动的服务最先停止）"""
+        in_waves = {name for names in self._start_waves for name in names}
+        waves = [[name for name in reversed(self._services) if name not in in_waves]]
+        waves.extend(reversed(self._start_waves))
+        for names in waves:
+            names = [name for name in names if name in self._services]
+            # 出错的服务已由 stop_service 记录日志，继续停止其余服务
+            await asyncio.gather(*(self.stop_service(name) for name in names), return_exceptions=True)
+        self._start_waves.clear()
 
     async def stop_service(self, service_name: str) -> None:
         """停止并移除服务"""
@@ -48,6 +176,7 @@ class ServiceRegistry:
             try:
                 await service.stop()
                 del self._services[service_name]
+                await self._publish_status(service, None)
                 self.logger.info(f"服务已停止并移除: {service_name}")
             except Exception as e:
                 self.logger.error(f"停止服务 {service_name} 时出错: {e}")
@@ -59,10 +188,14 @@ class ServiceRegistry:
             self.logger.info(f"正在重启服务: {service_name}")
             try:
                 await service.stop()
-                service.config = config
-                service.global_config = global_config
+                if isinstance(service, Service):
+                    service.reconfigure(config, global_config)
+                else:
+                    service.config = config
+                    service.global_config = global_config
                 service._running = True
                 await service.start()
+                await self._publish_status(service, "running")
                 self.logger.info(f"服务已重启: {service_name}")
             except Exception as e:
                 self.logger.error(f"重启服务 {service_name} 时出错: {e}")
@@ -0,0 +1,109 @@
+"""
+请求 / 响应
+
+请求方把关联 ID 与自己的回复频道写入请求消息的信封（metadata.attributes 中的 lb.corr / lb.reply_to），
+响应方处理后把结果发布到回复频道，并带回同一个关联 ID。每个服务只有一个回复频道（收件箱），
+收到的响应按关联 ID 交给等待中的请求。
+"""
+import uuid
+
+import asyncio
+
+from typing import Any, Dict, List, Optional, Union
+
+from .message import Message, CORRELATION_ATTRIBUTE, ERROR_ATTRIBUTE
+from .exceptions import RPCError, ServiceError
+
+REPLY_CHANNEL_PREFIX = "liteboty:rpc:reply:"
+DEFAULT_REQUEST_TIMEOUT = 5.0
+
+
+def new_reply_channel(service_name: str) -> str:
+    return f"{REPLY_CHANNEL_PREFIX}{service_name}:{uuid.uuid4().hex[:12]}"
+
+
+class _PendingRequest:
+    __slots__ = ("future", "expected", "replies")
+
+    def __init__(self, future: asyncio.Future, expected: Optional[int]):
+        self.future = future
+        self.expected = expected  # None 表示收集到超时为止
+        self.replies: List[Union[Message, RPCError]] = []
+
+
+def reply_error(message: Message) -> Optional[RPCError]:
+    """响应消息携带的错误，正常响应返回 None"""
+    error = message.envelope.get(ERROR_ATTRIBUTE)
+    return RPCError(error) if error is not None else None
+
+
+class ReplyInbox:
+    """服务的回复收件箱，维护等待中的请求
+
+    Args:
+        channel: 回复频道
+    """
+
+    def __init__(self, channel: str):
+        self.channel = channel
+        self._pending: Dict[str, _PendingRequest] = {}
+        self.requests = 0
+        self.replies = 0
+        self.timeouts = 0
+        self.late_replies = 0  # 请求已超时或已完成后才到达的响应
+
+    def open(self, expected: Optional[int] = 1) -> str:
+        """登记一个等待中的请求，返回关联 ID"""
+        correlation_id = uuid.uuid4().hex
+        self._pending[correlation_id] = _PendingRequest(asyncio.get_running_loop().create_future(), expected)
+        self.requests += 1
+        return correlation_id
+
+    async def wait(self, correlation_id: str, timeout: float) -> List[Union[Message, RPCError]]:
+        """等待响应，返回收到的响应列表；只需要一个响应的请求超时时返回空列表"""
+        pending = self._pending[correlation_id]
+        try:
+            await asyncio.wait_for(asyncio.shield(pending.future), timeout)
+        except asyncio.TimeoutError:
+            if not pending.replies:
+                self.timeouts += 1
+        finally:
+            self._pending.pop(correlation_id, None)
+            if not pending.future.done():
+                pending.future.cancel()
+        return pending.replies
+
+    def discard(self, correlation_id: str) -> None:
+        pending = self._pending.pop(correlation_id, None)
+        if pending is not None and not pending.future.done():
+            pending.future.cancel()
+
+    def resolve(self, message: Message) -> None:
+        """收件箱订阅的回调：按关联 ID 把响应交给等待中的请求"""
+        pending = self._pending.get(message.envelope.get(CORRELATION_ATTRIBUTE))
+        if pending is None or pending.future.done():
+            self.late_replies += 1
+            return
+        self.replies += 1
+        error = reply_error(message)
+        pending.replies.append(error if error is not None else message)
+        if pending.expected is not None and len(pending.replies) >= pending.expected:
+            pending.future.set_result(None)
+
+    def close(self) -> None:
+        """服务停止时结束所有等待中的请求"""
+        for pending in self._pending.values():
+            if not pending.future.done():
+                pending.future.set_exception(ServiceError("Service stopped while waiting for reply"))
+                pending.future.exception()  # 标记为已获取，避免未等待的请求产生告警
+        self._pending.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "channel": self.channel,
+            "pending": len(self._pending),
+            "requests": self.requests,
+            "replies": self.replies,
+            "timeouts": self.timeouts,
+            "late_replies": self.late_replies,
+        }
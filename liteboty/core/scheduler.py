@@ -0,0 +1,196 @@
+"""
+定时任务调度
+
+同一个事件循环中的所有定时器（Bot 内各服务的 add_timer、心跳）共用一个 TimerScheduler：
+定时器按绝对截止时间放入最小堆，调度器只在事件循环上挂一个 call_at 句柄指向最早的截止时间，
+不再为每个定时器创建一个常驻任务。截止时间按 起始时间 + n * interval 计算，不随回调耗时累积漂移。
+
+interval 为 0（或负数）的定时器在每次回调结束后立即重新调度，让出一轮事件循环后再次执行，不计为超时。
+
+回调耗时超过间隔（错过了后续的截止时间）时按 OverrunPolicy 处理：
+
+- skip: 丢弃错过的周期，等到下一个尚未到达的截止时间
+- coalesce: 把错过的周期合并为一次，立即执行，之后回到原来的节拍
+- catch_up: 错过的每个周期都补执行一次，直到追上节拍
+"""
+import asyncio
+import logging
+import random
+import weakref
+
+from enum import Enum
+from heapq import heappush, heappop
+from typing import Any, Dict, List, Optional, Tuple
+
+from .metrics import Histogram, LATENCY_MS_BUCKETS
+
+
+class OverrunPolicy(str, Enum):
+    SKIP = "skip"
+    COALESCE = "coalesce"
+    CATCH_UP = "catch_up"
+
+
+DEFAULT_OVERRUN_POLICY = OverrunPolicy.COALESCE
+
+
+class TimerStats:
+    """单个定时器的统计"""
+
+    def __init__(self):
+        self.runs = 0
+        self.overruns = 0  # 回调耗时超过间隔的次数
+        self.skipped = 0  # 因 skip / coalesce 没有执行的周期数
+        self.errors = 0
+        self.lateness_ms = Histogram(LATENCY_MS_BUCKETS)  # 实际开始执行时间晚于截止时间的毫秒数
+        self.duration_ms = Histogram(LATENCY_MS_BUCKETS)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "runs": self.runs,
+            "overruns": self.overruns,
+            "skipped": self.skipped,
+            "errors": self.errors,
+            "lateness_ms": self.lateness_ms.as_dict(),
+            "duration_ms": self.duration_ms.as_dict(),
+        }
+
+
+class TimerScheduler:
+    """基于最小堆的定时器调度器，每个事件循环一个，通过 get_timer_scheduler() 获取"""
+
+    def __init__(self, loop: Optional[asyncio.AbstractEventLoop] = None, logger: Optional[logging.Logger] = None):
+        self.loop = loop or asyncio.get_running_loop()
+        self.logger = logger or logging.getLogger("liteboty_default")
+        self._heap: List[Tuple[float, int, Any]] = []  # (截止时间, 序号, 定时器)
+        self._seq = 0
+        self._handle: Optional[asyncio.TimerHandle] = None
+        self._handle_at: Optional[float] = None
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def add(self, timer) -> None:
+        """开始调度定时器，第一次在 jitter 范围内的随机延迟后立即执行"""
+        if timer._scheduler is not None:
+            return
+        timer._scheduler = self
+        timer._done = self.loop.create_future()
+        timer._grid = self.loop.time()
+        self._push(timer, timer._grid + self._jitter(timer))
+
+    def remove(self, timer) -> Optional[asyncio.Task]:
+        """停止调度定时器，返回被取消的正在执行的回调任务（调用方可等待其结束）"""
+        if timer._scheduler is not self:
+            return None
+        timer._scheduler = None
+        # 堆中的条目在弹出时跳过，不做 O(n) 删除
+        task, timer._task = timer._task, None
+        if task is not None and not task.done():
+            task.cancel()
+        else:
+            task = None
+        self._finish(timer)
+        return task
+
+    @staticmethod
+    def _jitter(timer) -> float:
+        return random.uniform(0, timer.jitter) if timer.jitter else 0.0
+
+    def _push(self, timer, deadline: float) -> None:
+        self._seq += 1
+        timer._entry = self._seq
+        heappush(self._heap, (deadline, self._seq, timer))
+        if self._handle_at is None or deadline < self._handle_at:
+            self._arm(deadline)
+
+    def _arm(self, deadline: float) -> None:
+        if self._handle is not None:
+            self._handle.cancel()
+        self._handle = self.loop.call_at(deadline, self._fire_due)
+        self._handle_at = deadline
+
+    def _live(self, item: Tuple[float, int, Any]) -> bool:
+        timer = item[2]
+        return timer._scheduler is self and timer._entry == item[1]
+
+    def _fire_due(self) -> None:
+        self._handle = self._handle_at = None
+        now = self.loop.time()
+        while self._heap and self._heap[0][0] <= now:
+            item = heappop(self._heap)
+            if not self._live(item):
+                continue
+            deadline, _, timer = item
+            timer._task = self.loop.create_task(self._execute(timer, deadline))
+        while self._heap and not self._live(self._heap[0]):
+            heappop(self._heap)
+        if self._heap:
+            self._arm(self._heap[0][0])
+
+    async def _execute(self, timer, deadline: float) -> None:
+        stats = timer.stats
+        started = self.loop.time()
+        stats.lateness_ms.observe(max(started - deadline, 0) * 1000)
+        try:
+            await timer.callback()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            stats.errors += 1
+            self.logger.error(f"Timer {timer.name} failed: {e}", exc_info=True)
+        finally:
+            elapsed = self.loop.time() - started
+            stats.runs += 1
+            stats.duration_ms.observe(elapsed * 1000)
+            if timer.interval > 0 and elapsed > timer.interval:
+                stats.overruns += 1
+            if timer._scheduler is self and timer._task is asyncio.current_task():
+                timer._task = None
+                self._reschedule(timer)
+
+    def _reschedule(self, timer) -> None:
+        if timer.count is not None and timer.stats.runs >= timer.count:
+            timer._scheduler = None
+            self._finish(timer)
+            return
+        now = self.loop.time()
+        if timer.interval <= 0:
+            timer._grid = now
+            self._push(timer, now + self._jitter(timer))
+            return
+        grid = timer._grid + timer.interval
+        if grid > now:
+            timer._grid = grid
+            self._push(timer, grid + self._jitter(timer))
+            return
+        # 错过了 missed 个截止时间（grid 及之后、不晚于 now 的节拍）
+        missed = int((now - grid) // timer.interval) + 1
+        if timer.policy == OverrunPolicy.SKIP:
+            timer.stats.skipped += missed
+            timer._grid = grid + missed * timer.interval
+            self._push(timer, timer._grid + self._jitter(timer))
+        elif timer.policy == OverrunPolicy.CATCH_UP:
+            timer._grid = grid
+            self._push(timer, grid)
+        else:
+            timer.stats.skipped += missed - 1
+            timer._grid = grid + (missed - 1) * timer.interval
+            self._push(timer, timer._grid)
+
+    @staticmethod
+    def _finish(timer) -> None:
+        if timer._done is not None and not timer._done.done():
+            timer._done.set_result(None)
+
+
+_schedulers: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, TimerScheduler]" = weakref.WeakKeyDictionary()
+
+
+def get_timer_scheduler() -> TimerScheduler:
+    """当前事件循环的调度器（Bot 与其中的服务运行在同一个事件循环上，因此共用一个）"""
+    loop = asyncio.get_running_loop()
+    scheduler = _schedulers.get(loop)
+    if scheduler is None:
+        scheduler = _schedulers[loop] = TimerScheduler(loop)
+    return scheduler
@@ -1,14 +1,41 @@
+import os
 import time
+import socket
 
+import inspect
 import logging
 import asyncio
 
 import redis.asyncio as aioredis
 
-from typing import Any, Dict, Optional
-from .message import Message, MessageType
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+from .message import (Message, MessageType, LazyMessage, ORIGIN_ATTRIBUTE, CORRELATION_ATTRIBUTE,
+                      REPLY_TO_ATTRIBUTE, ERROR_ATTRIBUTE)
+from .compression import get_compressor, DEFAULT_COMPRESSION_THRESHOLD
+from .shm import SharedMemoryRing, DEFAULT_SLOT_COUNT
+from .claim_check import fetch_claim, new_claim_key, DEFAULT_CLAIM_TTL
+from .subscription import (Subscription, BatchSubscription, OverflowPolicy, DEFAULT_QUEUE_SIZE, DEFAULT_DRAIN_TIMEOUT,
+                           DEFAULT_OVERFLOW_POLICY, RECEIVED_AT_KEY)
+from .local_bus import LocalBus, local_message, LOCAL_MESSAGE_KEY
+from .publisher import PublishBatcher, DEFAULT_PUBLISH_MAX_BATCH, DEFAULT_PUBLISH_MAX_DELAY_US
+from .streams import (StreamConsumer, queue_stream_publish, default_consumer_name, DEFAULT_STREAM_MAXLEN,
+                      DEFAULT_STREAM_COUNT, DEFAULT_STREAM_BLOCK_MS, DEFAULT_CLAIM_IDLE_MS)
+from .rpc import ReplyInbox, new_reply_channel, DEFAULT_REQUEST_TIMEOUT
+from .tracing import Tracer, DEFAULT_MAX_HOPS
 from .utils import TimerLoop
-from .exceptions import ServiceError, ConfigError
+from .scheduler import OverrunPolicy, DEFAULT_OVERRUN_POLICY
+from .heartbeat import write_heartbeats, HEARTBEAT_KEY_PREFIX, DEFAULT_HEARTBEAT_INTERVAL
+from .exceptions import ServiceError, ConfigError, CodecError, RPCError, RPCTimeoutError
+
+
+def _decode_and_call(callback: callable, data: bytes, lazy: bool) -> Any:
+    """在线程池 / 进程池中解码消息并调用处理函数"""
+    try:
+        message = Message.decode_lazy(data) if lazy else Message.decode(data)
+    except Exception as e:
+        raise CodecError(f"Failed to decode message: {e}") from e
+    return callback(message)
 
 
 class Service:
@@ -29,8 +56,23 @@ class Service:
 
         self.redis_client = None
         self.subscriber = None
-        self._subscriptions = {}  # 存储订阅信息
+        self._subscriptions = {}  # 存储订阅信息: 频道 -> PubSub 处理函数
+        self._channel_subscriptions: Dict[str, Subscription] = {}  # 频道 -> 订阅（入站队列与处理任务）
+        self._stream_consumers: Dict[str, StreamConsumer] = {}  # transport 为 stream 的频道 -> 消费组读取任务
         self._timers = {}
+        self._shm_rings: Dict[str, SharedMemoryRing] = {}  # 频道 -> 共享内存环形缓冲区
+        self._executors: Dict[str, Executor] = {}  # "thread" / "process" -> 服务持有的执行器
+        # 进程内总线，由 Bot 在启用 LOCAL_BUS 时设置，需在 start() 之前赋值
+        self.local_bus: Optional[LocalBus] = None
+        # Bot 共享的订阅连接，由 use_shared_connections 设置
+        self.pubsub_hub = None
+        self._publish_batcher = self._init_publish_batcher()
+        self._subscriber_task: Optional[asyncio.Task] = None
+        self._published: Dict[str, List[int]] = {}  # 频道 -> [发布消息数, 发布字节数]
+        self.reconnects = 0
+        # 请求 / 响应的回复收件箱，第一次 request 时创建
+        self._reply_inbox: Optional[ReplyInbox] = None
+        self._reply_inbox_task: Optional[asyncio.Future] = None
 
         # 生命周期控制相关
         self._running = True
@@ -38,46 +80,62 @@ class Service:
         self._start_time = time.time()
 
         # heartbeat config
-        self.heartbeat_interval = self.global_config.get("HEARTBEAT", {}).get("interval", 30)  # 默认 30s
+        self.heartbeat_interval = self.global_config.get("HEARTBEAT", {}).get("interval", DEFAULT_HEARTBEAT_INTERVAL)
         self.heartbeat_enabled = self.global_config.get("HEARTBEAT", {}).get("enabled", True)  # 默认启用 heartbeat
-        self.heartbeat_key_prefix = "liteboty:heartbeat:"
+        self.heartbeat_key_prefix = HEARTBEAT_KEY_PREFIX
+        self._heartbeat_managed = False  # 由 Bot 统一写入心跳，见 use_bot_heartbeat
+        # 心跳随机延迟上限（秒），大量服务同时启动时错开心跳写入
+        self.heartbeat_jitter = self.global_config.get("HEARTBEAT", {}).get("jitter", 0.0)
+
+        # 链路追踪，由全局配置 TRACING 开启
+        self._tracer: Optional[Tracer] = self._init_tracer()
 
         if need_redis:
             self._init_redis()
             # 心跳定时器
             if self.heartbeat_enabled:
-                self.add_timer("heartbeat", self.heartbeat_interval, self.send_heartbeat)
+                self.add_timer("heartbeat", self.heartbeat_interval, self.send_heartbeat,
+                               policy=OverrunPolicy.SKIP, jitter=self.heartbeat_jitter)
 
         # 服务所需要的 inputs 和 outputs 配置检查
         # 如果服务中定义了 require_inputs 和 require_outputs 的话
 
         self._check_io_config()
 
+    def heartbeat_payload(self) -> Dict[str, Any]:
+        """心跳内容"""
+        now = time.time()
+        return {
+            "name": self.name,
+            "timestamp": now,
+            "status": "running" if self._running else "stopping",
+            "uptime": now - getattr(self, "_start_time", now),
+            "host": socket.gethostname(),
+            "pid": os.getpid(),
+        }
+
     async def send_heartbeat(self):
         """
         发送服务心跳到 Redis
-        将服务状态信息写入 Redis，键名格式为 "liteboty:heartbeat:{service_name}"
+        将服务状态信息写入 Redis，键名格式为 "liteboty:heartbeat:{service_name}"，并更新心跳索引 "liteboty:heartbeat:index"
         """
         if not self.redis_client:
             return
         try:
-            import time
-            import json
-
-            heartbeat_data = {
-                "name": self.name,
-                "timestamp": time.time(),
-                "status": "running" if self._running else "stopping",
-                "uptime": time.time() - getattr(self, "_start_time", time.time())
-            }
-            heartbeat_key = f"{self.heartbeat_key_prefix}{self.name}"
-            await self.redis_client.set(heartbeat_key, json.dumps(heartbeat_data))
-            await self.redis_client.expire(heartbeat_key, self.heartbeat_interval*2)  # 设置 TTL 为心跳间隔的 2 倍
+            heartbeat_data = self.heartbeat_payload()
+            # SET EX 与索引 ZADD 在一次往返中完成，TTL 为心跳间隔的 2 倍
+            await write_heartbeats(self.redis_client, [heartbeat_data], self.heartbeat_interval * 2,
+                                   key_prefix=self.heartbeat_key_prefix)
             self.logger.debug(f"send heartbeat: {heartbeat_data}")
 
         except Exception as e:
             self.logger.error(f"心跳发送失败: {e}")
 
+    def use_bot_heartbeat(self) -> None:
+        """改由 Bot 统一写入心跳（与其他服务合并为一次流水线），需在 start() 之前调用"""
+        self._heartbeat_managed = True
+        self._timers.pop("heartbeat", None)
+
     def _check_io_config(self):
         """检查输入输出配置"""
         inputs = self.config.get("inputs", {})
@@ -90,6 +148,73 @@ class Service:
             if key not in outputs:
                 raise ConfigError(f"Service [{self.name}] 缺少输出配置: {key}")
 
+    def _channel_option(self, channel: str, key: str, default: Any = None) -> Any:
+        """读取频道级配置，配置格式: {"channels": {"/topic": {"codec": "msgpack", "compression": "zstd"}}}"""
+        return self.config.get("channels", {}).get(channel, {}).get(key, default)
+
+    def _init_publish_batcher(self) -> Optional[PublishBatcher]:
+        """按服务配置创建自动批量发布器
+
+        配置格式: {"publish_batching": {"enabled": true, "max_batch": 64, "max_delay_us": 200}}
+        """
+        options = self.config.get("publish_batching") or {}
+        if not options.get("enabled", False):
+            return None
+        return PublishBatcher(
+            lambda: self.redis_client.pipeline(transaction=False),
+            self._queue_publish,
+            max_batch=options.get("max_batch", DEFAULT_PUBLISH_MAX_BATCH),
+            max_delay_us=options.get("max_delay_us", DEFAULT_PUBLISH_MAX_DELAY_US),
+            logger=self.logger,
+        )
+
+    def _init_tracer(self) -> Optional[Tracer]:
+        tracing_config = self.global_config.get("TRACING") or {}
+        if not tracing_config.get("enabled", False):
+            return None
+        return Tracer(self.name, max_hops=tracing_config.get("max_hops", DEFAULT_MAX_HOPS))
+
+    def reconfigure(self, config: Optional[Dict[str, Any]], global_config: Optional[Dict[str, Any]]) -> None:
+        """重新加载配置时更新服务配置，并按新配置重建自动批量发布器与链路追踪，需在服务停止后、start() 之前调用"""
+        self.config = config or {}
+        self.global_config = global_config or {}
+        self._publish_batcher = self._init_publish_batcher()
+        self._tracer = self._init_tracer()
+
+    def publish_stats(self) -> Optional[Dict[str, Any]]:
+        """自动批量发布的统计：pipeline 数、消息数、出错数与 pipeline 大小直方图，未开启时返回 None"""
+        return self._publish_batcher.get_stats() if self._publish_batcher is not None else None
+
+    def _is_stream(self, channel: str) -> bool:
+        """频道是否使用 Redis Streams 传输（频道配置 "transport": "stream"）"""
+        return self._channel_option(channel, "transport", "pubsub") == "stream"
+
+    def _encode_options(self, channel: str) -> Dict[str, Any]:
+        """根据频道配置生成 Message.encode 的编码参数"""
+        options = self.config.get("channels", {}).get(channel)
+        if not options:
+            return {}
+        encode_options = {"codec": options.get("codec")}
+        if options.get("shared_memory"):
+            encode_options["shm"] = self._get_shm_ring(channel, options)
+        if options.get("compression"):
+            encode_options["compression"] = get_compressor(options["compression"], options.get("compression_level"))
+            encode_options["compression_threshold"] = options.get(
+                "compression_threshold", DEFAULT_COMPRESSION_THRESHOLD
+            )
+        return encode_options
+
+    def _get_shm_ring(self, channel: str, options: Dict[str, Any]) -> SharedMemoryRing:
+        """获取频道的共享内存环形缓冲区，首次发布时创建，服务停止时释放"""
+        ring = self._shm_rings.get(channel)
+        if ring is None:
+            ring = SharedMemoryRing(
+                slot_count=options.get("shm_slots", DEFAULT_SLOT_COUNT),
+                slot_size=options.get("shm_slot_size"),
+            )
+            self._shm_rings[channel] = ring
+        return ring
+
     def _init_redis(self) -> None:
         """初始化 Redis 异步连接"""
         redis_config = self.config.get('REDIS', self.global_config.get('REDIS', {}))
@@ -107,6 +232,15 @@ class Service:
         self.subscriber = self.redis_client.pubsub()
         self.logger.info(f"Service {self.name} created Redis client")
 
+    def use_shared_connections(self, redis_client: aioredis.Redis, pubsub_hub) -> None:
+        """改用 Bot 的连接池与共享订阅连接，需在 start() 之前调用
+
+        服务自己创建的客户端尚未建立连接，直接替换即可；服务停止时不会关闭共享的连接。
+        """
+        self.redis_client = redis_client
+        self.subscriber = None
+        self.pubsub_hub = pubsub_hub
+
     async def _reconnect(self, max_retries: int = None, initial_backoff: float = 1.0) -> bool:
         """重连 Redis
 
@@ -117,6 +251,9 @@ class Service:
         Returns:
             bool: 重连是否成功
         """
+        if self.pubsub_hub is not None:
+            # 共享连接由连接池在下次使用时重建，订阅由 PubSubHub 自动恢复
+            return True
         backoff = initial_backoff
         retries = 0
 
@@ -126,6 +263,7 @@ class Service:
                 # 重新订阅所有频道
                 for channel, callback in self._subscriptions.items():
                     await self.subscriber.subscribe(**{channel: callback})
+                self.reconnects += 1
                 self.logger.info("Successfully reconnected to Redis")
                 return True
             except aioredis.ConnectionError as e:
@@ -141,42 +279,412 @@ class Service:
                 self.logger.error(f"Unexpected error during reconnection: {e}")
                 return False
 
-    def add_subscription(self, channel: str, callback: callable):
+    def add_subscription(
+            self,
+            channel: str,
+            callback: callable,
+            decode: bool = False,
+            lazy: bool = False,
+            queue_size: Optional[int] = None,
+            overflow: Optional[str] = None,
+            concurrency: Optional[int] = None,
+            partition_key: Optional[str] = None,
+            executor: Optional[Union[str, Executor]] = None,
+            on_result: Optional[callable] = None,
+    ):
         """ 订阅 Redis 的指定 topic 并设置回调
-         
+
+        收到的消息先放入该订阅的有界队列，再由独立的处理任务调用回调，慢回调不会阻塞 Redis 连接的读取。
+
         Args:
             channel: 订阅的频道
             callback: 消息处理回调函数
+            decode: 为 True 时回调收到解码后的 Message（自动解析 claim-check 引用），否则收到 Redis 原始消息
+            lazy: 与 decode 一起使用，回调收到 LazyMessage，data 在首次访问时才解码
+            queue_size: 入站队列容量，不指定时使用频道配置 queue_size，默认 100
+            overflow: 队列满时的策略 block / drop_oldest / drop_newest / conflate，
+                不指定时使用频道配置 overflow，默认 block
+            concurrency: 同时处理的消息数上限，不指定时使用频道配置 concurrency，默认 1（逐条处理）
+            partition_key: 元数据中的分区键名，concurrency > 1 时同一分区键的消息按到达顺序处理，
+                不指定时使用频道配置 partition_key
+            executor: 在事件循环之外执行回调（适合 CPU 密集的处理函数），可选 "thread"、"process" 或自定义
+                concurrent.futures.Executor，回调需为普通函数；decode 为 True 时解码也在执行器中完成。
+                使用 "process" 时回调须可被 pickle（模块级函数），收到的消息在子进程中解码
+            on_result: 回调返回值不为 None 时，在事件循环中以返回值调用该函数（可以是协程函数），用于发布处理结果
+         """
+        if channel not in self._channel_subscriptions:
+            if executor is not None:
+                callback = self._executor_callback(callback, decode, lazy, executor)
+            elif decode:
+                callback = self._decoding_callback(callback, lazy)
+            if on_result is not None:
+                callback = self._result_callback(callback, on_result)
+            if self._tracer is not None:
+                callback = self._traced_callback(channel, callback, peek=decode, share=decode and executor is None)
+            subscription = Subscription(
+                channel,
+                callback,
+                queue_size=self._channel_option(channel, "queue_size", DEFAULT_QUEUE_SIZE) if queue_size is None else queue_size,
+                overflow=overflow or self._channel_option(channel, "overflow", DEFAULT_OVERFLOW_POLICY),
+                concurrency=concurrency or self._channel_option(channel, "concurrency", 1),
+                key_func=self._partition_key_func(partition_key or self._channel_option(channel, "partition_key")),
+                decoded=decode,
+                logger=self.logger,
+            )
+            self._register_subscription(channel, subscription)
+
+    def add_batch_subscription(
+            self,
+            channel: str,
+            handler: callable,
+            max_batch: int = 32,
+            max_wait_ms: float = 10,
+            lazy: bool = False,
+            queue_size: Optional[int] = None,
+            overflow: Optional[str] = None,
+            executor: Optional[Union[str, Executor]] = None,
+            on_result: Optional[callable] = None,
+    ):
+        """ 批量订阅：解码后的消息攒成批次，以 Message 列表调用 handler
+
+        批次达到 max_batch 条，或第一条消息到达后等待超过 max_wait_ms 时调用 handler；
+        服务停止时剩余的不完整批次也会被处理。批大小与等待时间的直方图见 subscription_stats()。
+
+        Args:
+            channel: 订阅的频道
+            handler: 批处理函数，接收 List[Message]
+            max_batch: 批次的最大消息数
+            max_wait_ms: 批次的最长等待时间（毫秒）
+            lazy: handler 收到 LazyMessage
+            queue_size / overflow: 同 add_subscription
+            executor: 在执行器中运行 handler（解码在事件循环中完成），同 add_subscription
+            on_result: handler 返回值不为 None 时在事件循环中调用
          """
-        if channel not in self._subscriptions:
-            self._subscriptions[channel] = callback
+        if channel in self._channel_subscriptions:
+            return
+        if executor is not None:
+            func = handler
+
+            async def handler(messages):
+                return await asyncio.get_running_loop().run_in_executor(self._get_executor(executor), func, messages)
+        if on_result is not None:
+            handler = self._result_callback(handler, on_result)
+        tracer = self._tracer
+        if tracer is not None:
+            batch_handler = handler
+
+            async def handler(messages):
+                state = tracer.begin(channel, None, None)
+                try:
+                    result = batch_handler(messages)
+                    if inspect.isawaitable(result):
+                        result = await result
+                    return result
+                finally:
+                    tracer.end(state)
+
+        async def decoder(raw_message):
+            message = await self._decode_received(raw_message, lazy)
+            if tracer is not None:
+                tracer.arrived(channel, message, raw_message.get(RECEIVED_AT_KEY))
+            return message
+
+        subscription = BatchSubscription(
+            channel,
+            handler,
+            decoder,
+            max_batch=max_batch,
+            max_wait_ms=max_wait_ms,
+            queue_size=self._channel_option(channel, "queue_size", DEFAULT_QUEUE_SIZE) if queue_size is None else queue_size,
+            overflow=overflow or self._channel_option(channel, "overflow", DEFAULT_OVERFLOW_POLICY),
+            logger=self.logger,
+        )
+        self._register_subscription(channel, subscription)
+
+    def _register_subscription(self, channel: str, subscription: Subscription) -> None:
+        """登记订阅，pub/sub 频道的入队函数注册为 PubSub 处理函数，stream 频道在启动时创建消费组读取任务"""
+        self._channel_subscriptions[channel] = subscription
+        subscription.stamp_arrival = self._tracer is not None
+        if self._is_stream(channel):
+            # 丢弃的条目会一直处于未确认状态，stream 频道始终在队列满时阻塞读取
+            subscription.overflow = OverflowPolicy.BLOCK
+        else:
+            self._subscriptions[channel] = subscription.dispatch
+
+    @staticmethod
+    def _partition_key_func(partition_key: Optional[str]) -> Optional[callable]:
+        """按元数据字段提取分区键，只解析消息信封，不解码载荷"""
+        if not partition_key:
+            return None
+
+        def key_func(raw_message):
+            message = local_message(raw_message)
+            if message is None:
+                message = Message.decode_lazy(raw_message["data"])
+            return message.metadata.get(partition_key)
+        return key_func
+
+    def subscription_stats(self) -> Dict[str, Dict[str, Any]]:
+        """各频道入站队列的统计：当前深度、深度峰值、收到 / 丢弃 / 处理完成 / 出错的消息数，
+        stream 频道另有 stream 项（读取 / 确认 / 认领的条目数）"""
+        stats = {}
+        for channel, subscription in self._channel_subscriptions.items():
+            stats[channel] = subscription.get_stats()
+            consumer = self._stream_consumers.get(channel)
+            if consumer is not None:
+                stats[channel]["stream"] = consumer.get_stats()
+        return stats
+
+    def metrics_snapshot(self) -> Dict[str, Any]:
+        """服务运行指标的快照（普通字典，可 pickle），由 Bot 的 metrics 端点汇总输出"""
+        return {
+            "name": self.name,
+            "running": self._running,
+            "uptime": time.time() - self._start_time,
+            "subscriptions": self.subscription_stats(),
+            "published": {
+                channel: {"messages": counter[0], "bytes": counter[1]} for channel, counter in self._published.items()
+            },
+            "reconnects": self.reconnects,
+            "timers": self.timer_stats(),
+            "tracing": self.trace_stats(),
+        }
+
+    def timer_stats(self) -> Dict[str, Dict[str, Any]]:
+        """各定时器的执行次数、超时次数、跳过的周期数、出错次数，以及开始执行的延迟与执行耗时直方图"""
+        return {name: timer.stats.as_dict() for name, timer in self._timers.items()}
+
+    def trace_stats(self) -> Optional[Dict[str, Any]]:
+        """链路追踪统计：各订阅频道的发布→处理延迟、排队时间与处理耗时直方图，未开启 TRACING 时返回 None"""
+        return self._tracer.get_stats() if self._tracer is not None else None
+
+    def _traced_callback(self, channel: str, callback: callable, peek: bool, share: bool) -> callable:
+        """记录追踪直方图，并在处理期间设置 trace 上下文，使处理函数中发布的消息继承 trace ID
+
+        Args:
+            peek: 解析消息信封读取追踪字段（只用于 Message 编码的订阅）
+            share: 把解析得到的 LazyMessage 交给内层的解码回调复用，避免重复解析
+        """
+        tracer = self._tracer
+
+        async def handler(raw_message):
+            message = local_message(raw_message)
+            if message is None and peek and raw_message.get("data") is not None:
+                try:
+                    message = Message.decode_lazy(raw_message["data"])
+                except Exception as e:
+                    raise CodecError(f"Failed to decode message: {e}") from e
+                if share and message.claim_key is None:
+                    raw_message[LOCAL_MESSAGE_KEY] = message
+            state = tracer.begin(channel, message, raw_message.get(RECEIVED_AT_KEY))
+            try:
+                result = callback(raw_message)
+                if inspect.isawaitable(result):
+                    result = await result
+                return result
+            finally:
+                tracer.end(state)
+        return handler
+
+    async def _decode_received(self, raw_message: Dict[str, Any], lazy: bool) -> Message:
+        """解码订阅收到的原始消息，解码失败时抛出 CodecError（计入订阅统计的 decode_errors）"""
+        message = local_message(raw_message)
+        if message is not None:
+            return message
+        try:
+            return await self.decode_message(raw_message["data"], lazy=lazy)
+        except aioredis.RedisError:
+            raise
+        except Exception as e:
+            raise CodecError(f"Failed to decode message: {e}") from e
+
+    def _decoding_callback(self, callback: callable, lazy: bool) -> callable:
+        async def handler(raw_message):
+            message = await self._decode_received(raw_message, lazy)
+            result = callback(message)
+            if inspect.isawaitable(result):
+                result = await result
+            return result
+        return handler
+
+    def _executor_callback(self, callback: callable, decode: bool, lazy: bool,
+                           executor: Union[str, Executor]) -> callable:
+        async def handler(raw_message):
+            loop = asyncio.get_running_loop()
+            pool = self._get_executor(executor)
+            if not decode:
+                return await loop.run_in_executor(pool, callback, raw_message)
+            message = local_message(raw_message)
+            if message is not None:
+                if isinstance(message, LazyMessage):
+                    # 共享解析的 LazyMessage 引用接收缓冲区，先解码为普通 Message 以便传给进程池
+                    message = Message(message.data, message.msg_type, message.metadata,
+                                      codec=message.codec, envelope=message.envelope)
+                return await loop.run_in_executor(pool, callback, message)
+            data = raw_message["data"]
+            # claim-check 引用需要在事件循环中取回载荷，其余解码工作交给执行器
+            try:
+                claim_key = Message.decode_lazy(data).claim_key
+            except Exception as e:
+                raise CodecError(f"Failed to decode message: {e}") from e
+            if claim_key is not None:
+                data = await fetch_claim(self.redis_client, claim_key)
+            return await loop.run_in_executor(pool, _decode_and_call, callback, data, lazy)
+        return handler
+
+    @staticmethod
+    def _result_callback(callback: callable, on_result: callable) -> callable:
+        async def handler(raw_message):
+            result = callback(raw_message)
+            if inspect.isawaitable(result):
+                result = await result
+            if result is not None:
+                result = on_result(result)
+                if inspect.isawaitable(result):
+                    await result
+        return handler
+
+    def _get_executor(self, executor: Union[str, Executor]) -> Executor:
+        """获取执行器，"thread" / "process" 按服务配置 executors 创建并由服务持有，服务停止时关闭
+
+        配置格式: {"executors": {"thread": {"max_workers": 4}, "process": {"max_workers": 2}}}
+        """
+        if isinstance(executor, Executor):
+            return executor
+        pool = self._executors.get(executor)
+        if pool is None:
+            options = self.config.get("executors", {}).get(executor, {})
+            if executor == "thread":
+                pool = ThreadPoolExecutor(max_workers=options.get("max_workers"),
+                                          thread_name_prefix=f"{self.name}-worker")
+            elif executor == "process":
+                pool = ProcessPoolExecutor(max_workers=options.get("max_workers"))
+            else:
+                raise ConfigError(f"Service [{self.name}] unknown executor: {executor}")
+            self._executors[executor] = pool
+        return pool
+
+    async def decode_message(self, data: bytes, lazy: bool = False) -> Message:
+        """解码收到的消息，claim-check 引用消息会从 Redis 取回实际载荷
+
+        Args:
+            data: Redis 收到的原始字节
+            lazy: 为 True 时返回 LazyMessage
+        """
+        message = Message.decode_lazy(data)
+        if message.claim_key is not None:
+            data = await fetch_claim(self.redis_client, message.claim_key)
+            message = Message.decode_lazy(data)
+        if not lazy:
+            message.data  # 立即解码
+        return message
     
-    def add_timer(self, timer_name, interval, callback, count=None):
-        """ 添加定时器 """
+    def add_timer(self, timer_name, interval, callback, count=None, executor=None,
+                  policy: Union[str, OverrunPolicy] = DEFAULT_OVERRUN_POLICY, jitter: float = 0.0):
+        """ 添加定时器
+
+        所有服务的定时器由事件循环共用的 TimerScheduler 按固定节拍调度，回调抛出的异常只记录日志，不会停止定时器。
+
+        Args:
+            executor: 在 "thread" / "process" / 自定义执行器中运行回调（普通函数），避免阻塞事件循环
+            policy: 回调耗时超过间隔时的处理方式："skip"（跳过错过的周期）、"coalesce"（合并为一次立即执行，默认）、
+                "catch_up"（逐个补执行）
+            jitter: 每次执行前额外的随机延迟上限（秒），用于错开同周期的定时器
+        """
         if timer_name in self._timers:
             raise ServiceError(f"Timer {timer_name} already exists")
 
-        self._timers[timer_name] = TimerLoop(timer_name, interval, callback, count=count)
+        if executor is not None:
+            func = callback
+
+            async def callback():
+                await asyncio.get_running_loop().run_in_executor(self._get_executor(executor), func)
+
+        self._timers[timer_name] = TimerLoop(timer_name, interval, callback, count=count, policy=policy, jitter=jitter)
 
     async def start(self) -> None:
         """订阅消息并处理重连
         """
 
-        self._tasks = [
-            asyncio.create_task(self._timers[timer_name].run())
-            for timer_name in self._timers
-        ]
+        self._tasks = []
+        for timer in self._timers.values():
+            timer.start()
 
-        if self.subscriber:
-            await self.subscriber.subscribe(**self._subscriptions)
-            if len(self._subscriptions) > 0:
-                self._tasks.append(asyncio.create_task(self.subscriber.run()))
+        if self.subscriber or self.pubsub_hub or self._stream_consumers_needed():
+            await self.start_subscriber()
+
+    def _stream_consumers_needed(self) -> bool:
+        return self.redis_client is not None and any(self._is_stream(c) for c in self._channel_subscriptions)
 
     async def start_subscriber(self) -> None:
         """开启订阅"""
-        await self.subscriber.subscribe(**self._subscriptions)
-        if len(self._subscriptions) > 0:
-            self._tasks.append(asyncio.create_task(self.subscriber.run()))
+        for channel, subscription in self._channel_subscriptions.items():
+            subscription.start()
+            if self._is_stream(channel):
+                await self._start_stream_consumer(channel, subscription)
+            elif self.local_bus is not None and subscription.decoded:
+                self.local_bus.register(channel, subscription)
+        if self.pubsub_hub is not None:
+            for channel in self._subscriptions:
+                await self.pubsub_hub.subscribe(channel, self._channel_subscriptions[channel])
+            return
+        if self.subscriber and len(self._subscriptions) > 0:
+            await self.subscriber.subscribe(**self._subscriptions)
+            self._ensure_subscriber_task()
+
+    def _ensure_subscriber_task(self) -> None:
+        """启动独立订阅连接的读取任务（只启动一个）"""
+        if self._subscriber_task is None or self._subscriber_task.done():
+            self._subscriber_task = asyncio.create_task(self.subscriber.run())
+        if self._subscriber_task not in self._tasks:
+            self._tasks.append(self._subscriber_task)
+
+    async def _subscribe_now(self, channel: str) -> None:
+        """立即开始接收已登记的 pub/sub 频道（服务运行中新增订阅时使用）"""
+        subscription = self._channel_subscriptions[channel]
+        subscription.start()
+        if self.local_bus is not None and subscription.decoded:
+            self.local_bus.register(channel, subscription)
+        if self.pubsub_hub is not None:
+            await self.pubsub_hub.subscribe(channel, subscription)
+        elif self.subscriber is not None:
+            await self.subscriber.subscribe(**{channel: subscription.dispatch})
+            self._ensure_subscriber_task()
+        else:
+            raise ServiceError(f"Service [{self.name}] has no Redis subscriber connection")
+
+    async def _start_stream_consumer(self, channel: str, subscription: Subscription) -> None:
+        """为 stream 频道创建消费组读取任务
+
+        频道配置: group（消费组，默认服务名）、consumer（消费者名，默认 服务名-主机名-进程号）、
+        count（每次读取条数）、block_ms（阻塞读取时间）、claim_idle_ms（未确认消息的认领时间，0 不认领）
+        """
+        if channel in self._stream_consumers:
+            return
+        consumer_name = self._channel_option(channel, "consumer")
+        consumer = StreamConsumer(
+            self.redis_client,
+            channel,
+            subscription,
+            group=self._channel_option(channel, "group", self.name),
+            consumer=consumer_name or default_consumer_name(self.name),
+            count=self._channel_option(channel, "count", DEFAULT_STREAM_COUNT),
+            block_ms=self._channel_option(channel, "block_ms", DEFAULT_STREAM_BLOCK_MS),
+            claim_idle_ms=self._channel_option(channel, "claim_idle_ms", DEFAULT_CLAIM_IDLE_MS),
+            remove_on_close=consumer_name is None,
+            logger=self.logger,
+        )
+        await consumer.start()
+        self._stream_consumers[channel] = consumer
+
+    async def _stop_subscription(self, channel: str, subscription: Subscription) -> None:
+        """停止读取后处理队列中剩余的消息（最多 drain_timeout 秒，超时未处理的消息计入 discarded），stream 频道最后发送剩余的确认"""
+        consumer = self._stream_consumers.pop(channel, None)
+        if consumer is not None:
+            await consumer.stop_reading()
+        await subscription.stop(self._channel_option(channel, "drain_timeout", DEFAULT_DRAIN_TIMEOUT))
+        if consumer is not None:
+            await consumer.close()
 
     async def restart_subscriber(self, max_retries: int = 3, initial_backoff: float = 1.0) -> bool:
         """手动重启 Redis 订阅连接
@@ -189,6 +697,9 @@ class Service:
             bool: 重启是否成功
         """
         self.logger.info("Restarting Redis subscriber...")
+        if self.pubsub_hub is not None:
+            self.logger.info("Service uses the shared subscriber connection, nothing to restart.")
+            return True
         try:
             # 关闭现有订阅连接
             if self.subscriber:
@@ -209,20 +720,28 @@ class Service:
 
     async def unsubscribe(self, channel: str) -> None:
         """取消订阅"""
-        if channel in self._subscriptions:
-            await self.subscriber.unsubscribe(channel)
-            del self._subscriptions[channel]
+        if channel in self._channel_subscriptions:
+            subscription = self._channel_subscriptions.pop(channel)
+            if channel in self._subscriptions:
+                if self.pubsub_hub is not None:
+                    await self.pubsub_hub.unsubscribe(channel, subscription)
+                else:
+                    await self.subscriber.unsubscribe(channel)
+                del self._subscriptions[channel]
+            if self.local_bus is not None:
+                self.local_bus.unregister(channel, subscription)
+            await self._stop_subscription(channel, subscription)
 
     async def stop(self):
         """停止服务"""
         self._running = False
 
-        # 停止时发送最终心跳
-        if self.heartbeat_enabled and self.redis_client:
+        # 停止时发送最终心跳（由 Bot 写入心跳时 Bot 负责）
+        if self.heartbeat_enabled and self.redis_client and not self._heartbeat_managed:
             await self.send_heartbeat()
 
-        for timer in self._timers.values():
-            timer.stop()
+        timer_tasks = [task for task in (timer.stop() for timer in self._timers.values()) if task is not None]
+        await asyncio.gather(*timer_tasks, return_exceptions=True)
 
         for task in self._tasks:
             task.cancel()
@@ -231,11 +750,31 @@ class Service:
             except asyncio.CancelledError:
                 self.logger.warning(f"{self.name} Except asyncio.CancelledError")
                 continue
+
+        if self._reply_inbox is not None:
+            self._reply_inbox.close()
+
+        for channel, subscription in self._channel_subscriptions.items():
+            if self.pubsub_hub is not None:
+                await self.pubsub_hub.unsubscribe(channel, subscription)
+            if self.local_bus is not None:
+                self.local_bus.unregister(channel, subscription)
+            await self._stop_subscription(channel, subscription)
+
         try:
             await self.cleanup()
+            if self._publish_batcher is not None:
+                # 发送缓冲区中剩余的消息
+                await self._publish_batcher.close()
+            for ring in self._shm_rings.values():
+                ring.close()
+            self._shm_rings.clear()
+            for pool in self._executors.values():
+                pool.shutdown(wait=False)
+            self._executors.clear()
             if self.subscriber:
                 await self.subscriber.aclose()
-            if self.redis_client:
+            if self.redis_client and self.pubsub_hub is None:
                 await self.redis_client.aclose()
         except Exception as e:
             self.logger.warning(f"{self.name} service.stop Exception {e}")
@@ -250,6 +789,7 @@ class Service:
             data: Any,
             msg_type: MessageType,
             metadata: Optional[Dict] = None,
+            codec: Optional[str] = None,
     ) -> None:
         """发布数据为消息
 
@@ -258,12 +798,13 @@ class Service:
             data: 要发布的数据
             msg_type: 消息类型
             metadata: 元数据字典
+            codec: JSON 类型数据的序列化器名称，不指定时使用频道配置
         """
         try:
             if metadata is None:
                 metadata = {}
 
-            message = Message(data, msg_type, metadata)
+            message = Message(data, msg_type, metadata, codec=codec)
             await self.publish_message(channel, message)
         except Exception as e:
             self.logger.error(f"Error publishing data: {e}")
@@ -315,12 +856,274 @@ class Service:
             await service.publish_message('/custom/topic', custom_msg)
         """
         try:
-            encoded_message = Message.encode(message)
-            await self.redis_client.publish(channel, encoded_message)
+            if self._tracer is not None:
+                message = self._tracer.stamp(message, channel)
+            bus = self.local_bus
+            if bus is not None and bus.has_subscribers(channel) and not self._is_stream(channel):
+                # 同一 Bot 内的订阅方直接收到 Message 对象，只有存在其他订阅方时才经 Redis 发布
+                await bus.deliver(channel, message)
+                if not await bus.has_remote_subscribers(channel, self.redis_client):
+                    self._count_published(channel, 0)
+                    return
+                message.envelope[ORIGIN_ATTRIBUTE] = bus.origin
+                try:
+                    encoded_message = Message.encode(message, **self._encode_options(channel))
+                finally:
+                    message.envelope.pop(ORIGIN_ATTRIBUTE, None)
+            else:
+                encoded_message = Message.encode(message, **self._encode_options(channel))
+            await self._send_encoded(channel, message, encoded_message)
+            self._count_published(channel, len(encoded_message))
         except Exception as e:
             self.logger.error(f"Error publishing message: {e}")
             raise
 
+    def _count_published(self, channel: str, size: int) -> None:
+        counter = self._published.get(channel)
+        if counter is None:
+            counter = self._published[channel] = [0, 0]
+        counter[0] += 1
+        counter[1] += size
+
+    async def _send_encoded(self, channel: str, message: Message, encoded_message: bytes) -> None:
+        """发送一条已编码消息，开启 publish_batching 时放入批量发布器"""
+        if self._publish_batcher is not None:
+            await self._publish_batcher.publish(channel, message, encoded_message)
+        elif self._is_stream(channel):
+            await queue_stream_publish(self.redis_client, channel, encoded_message, self._stream_maxlen(channel))
+        elif len(encoded_message) >= (self._channel_option(channel, "claim_check_threshold") or float("inf")):
+            pipe = self.redis_client.pipeline(transaction=False)
+            self._queue_publish(pipe, channel, message, encoded_message)
+            await pipe.execute()
+        else:
+            await self.redis_client.publish(channel, encoded_message)
+
+    def _queue_publish(self, pipe, channel: str, message: Message, encoded_message: bytes) -> None:
+        """将一条已编码消息加入 pipeline
+
+        超过频道 claim_check_threshold 的消息只写入一次带 TTL 的 key，pub/sub 上发布引用消息；
+        stream 频道的消息直接 XADD 到流中。
+        """
+        if self._is_stream(channel):
+            queue_stream_publish(pipe, channel, encoded_message, self._stream_maxlen(channel))
+            return
+        threshold = self._channel_option(channel, "claim_check_threshold")
+        if threshold and len(encoded_message) >= threshold:
+            key = new_claim_key()
+            pipe.set(key, encoded_message, ex=self._channel_option(channel, "claim_check_ttl", DEFAULT_CLAIM_TTL))
+            pipe.publish(channel, Message.encode_claim(message, key))
+        else:
+            pipe.publish(channel, encoded_message)
+
+    def _stream_maxlen(self, channel: str) -> Optional[int]:
+        """stream 频道的近似最大长度，配置为 0 或 null 时不裁剪"""
+        return self._channel_option(channel, "maxlen", DEFAULT_STREAM_MAXLEN) or None
+
+    async def publish_many(
+            self,
+            channel_or_pairs: Union[str, Iterable[Tuple[str, Message]]],
+            messages: Optional[Iterable[Message]] = None,
+    ) -> None:
+        """批量发布消息，所有消息通过一个 Redis pipeline 发送
+
+        Args:
+            channel_or_pairs: 发布通道（此时 messages 为 Message 列表），或 (channel, Message) 序列
+            messages: 发布到同一通道的 Message 列表
+
+        Example:
+            await service.publish_many('/detections', [Message(d, MessageType.JSON) for d in detections])
+            await service.publish_many([('/a', msg_a), ('/b', msg_b)])
+        """
+        if isinstance(channel_or_pairs, str):
+            if messages is None:
+                raise ServiceError("publish_many 需要提供 messages")
+            pairs = [(channel_or_pairs, message) for message in messages]
+        else:
+            pairs = list(channel_or_pairs)
+        if not pairs:
+            return
+        if self._tracer is not None:
+            pairs = [(channel, self._tracer.stamp(message, channel)) for channel, message in pairs]
+
+        try:
+            # 按通道分组批量编码，以便使用各通道的编码配置，发送时保持原始顺序
+            groups: Dict[str, List[int]] = {}
+            for index, (channel, _) in enumerate(pairs):
+                groups.setdefault(channel, []).append(index)
+
+            encoded: List[bytes] = [b""] * len(pairs)
+            for channel, indexes in groups.items():
+                batch = Message.encode_many((pairs[index][1] for index in indexes), **self._encode_options(channel))
+                for index, data in zip(indexes, batch):
+                    encoded[index] = data
+
+            if self._publish_batcher is not None:
+                # 与 publish 共用缓冲区，保持同一频道上的发布顺序
+                futures = self._publish_batcher.enqueue(
+                    (channel, message, data) for (channel, message), data in zip(pairs, encoded)
+                )
+                results = await asyncio.gather(*futures, return_exceptions=True)
+                errors = [result for result in results if isinstance(result, BaseException)]
+                if errors:
+                    raise errors[0]
+            else:
+                pipe = self.redis_client.pipeline(transaction=False)
+                for (channel, message), data in zip(pairs, encoded):
+                    self._queue_publish(pipe, channel, message, data)
+                await pipe.execute()
+            for (channel, _), data in zip(pairs, encoded):
+                self._count_published(channel, len(data))
+        except Exception as e:
+            self.logger.error(f"Error publishing messages: {e}")
+            raise
+
+    async def request(
+            self,
+            channel: str,
+            data: Any,
+            msg_type: MessageType = MessageType.JSON,
+            metadata: Optional[Dict] = None,
+            timeout: float = DEFAULT_REQUEST_TIMEOUT,
+    ) -> Message:
+        """发送请求并等待第一个响应
+
+        请求消息的信封中带有关联 ID 与本服务的回复频道，响应方通过 responder 注册。
+        请求频道配置为 "transport": "stream" 时，请求由同一消费组中的一个响应方处理（负载均衡）。
+
+        Args:
+            channel: 请求频道
+            data: 请求数据，也可以直接传入 Message
+            msg_type: 请求数据的消息类型
+            metadata: 元数据字典
+            timeout: 等待响应的超时时间（秒）
+
+        Returns:
+            响应 Message
+
+        Raises:
+            RPCTimeoutError: 超时没有收到响应
+            RPCError: 响应方处理请求时抛出异常
+
+        Example:
+            reply = await self.request("/detector/rpc", {"image_id": 42}, timeout=1.0)
+        """
+        replies = await self._request(channel, data, msg_type, metadata, timeout, expected=1)
+        if not replies:
+            raise RPCTimeoutError(f"No reply on {channel} within {timeout}s")
+        if isinstance(replies[0], RPCError):
+            raise replies[0]
+        return replies[0]
+
+    async def request_many(
+            self,
+            channel: str,
+            data: Any,
+            msg_type: MessageType = MessageType.JSON,
+            metadata: Optional[Dict] = None,
+            count: Optional[int] = None,
+            timeout: float = DEFAULT_REQUEST_TIMEOUT,
+    ) -> List[Union[Message, RPCError]]:
+        """把请求发给频道上的所有响应方并收集响应（scatter-gather）
+
+        收到 count 个响应后立即返回，count 为 None 时收集到超时为止；超时不抛出异常，返回已收到的响应。
+        响应方出错时对应位置为 RPCError 实例。
+        """
+        return await self._request(channel, data, msg_type, metadata, timeout, expected=count)
+
+    async def _request(self, channel: str, data: Any, msg_type: MessageType, metadata: Optional[Dict],
+                       timeout: float, expected: Optional[int]) -> List[Union[Message, RPCError]]:
+        if isinstance(data, Message):
+            # 复制一份，避免修改调用方的 Message（进程内总线上订阅方共享同一对象）
+            message = Message(data.data, data.msg_type, data.metadata, codec=data.codec, envelope=dict(data.envelope))
+        else:
+            message = Message(data, msg_type, metadata or {})
+        inbox = await self._get_reply_inbox()
+        correlation_id = inbox.open(expected)
+        message.envelope[CORRELATION_ATTRIBUTE] = correlation_id
+        message.envelope[REPLY_TO_ATTRIBUTE] = inbox.channel
+        try:
+            await self.publish_message(channel, message)
+        except Exception:
+            inbox.discard(correlation_id)
+            raise
+        return await inbox.wait(correlation_id, timeout)
+
+    async def _get_reply_inbox(self) -> ReplyInbox:
+        """获取回复收件箱，第一次调用时订阅本服务的回复频道"""
+        if self._reply_inbox_task is None:
+            self._reply_inbox_task = asyncio.ensure_future(self._open_reply_inbox())
+        try:
+            return await asyncio.shield(self._reply_inbox_task)
+        except Exception:
+            self._reply_inbox_task = None  # 下次请求时重试
+            raise
+
+    async def _open_reply_inbox(self) -> ReplyInbox:
+        inbox = ReplyInbox(new_reply_channel(self.name))
+        self.add_subscription(inbox.channel, inbox.resolve, decode=True)
+        try:
+            await self._subscribe_now(inbox.channel)
+        except Exception:
+            self._channel_subscriptions.pop(inbox.channel, None)
+            self._subscriptions.pop(inbox.channel, None)
+            raise
+        self._reply_inbox = inbox
+        return inbox
+
+    def responder(
+            self,
+            channel: str,
+            msg_type: MessageType = MessageType.JSON,
+            lazy: bool = False,
+            concurrency: Optional[int] = None,
+    ) -> callable:
+        """注册请求处理函数的装饰器
+
+        处理函数收到请求 Message，返回值作为响应数据（按 msg_type 封装，也可以直接返回 Message）发布到请求方的回复频道；
+        抛出的异常以错误响应返回，请求方收到 RPCError。不带回复频道的普通消息同样会调用处理函数，返回值被忽略。
+
+        Example:
+            @self.responder("/detector/rpc")
+            async def detect(message):
+                return {"boxes": await self.model(message.data)}
+        """
+        def decorator(func: callable) -> callable:
+            self.add_subscription(channel, self._responder_callback(channel, func, msg_type), decode=True, lazy=lazy,
+                                  concurrency=concurrency)
+            return func
+        return decorator
+
+    def _responder_callback(self, channel: str, func: callable, msg_type: MessageType) -> callable:
+        async def handler(message):
+            reply_to = message.envelope.get(REPLY_TO_ATTRIBUTE)
+            try:
+                result = func(message)
+                if inspect.isawaitable(result):
+                    result = await result
+            except Exception as e:
+                if reply_to is None:
+                    raise
+                self.logger.error(f"Error handling request on {channel}: {e}", exc_info=True)
+                reply = Message(None, MessageType.JSON)
+                reply.envelope[ERROR_ATTRIBUTE] = f"{type(e).__name__}: {e}"
+            else:
+                if reply_to is None:
+                    return
+                if isinstance(result, Message):
+                    # 复制一份再写入关联 ID，返回的可能是进程内总线上共享的请求对象
+                    reply = Message(result.data, result.msg_type, result.metadata, codec=result.codec,
+                                    envelope=dict(result.envelope))
+                else:
+                    reply = Message(result, msg_type)
+            reply.envelope.pop(REPLY_TO_ATTRIBUTE, None)
+            reply.envelope[CORRELATION_ATTRIBUTE] = message.envelope.get(CORRELATION_ATTRIBUTE, "")
+            await self.publish_message(reply_to, reply)
+        return handler
+
+    def rpc_stats(self) -> Optional[Dict[str, Any]]:
+        """请求 / 响应统计：等待中的请求数、请求数、响应数、超时数与迟到的响应数，未发送过请求时返回 None"""
+        return self._reply_inbox.get_stats() if self._reply_inbox is not None else None
+
     async def publish_messages_raw(self, channel: str, message_raw: Any) -> None:
         """ 发送原始消息到 Redis 的指定 channel """
         try:
@@ -0,0 +1,268 @@
+"""
+共享内存数据平面
+
+同一主机上的服务之间传递大帧（IMAGE / NUMPY / BINARY）时，帧数据写入共享内存环形缓冲区的一个槽位，
+Redis 上只发布一个很小的句柄消息，订阅方按句柄把槽位映射为 NumPy 视图，不再经过 Redis 拷贝。
+
+槽位保护:
+    - 每个槽位有一个递增的序号（seq），写入前后各加一，句柄记录写入完成后的序号；
+      读取方发现序号不一致即说明槽位已被回收复用，抛出 StaleFrameError。
+    - 读取方持有视图期间对槽位加共享文件锁（POSIX），写入方只会复用能加上排他锁的槽位，
+      因此慢读者持有的帧不会被覆盖，所有槽位都被占用时发布方回退为经 Redis 传输完整载荷。
+    - POSIX 文件锁以进程为单位，关闭同一文件的任何一个描述符都会释放本进程在该文件上的全部锁，
+      因此每个名称在一个进程内只允许一个映射：attach 对本进程创建的名称返回创建方的环形缓冲区，
+      对其他名称按名称缓存，不要绕过 attach 另行映射同一名称。
+"""
+import os
+import struct
+import threading
+import uuid
+import weakref
+
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+from .exceptions import CodecError
+
+try:
+    import fcntl
+except ImportError:  # Windows 下没有文件锁，只依赖序号检测
+    fcntl = None
+
+BytesLike = Union[bytes, bytearray, memoryview]
+
+# 环形缓冲区头: magic(8) + version(4) + slot_count(4) + slot_size(8)，占 64 字节
+_RING_HEADER = struct.Struct("<8sIIQ")
+_RING_MAGIC = b"LBSHMRNG"
+_RING_VERSION = 1
+# 槽位头: seq(8) + nbytes(8)，占 64 字节，保证槽位数据按 64 字节对齐
+_SLOT_HEADER = struct.Struct("<QQ")
+_HEADER_SIZE = 64
+
+DEFAULT_SLOT_COUNT = 8
+# 未配置槽位大小时按首帧大小向上取整到该粒度
+_SLOT_SIZE_GRANULARITY = 1 << 20
+
+
+class StaleFrameError(CodecError):
+    """共享内存槽位已被新帧覆盖或已释放"""
+    pass
+
+
+# 本进程内各槽位被读取方持有的次数，POSIX 文件锁以进程为单位，需要在进程内自行计数
+_local_pins: Dict[Tuple[str, int], int] = {}
+_pins_lock = threading.Lock()
+# 本进程映射的他人共享内存，按名称缓存
+_attached: Dict[str, "SharedMemoryRing"] = {}
+# 本进程创建的环形缓冲区，attach 自己创建的名称时直接返回，不另建映射
+_owned: Dict[str, "SharedMemoryRing"] = {}
+
+
+def _reset_after_fork() -> None:
+    global _pins_lock
+    _local_pins.clear()
+    _owned.clear()
+    _pins_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _untrack(shm: shared_memory.SharedMemory) -> None:
+    """映射他人创建的共享内存时，避免本进程退出时被 resource_tracker 误删"""
+    try:
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(shm._name, "shared_memory")
+    except Exception:
+        pass
+
+
+class SharedMemoryRing:
+    """固定大小槽位的共享内存环形缓冲区
+
+    Args:
+        slot_count: 槽位数量，应大于订阅方同时持有的帧数
+        slot_size: 每个槽位的容量（字节），None 表示按首次写入的帧大小自动确定
+
+    每个名称在一个进程内只有一个映射（见模块说明），读取方应通过 attach / read_frame 获取。
+    """
+
+    def __init__(self, slot_count: int = DEFAULT_SLOT_COUNT, slot_size: Optional[int] = None):
+        self.slot_count = slot_count
+        self.slot_size = slot_size
+        self.name: Optional[str] = None
+        self._shm: Optional[shared_memory.SharedMemory] = None
+        self._owner = True
+        self._next_slot = 0
+
+    @classmethod
+    def attach(cls, name: str) -> "SharedMemoryRing":
+        """映射其他进程创建的环形缓冲区，同一进程内按名称复用；本进程创建的名称返回创建方本身"""
+        ring = _owned.get(name) or _attached.get(name)
+        if ring is not None:
+            return ring
+
+        try:
+            shm = shared_memory.SharedMemory(name=name)
+        except FileNotFoundError:
+            raise StaleFrameError(f"Shared memory {name} no longer exists") from None
+        _untrack(shm)
+        magic, version, slot_count, slot_size = _RING_HEADER.unpack_from(shm.buf)
+        if magic != _RING_MAGIC or version != _RING_VERSION:
+            shm.close()
+            raise CodecError(f"Shared memory {name} is not a liteboty ring")
+
+        ring = cls(slot_count, slot_size)
+        ring.name = name
+        ring._shm = shm
+        ring._owner = False
+        _release_unlinked_rings()
+        _attached[name] = ring
+        return ring
+
+    def _slot_offset(self, slot: int) -> int:
+        stride = _HEADER_SIZE + self.slot_size
+        return _HEADER_SIZE + slot * stride
+
+    def _create(self, nbytes: int) -> None:
+        if self.slot_size is None:
+            self.slot_size = -(-nbytes // _SLOT_SIZE_GRANULARITY) * _SLOT_SIZE_GRANULARITY
+        # 槽位大小按 64 字节对齐，保证每个槽位的数据区对齐
+        self.slot_size = -(-self.slot_size // _HEADER_SIZE) * _HEADER_SIZE
+        size = self._slot_offset(self.slot_count)
+        self._shm = shared_memory.SharedMemory(name=f"lb_{os.getpid()}_{uuid.uuid4().hex[:12]}", create=True, size=size)
+        self.name = self._shm.name
+        _owned[self.name] = self
+        _RING_HEADER.pack_into(self._shm.buf, 0, _RING_MAGIC, _RING_VERSION, self.slot_count, self.slot_size)
+
+    def _try_lock_slot(self, slot: int) -> bool:
+        """写入方对槽位加排他锁，失败说明有读取方正在持有该槽位"""
+        if _local_pins.get((self.name, slot)):
+            return False
+        if fcntl is None:
+            return True
+        try:
+            fcntl.lockf(self._shm._fd, fcntl.LOCK_EX | fcntl.LOCK_NB, _HEADER_SIZE + self.slot_size,
+                        self._slot_offset(slot))
+            return True
+        except OSError:
+            return False
+
+    def _unlock_slot(self, slot: int) -> None:
+        if fcntl is not None:
+            fcntl.lockf(self._shm._fd, fcntl.LOCK_UN, _HEADER_SIZE + self.slot_size, self._slot_offset(slot))
+
+    def write(self, parts: List[BytesLike]) -> Optional[str]:
+        """写入一帧，返回句柄；帧超过槽位容量或所有槽位都被占用时返回 None"""
+        nbytes = sum(memoryview(part).nbytes for part in parts)
+        if self._shm is None:
+            self._create(nbytes)
+        if nbytes > self.slot_size:
+            return None
+
+        with _pins_lock:
+            for _ in range(self.slot_count):
+                slot = self._next_slot
+                self._next_slot = (self._next_slot + 1) % self.slot_count
+                if self._try_lock_slot(slot):
+                    break
+            else:
+                return None
+
+            try:
+                buf = self._shm.buf
+                offset = self._slot_offset(slot)
+                seq, _ = _SLOT_HEADER.unpack_from(buf, offset)
+                # 写入期间序号为奇数，读取方据此识别不完整的帧
+                _SLOT_HEADER.pack_into(buf, offset, seq + 1, nbytes)
+                pos = offset + _HEADER_SIZE
+                for part in parts:
+                    part = memoryview(part).cast("B")
+                    buf[pos:pos + part.nbytes] = part
+                    pos += part.nbytes
+                seq += 2
+                _SLOT_HEADER.pack_into(buf, offset, seq, nbytes)
+            finally:
+                self._unlock_slot(slot)
+
+        return f"{self.name}:{slot}:{seq}"
+
+    def read(self, slot: int, seq: int) -> memoryview:
+        """按句柄读取一帧，返回的 memoryview 存活期间槽位不会被复用"""
+        with _pins_lock:
+            key = (self.name, slot)
+            pins = _local_pins.get(key, 0)
+            if pins == 0 and fcntl is not None:
+                try:
+                    fcntl.lockf(self._shm._fd, fcntl.LOCK_SH | fcntl.LOCK_NB, _HEADER_SIZE + self.slot_size,
+                                self._slot_offset(slot))
+                except OSError:
+                    raise StaleFrameError(f"Slot {slot} of {self.name} is being overwritten") from None
+
+            offset = self._slot_offset(slot)
+            current_seq, nbytes = _SLOT_HEADER.unpack_from(self._shm.buf, offset)
+            if current_seq != seq:
+                if pins == 0:
+                    self._unlock_slot(slot)
+                raise StaleFrameError(f"Slot {slot} of {self.name} was reused (seq {current_seq} != {seq})")
+            _local_pins[key] = pins + 1
+
+        # 通过一个持有终结器的 uint8 数组导出缓冲区，所有派生视图释放后自动解除占用
+        lease = np.frombuffer(self._shm.buf, dtype=np.uint8, count=nbytes, offset=offset + _HEADER_SIZE)
+        lease.flags.writeable = False
+        weakref.finalize(lease, self._release, slot)
+        return memoryview(lease)
+
+    def _release(self, slot: int) -> None:
+        with _pins_lock:
+            key = (self.name, slot)
+            pins = _local_pins.get(key, 0) - 1
+            if pins > 0:
+                _local_pins[key] = pins
+                return
+            _local_pins.pop(key, None)
+            if self._shm is not None:
+                self._unlock_slot(slot)
+
+    def close(self) -> None:
+        """关闭映射，创建方同时删除共享内存"""
+        if self._shm is None:
+            return
+        shm, self._shm = self._shm, None
+        if self._owner:
+            _owned.pop(self.name, None)
+            try:
+                shm.unlink()
+            except FileNotFoundError:
+                pass
+        try:
+            shm.close()
+        except BufferError:
+            # 仍有视图引用该共享内存，映射会在视图释放后由 GC 回收
+            pass
+
+
+def _release_unlinked_rings() -> None:
+    """释放创建方已删除、且本进程不再持有任何帧的映射
+
+    只处理 _attached 中的映射：每个名称在本进程内只有这一个描述符，关闭它不会释放其他映射依赖的锁。
+    """
+    shm_dir = "/dev/shm"
+    if not os.path.isdir(shm_dir):
+        return
+    for name, ring in list(_attached.items()):
+        if os.path.exists(os.path.join(shm_dir, name)):
+            continue
+        if any(key[0] == name for key in _local_pins):
+            continue
+        _attached.pop(name, None)
+        ring.close()
+
+
+def read_frame(handle: str) -> memoryview:
+    """按句柄 "name:slot:seq" 读取共享内存中的一帧"""
+    name, slot, seq = handle.rsplit(":", 2)
+    return SharedMemoryRing.attach(name).read(int(slot), int(seq))
@@ -0,0 +1,291 @@
+"""
+Redis Streams 传输
+
+频道配置 "transport": "stream" 时，发布使用 XADD（MAXLEN ~ 近似裁剪），订阅使用消费组 XREADGROUP，
+同一消费组内的多个服务副本分摊消息，服务重启期间发布的消息也不会丢失。消息编码与 pub/sub 相同。
+
+- 处理成功后 XACK，确认请求在同一轮事件循环内合并为一条命令
+- 处理函数抛出异常的消息不确认，空闲超过 claim_idle_ms 后由同组的消费者通过 XAUTOCLAIM 认领并重新处理
+- 解码失败的消息直接确认，避免无法处理的消息被反复认领
+- 流或消费组被删除（NOGROUP）时重新创建消费组；Redis 6.2 之前没有 XAUTOCLAIM，改用 XPENDING + XCLAIM 认领
+"""
+import asyncio
+import logging
+import os
+import uuid
+import socket
+
+from typing import Any, Dict, List, Optional, Set
+
+import redis.asyncio as aioredis
+
+from .subscription import Subscription
+
+STREAM_DATA_FIELD = b"d"
+DEFAULT_STREAM_MAXLEN = 10000
+DEFAULT_STREAM_COUNT = 32
+DEFAULT_STREAM_BLOCK_MS = 1000
+DEFAULT_CLAIM_IDLE_MS = 30000
+
+
+def default_consumer_name(service_name: str) -> str:
+    """每个服务实例唯一的消费者名（同一进程内的多个副本也各有自己的未确认列表）"""
+    return f"{service_name}-{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+
+def _unknown_command(error: Exception) -> bool:
+    return "unknown command" in str(error).lower()
+
+
+def _next_id(entry_id) -> str:
+    """流 ID 的下一个 ID，用于 XPENDING 分页（"(" 排他区间需要 Redis 6.2）"""
+    if isinstance(entry_id, bytes):
+        entry_id = entry_id.decode()
+    ms, _, seq = entry_id.partition("-")
+    return f"{ms}-{int(seq or 0) + 1}"
+
+
+def queue_stream_publish(pipe_or_client, stream: str, data: bytes, maxlen: Optional[int] = DEFAULT_STREAM_MAXLEN):
+    """XADD 一条已编码消息，maxlen 为 None 时不裁剪"""
+    return pipe_or_client.xadd(
+        stream, {STREAM_DATA_FIELD: data}, maxlen=maxlen, approximate=maxlen is not None
+    )
+
+
+class StreamConsumer:
+    """一个流的消费组读取任务，读取的消息放入订阅的入站队列
+
+    Args:
+        redis_client: Redis 客户端
+        stream: 流的 key（即频道名）
+        subscription: 处理消息的订阅
+        group: 消费组名，同组的消费者分摊消息
+        consumer: 消费者名，同组内需唯一
+        count: 每次 XREADGROUP 读取的最大条数
+        block_ms: XREADGROUP 的阻塞等待时间
+        claim_idle_ms: 未确认消息空闲超过该时间后被认领重试，0 表示不认领
+        remove_on_close: 关闭时如果本消费者没有未确认的消息，从消费组中删除本消费者（自动生成的消费者名每次启动都不同）
+        logger: 日志器
+    """
+
+    def __init__(self, redis_client: aioredis.Redis, stream: str, subscription: Subscription, group: str,
+                 consumer: str, count: int = DEFAULT_STREAM_COUNT, block_ms: int = DEFAULT_STREAM_BLOCK_MS,
+                 claim_idle_ms: int = DEFAULT_CLAIM_IDLE_MS, remove_on_close: bool = False,
+                 logger: Optional[logging.Logger] = None):
+        self.redis_client = redis_client
+        self.stream = stream
+        self.subscription = subscription
+        self.group = group
+        self.consumer = consumer
+        self.count = count
+        self.block_ms = block_ms
+        self.claim_idle_ms = claim_idle_ms
+        self.remove_on_close = remove_on_close
+        self.logger = logger or logging.getLogger("liteboty_default")
+        self._channel = stream.encode()
+        self._pending_acks: List[Any] = []
+        # 已放入入站队列、尚未处理完成的条目，认领时跳过，避免本消费者重复处理
+        self._in_flight: Set[Any] = set()
+        self._ack_task: Optional[asyncio.Task] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self._autoclaim = True  # Redis 不支持 XAUTOCLAIM 时改为 False
+        self.read = 0
+        self.acked = 0
+        self.reclaimed = 0
+
+    async def _create_group(self) -> None:
+        try:
+            await self.redis_client.xgroup_create(self.stream, self.group, id="$", mkstream=True)
+        except aioredis.ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    async def start(self) -> None:
+        await self._create_group()
+        self.subscription.ack = self.ack
+        self._stopping = False
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._reader())
+
+    async def _reader(self) -> None:
+        loop = asyncio.get_running_loop()
+        backoff = 1.0
+        next_claim = loop.time()
+        while not self._stopping:
+            try:
+                if self.claim_idle_ms and loop.time() >= next_claim:
+                    await self._reclaim()
+                    next_claim = loop.time() + self.claim_idle_ms / 1000
+                response = await self.redis_client.xreadgroup(
+                    self.group, self.consumer, {self.stream: ">"}, count=self.count, block=self.block_ms
+                )
+                backoff = 1.0
+            except asyncio.CancelledError:
+                raise
+            except aioredis.ResponseError as e:
+                if "NOGROUP" in str(e):
+                    # 流或消费组被删除，重新创建后继续读取（删除期间发布的消息无法找回）
+                    self.logger.warning(f"Consumer group {self.group} on {self.stream} is missing, recreating: {e}")
+                    try:
+                        await self._create_group()
+                        continue
+                    except Exception as create_error:
+                        e = create_error
+                self.logger.error(f"Stream {self.stream} read failed, retrying in {backoff}s: {e}")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 30)
+                continue
+            except (aioredis.ConnectionError, aioredis.TimeoutError) as e:
+                self.logger.warning(f"Stream {self.stream} read failed, retrying in {backoff}s: {e}")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 30)
+                continue
+            for _, entries in response or ():
+                await self._dispatch(entries)
+
+    async def _reclaim(self) -> None:
+        """认领同组内空闲超时的未确认消息（包括已退出的消费者留下的）"""
+        if self._autoclaim:
+            try:
+                await self._autoclaim_pending()
+                return
+            except aioredis.ResponseError as e:
+                if not _unknown_command(e):
+                    raise
+                self.logger.info(f"XAUTOCLAIM is not supported, reclaiming {self.stream} with XPENDING + XCLAIM")
+                self._autoclaim = False
+        await self._claim_pending()
+
+    async def _claim_pending(self) -> None:
+        """XPENDING 找出空闲超时的消息后 XCLAIM，适用于 Redis 6.2 之前的版本"""
+        start_id = "-"
+        while True:
+            pending = await self.redis_client.xpending_range(
+                self.stream, self.group, min=start_id, max="+", count=self.count
+            )
+            if not pending:
+                break
+            ids = [
+                item["message_id"] for item in pending
+                if item["time_since_delivered"] >= self.claim_idle_ms and item["message_id"] not in self._in_flight
+            ]
+            if ids:
+                entries = await self.redis_client.xclaim(
+                    self.stream, self.group, self.consumer, min_idle_time=self.claim_idle_ms, message_ids=ids
+                )
+                if entries:
+                    self.reclaimed += len(entries)
+                    await self._dispatch(entries)
+            if len(pending) < self.count:
+                break
+            start_id = _next_id(pending[-1]["message_id"])
+
+    async def _autoclaim_pending(self) -> None:
+        start_id = "0-0"
+        while True:
+            result = await self.redis_client.xautoclaim(
+                self.stream, self.group, self.consumer, min_idle_time=self.claim_idle_ms,
+                start_id=start_id, count=self.count,
+            )
+            start_id, entries = result[0], result[1]
+            entries = [entry for entry in entries if entry[0] not in self._in_flight]
+            if entries:
+                self.reclaimed += len(entries)
+                await self._dispatch(entries)
+            # 游标回到 0-0 才说明扫描完毕，本页条目全部在处理中时仍需继续
+            if start_id in (b"0-0", "0-0"):
+                break
+
+    async def _dispatch(self, entries) -> None:
+        for entry_id, fields in entries:
+            self.read += 1
+            data = fields.get(STREAM_DATA_FIELD) if fields else None
+            if data is None:
+                data = fields.get(STREAM_DATA_FIELD.decode()) if fields else None
+            if data is None:
+                # 已被裁剪或格式不符的条目，确认后跳过
+                self.ack_id(entry_id)
+                continue
+            self._in_flight.add(entry_id)
+            await self.subscription.dispatch({
+                "type": "message",
+                "pattern": None,
+                "channel": self._channel,
+                "data": data,
+                "stream_id": entry_id,
+            })
+
+    def ack(self, raw_message: Dict[str, Any], success: bool = True) -> None:
+        """订阅处理完一条消息后调用，处理失败的消息不确认，留待认领重试"""
+        entry_id = raw_message.get("stream_id")
+        if entry_id is None:
+            return
+        if success:
+            # 确认发送完成前仍视为处理中，避免 XACK 返回前被认领重复处理
+            self.ack_id(entry_id)
+        else:
+            self._in_flight.discard(entry_id)
+
+    def ack_id(self, entry_id) -> None:
+        """登记待确认的消息，同一轮事件循环内的确认合并为一条 XACK"""
+        self._pending_acks.append(entry_id)
+        if self._ack_task is None or self._ack_task.done():
+            self._ack_task = asyncio.get_running_loop().create_task(self._flush_acks())
+
+    async def _flush_acks(self) -> None:
+        # XACK 进行期间登记的确认不会再创建任务，循环发送直到没有待确认的消息
+        while self._pending_acks:
+            ids, self._pending_acks = self._pending_acks, []
+            try:
+                self.acked += await self.redis_client.xack(self.stream, self.group, *ids)
+            except Exception as e:
+                # 未确认的消息会在 claim_idle_ms 后被重新认领
+                self.logger.warning(f"Failed to ack {len(ids)} entries on {self.stream}: {e}")
+            finally:
+                self._in_flight.difference_update(ids)
+
+    async def stop_reading(self) -> None:
+        """停止读取：等待当前的阻塞读取返回并分发，超时才取消，避免中断进行中的 XREADGROUP"""
+        if self._task is None:
+            return
+        self._stopping = True
+        done, _ = await asyncio.wait({self._task}, timeout=self.block_ms / 1000 + 1)
+        if not done:
+            self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    async def close(self) -> None:
+        """停止读取并发送剩余的确认"""
+        await self.stop_reading()
+        if self._ack_task is not None:
+            await asyncio.gather(self._ack_task, return_exceptions=True)
+            self._ack_task = None
+        await self._flush_acks()
+        self.subscription.ack = None
+        if self.remove_on_close:
+            await self._remove_consumer()
+
+    async def _remove_consumer(self) -> None:
+        """没有未确认的消息时从消费组中删除本消费者，有则保留，由同组消费者认领"""
+        try:
+            pending = await self.redis_client.xpending_range(
+                self.stream, self.group, min="-", max="+", count=1, consumername=self.consumer
+            )
+            if not pending:
+                await self.redis_client.xgroup_delconsumer(self.stream, self.group, self.consumer)
+        except Exception as e:
+            self.logger.debug(f"Failed to remove consumer {self.consumer} from {self.stream}: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "stream": self.stream,
+            "group": self.group,
+            "consumer": self.consumer,
+            "read": self.read,
+            "acked": self.acked,
+            "reclaimed": self.reclaimed,
+            "pending_acks": len(self._pending_acks),
+            "in_flight": len(self._in_flight),
+        }
@@ -0,0 +1,419 @@
+"""
+订阅的进程内入站队列
+
+Redis 订阅连接由一个读取任务（PubSub.run）持续读取，读取到的消息只放入对应频道的有界队列，
+处理函数在各自的工作任务中从队列取出消息执行，慢处理函数不会再让消息堆积在 Redis 的客户端输出缓冲区。
+
+队列满时的溢出策略:
+    - block: 读取任务等待队列有空位（背压），期间同一连接上的其他频道也会暂停读取
+    - drop_oldest: 丢弃队列中最旧的消息
+    - drop_newest: 丢弃新到达的消息
+    - conflate: 只保留最新的一条消息，适合只关心最新状态的频道（如位姿、最新一帧）
+
+并发处理:
+    concurrency > 1 时同一订阅启动多个处理任务，I/O 密集的处理函数可以同时处理多条消息。
+    指定 key_func 时，同一分区键的消息按到达顺序依次处理，不同分区键之间并发。
+
+批量处理:
+    BatchSubscription 把解码后的消息攒成批次，批次满或等待超时后以列表调用处理函数，停止时不再等待凑满，
+    处理完进行中的批次、剩余的不完整批次与队列中的消息（同样受 drain_timeout 限制）。
+
+停止:
+    停止时先等待处理任务处理完队列中剩余的消息（最多 drain_timeout 秒），超时后取消处理任务，
+    仍在队列中的消息不再处理，计入 discarded（stream 频道中这些消息未确认，会被同组消费者认领）。
+"""
+import time
+import asyncio
+import logging
+
+from enum import Enum
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional
+
+from .exceptions import ConfigError, CodecError
+from .metrics import Histogram, BATCH_SIZE_BUCKETS, LATENCY_MS_BUCKETS
+
+DEFAULT_QUEUE_SIZE = 100
+DEFAULT_DRAIN_TIMEOUT = 5.0
+# 原始消息字典中记录到达时间（time.perf_counter）的键
+RECEIVED_AT_KEY = "received_at"
+
+
+class OverflowPolicy(str, Enum):
+    BLOCK = "block"
+    DROP_OLDEST = "drop_oldest"
+    DROP_NEWEST = "drop_newest"
+    CONFLATE = "conflate"
+
+
+DEFAULT_OVERFLOW_POLICY = OverflowPolicy.BLOCK
+
+
+class SubscriptionStats:
+    """单个订阅的队列统计"""
+
+    def __init__(self):
+        self.received = 0    # 读取任务收到的消息数
+        self.dropped = 0     # 因队列满被丢弃的消息数
+        self.discarded = 0   # 停止时仍在队列中、未处理的消息数
+        self.processed = 0   # 处理完成的消息数
+        self.errors = 0      # 处理函数抛出异常的次数（包括解码失败）
+        self.decode_errors = 0  # 消息解码失败的次数
+        self.bytes_in = 0    # 收到的 Redis 消息字节数（进程内总线投递的消息不计）
+        self.max_depth = 0   # 队列深度峰值
+        self.in_flight = 0   # 正在处理的消息数
+
+    def as_dict(self) -> Dict[str, int]:
+        return dict(self.__dict__)
+
+
+class InboundQueue:
+    """带溢出策略的有界异步队列，需在事件循环中创建"""
+
+    def __init__(self, maxsize: int = DEFAULT_QUEUE_SIZE, policy: OverflowPolicy = DEFAULT_OVERFLOW_POLICY,
+                 stats: Optional[SubscriptionStats] = None):
+        if policy == OverflowPolicy.CONFLATE:
+            maxsize = 1
+        if maxsize <= 0 and policy != OverflowPolicy.BLOCK:
+            raise ConfigError(f"Overflow policy {policy.value} requires a positive queue_size")
+        self.maxsize = maxsize
+        self.policy = policy
+        self.stats = stats or SubscriptionStats()
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+
+    async def put(self, item: Any) -> bool:
+        """放入一条消息，返回是否入队（drop_newest 策略下队列满时返回 False）"""
+        self.stats.received += 1
+        if self.policy == OverflowPolicy.BLOCK:
+            await self._queue.put(item)
+        else:
+            if self._queue.full():
+                self.stats.dropped += 1
+                if self.policy == OverflowPolicy.DROP_NEWEST:
+                    return False
+                self._queue.get_nowait()
+                self._queue.task_done()
+            self._queue.put_nowait(item)
+        depth = self._queue.qsize()
+        if depth > self.stats.max_depth:
+            self.stats.max_depth = depth
+        return True
+
+    async def get(self) -> Any:
+        return await self._queue.get()
+
+    def get_nowait(self) -> Any:
+        return self._queue.get_nowait()
+
+    def task_done(self) -> None:
+        self._queue.task_done()
+
+    async def join(self) -> None:
+        await self._queue.join()
+
+    def qsize(self) -> int:
+        return self._queue.qsize()
+
+    def empty(self) -> bool:
+        return self._queue.empty()
+
+
+class Subscription:
+    """一个频道的订阅：入站队列 + 处理任务
+
+    Args:
+        channel: 频道名
+        callback: 处理函数，接收 Redis 原始消息（或包装后的解码处理函数），可以是协程函数
+        queue_size: 队列容量，block 策略下 0 表示不限
+        overflow: 溢出策略
+        concurrency: 同时处理的消息数上限
+        key_func: 从 Redis 原始消息提取分区键，同一分区键的消息保持顺序；返回 None 的消息不受顺序约束
+        decoded: 处理函数接收解码后的 Message，此类订阅可以由进程内总线直接投递 Message 对象
+        logger: 处理函数异常时使用的日志器
+    """
+
+    def __init__(self, channel: str, callback: Callable, queue_size: int = DEFAULT_QUEUE_SIZE,
+                 overflow: OverflowPolicy = DEFAULT_OVERFLOW_POLICY, concurrency: int = 1,
+                 key_func: Optional[Callable[[Dict[str, Any]], Optional[Hashable]]] = None,
+                 decoded: bool = False, logger: Optional[logging.Logger] = None):
+        if concurrency < 1:
+            raise ConfigError(f"Subscription {channel}: concurrency must be >= 1")
+        self.channel = channel
+        self.callback = callback
+        self.queue_size = queue_size
+        self.overflow = OverflowPolicy(overflow)
+        self.concurrency = concurrency
+        self.key_func = key_func
+        self.decoded = decoded
+        # 返回 True 的原始消息在入队前丢弃，由进程内总线设置，用于去重
+        self.drop_filter: Optional[Callable[[Dict[str, Any]], bool]] = None
+        # 每条原始消息处理结束后以 (raw_message, success) 调用，由 Streams 传输设置，用于确认消息
+        self.ack: Optional[Callable[[Dict[str, Any], bool], None]] = None
+        # 开启追踪时在原始消息中记录到达时间，用于统计排队时间
+        self.stamp_arrival = False
+        self.handler_ms = Histogram(LATENCY_MS_BUCKETS)  # 处理函数耗时（批量订阅为每批）
+        self.logger = logger or logging.getLogger("liteboty_default")
+        self.stats = SubscriptionStats()
+        self.queue: Optional[InboundQueue] = None
+        self._tasks: List[asyncio.Task] = []
+        # 分区键 -> 该分区最后一条消息的完成信号
+        self._partition_tails: Dict[Hashable, asyncio.Future] = {}
+
+    async def dispatch(self, raw_message: Dict[str, Any]) -> None:
+        """读取任务调用的 PubSub 处理函数，只负责入队"""
+        if self.drop_filter is not None and self.drop_filter(raw_message):
+            return
+        if self.stamp_arrival:
+            raw_message.setdefault(RECEIVED_AT_KEY, time.perf_counter())
+        data = raw_message.get("data")
+        if data is not None:
+            self.stats.bytes_in += len(data)
+        await self.queue.put(raw_message)
+
+    def start(self) -> None:
+        if self.queue is None:
+            self.queue = InboundQueue(self.queue_size, self.overflow, self.stats)
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+
+    async def _worker(self) -> None:
+        while True:
+            raw_message = await self.queue.get()
+            try:
+                if self.key_func is None or self.concurrency == 1:
+                    success = await self._handle(raw_message)
+                else:
+                    success = await self._handle_ordered(raw_message)
+                if self.ack is not None:
+                    self.ack(raw_message, success)
+            finally:
+                self.queue.task_done()
+
+    async def _handle_ordered(self, raw_message: Dict[str, Any]) -> bool:
+        """同一分区键的消息等待前一条处理完成后再处理
+
+        处理任务按 FIFO 从队列取出消息，取出后立即（无 await）登记为该分区的最新一条，因此分区内顺序与到达顺序一致。
+        """
+        try:
+            key = self.key_func(raw_message)
+        except Exception as e:
+            self.logger.warning(f"Failed to extract partition key on {self.channel}: {e}")
+            key = None
+        if key is None:
+            return await self._handle(raw_message)
+
+        previous = self._partition_tails.get(key)
+        done = asyncio.get_running_loop().create_future()
+        self._partition_tails[key] = done
+        try:
+            if previous is not None:
+                await asyncio.shield(previous)
+            return await self._handle(raw_message)
+        finally:
+            if not done.done():
+                done.set_result(None)
+            if self._partition_tails.get(key) is done:
+                del self._partition_tails[key]
+
+    async def _handle(self, raw_message: Any, count: int = 1) -> bool:
+        """调用处理函数，返回是否处理成功"""
+        self.stats.in_flight += count
+        started = time.perf_counter()
+        try:
+            result = self.callback(raw_message)
+            if asyncio.iscoroutine(result) or isinstance(result, asyncio.Future):
+                await result
+            self.stats.processed += count
+            return True
+        except asyncio.CancelledError:
+            raise
+        except CodecError as e:
+            self.stats.errors += 1
+            self.stats.decode_errors += 1
+            self.logger.error(f"Error decoding message on {self.channel}: {e}")
+            return False
+        except Exception as e:
+            self.stats.errors += 1
+            self.logger.error(f"Error handling message on {self.channel}: {e}", exc_info=True)
+            return False
+        finally:
+            self.stats.in_flight -= count
+            self.handler_ms.observe((time.perf_counter() - started) * 1000)
+
+    async def stop(self, drain_timeout: Optional[float] = DEFAULT_DRAIN_TIMEOUT) -> None:
+        """停止处理任务
+
+        先等待队列中剩余的消息处理完（最多 drain_timeout 秒，0 或 None 表示不等待），再取消处理任务；
+        仍在队列中的消息被丢弃并计入 stats.discarded。调用前应先停止向队列放入消息。
+        """
+        if self.queue is not None and self._tasks and drain_timeout:
+            try:
+                await asyncio.wait_for(self.queue.join(), drain_timeout)
+            except asyncio.TimeoutError:
+                self.logger.warning(
+                    f"Subscription {self.channel} did not drain within {drain_timeout}s, "
+                    f"discarding {self.queue.qsize()} queued messages"
+                )
+        await self._cancel_workers()
+        if self.queue is not None:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+                self.queue.task_done()
+                self.stats.discarded += 1
+
+    async def _cancel_workers(self) -> None:
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._partition_tails.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = self.stats.as_dict()
+        stats.update({
+            "depth": self.queue.qsize() if self.queue is not None else 0,
+            "queue_size": self.queue.maxsize if self.queue is not None else self.queue_size,
+            "overflow": self.overflow.value,
+            "concurrency": self.concurrency,
+            "handler_ms": self.handler_ms.as_dict(),
+        })
+        return stats
+
+
+class BatchSubscription(Subscription):
+    """批量处理的订阅
+
+    Args:
+        channel: 频道名
+        callback: 批处理函数，接收 Message 列表，可以是协程函数
+        decoder: 将 Redis 原始消息解码为 Message 的协程函数
+        max_batch: 批次的最大消息数
+        max_wait_ms: 批次中第一条消息到达后最多等待的毫秒数
+        queue_size / overflow / logger: 同 Subscription
+    """
+
+    def __init__(self, channel: str, callback: Callable[[List[Any]], Any],
+                 decoder: Callable[[Dict[str, Any]], Awaitable[Any]], max_batch: int = 32,
+                 max_wait_ms: float = 10, queue_size: int = DEFAULT_QUEUE_SIZE,
+                 overflow: OverflowPolicy = DEFAULT_OVERFLOW_POLICY, logger: Optional[logging.Logger] = None):
+        if max_batch < 1:
+            raise ConfigError(f"Subscription {channel}: max_batch must be >= 1")
+        super().__init__(channel, callback, queue_size=queue_size, overflow=overflow, decoded=True, logger=logger)
+        self.decoder = decoder
+        self.max_batch = max_batch
+        self.max_wait_ms = max_wait_ms
+        self.batch_size = Histogram(BATCH_SIZE_BUCKETS)
+        self.batch_wait_ms = Histogram(LATENCY_MS_BUCKETS)
+        # 正在攒的批次及对应的原始消息，停止时由 stop() 处理
+        self._pending: List[Any] = []
+        self._pending_raw: List[Dict[str, Any]] = []
+        self._pending_since: Optional[float] = None
+        # 处理任务空闲（队列为空、没有攒下或处理中的批次）时置位，stop() 据此判断是否已处理完
+        self._idle: Optional[asyncio.Event] = None
+        self._closing = False
+
+    def start(self) -> None:
+        if self._idle is None:
+            self._idle = asyncio.Event()
+        super().start()
+
+    async def _worker(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            self._idle.set()
+            raw_message = await self.queue.get()
+            self._idle.clear()
+            self.queue.task_done()
+            self._pending_since = loop.time()
+            await self._append(raw_message)
+            deadline = self._pending_since + self.max_wait_ms / 1000
+
+            while len(self._pending) < self.max_batch:
+                if self.queue.empty():
+                    if self._closing:
+                        break
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        raw_message = await asyncio.wait_for(self.queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                else:
+                    raw_message = self.queue.get_nowait()
+                self.queue.task_done()
+                await self._append(raw_message)
+
+            await self._flush()
+
+    async def _append(self, raw_message: Dict[str, Any]) -> None:
+        try:
+            self._pending.append(await self.decoder(raw_message))
+            self._pending_raw.append(raw_message)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.stats.errors += 1
+            self.stats.decode_errors += 1
+            self.logger.error(f"Error decoding message on {self.channel}: {e}")
+            # 无法解码的消息重试也不会成功，按已处理确认
+            if self.ack is not None:
+                self.ack(raw_message, True)
+
+    async def _flush(self) -> None:
+        batch, self._pending = self._pending, []
+        raw_messages, self._pending_raw = self._pending_raw, []
+        since, self._pending_since = self._pending_since, None
+        if not batch:
+            return
+        self.batch_size.observe(len(batch))
+        if since is not None:
+            self.batch_wait_ms.observe((asyncio.get_running_loop().time() - since) * 1000)
+        try:
+            success = await self._handle(batch, count=len(batch))
+        except asyncio.CancelledError:
+            # 停止时超过 drain_timeout 仍在处理的批次
+            self.stats.discarded += len(batch)
+            raise
+        if self.ack is not None:
+            for raw_message in raw_messages:
+                self.ack(raw_message, success)
+
+    async def stop(self, drain_timeout: Optional[float] = DEFAULT_DRAIN_TIMEOUT) -> None:
+        """停止处理任务
+
+        处理任务不再等待批次凑满，先处理完进行中的批次、已攒下的不完整批次和队列中的消息（最多 drain_timeout 秒），
+        再取消处理任务；超时后被中断的批次、攒下的和仍在队列中的消息计入 stats.discarded。
+        """
+        self._closing = True
+        if self.queue is not None and self._tasks and drain_timeout:
+            try:
+                await asyncio.wait_for(self._drain(), drain_timeout)
+            except asyncio.TimeoutError:
+                self.logger.warning(
+                    f"Subscription {self.channel} did not drain within {drain_timeout}s, "
+                    f"discarding {self.queue.qsize() + len(self._pending)} queued messages"
+                )
+        await self._cancel_workers()
+        self._closing = False
+        self.stats.discarded += len(self._pending)
+        self._pending, self._pending_raw, self._pending_since = [], [], None
+        if self.queue is not None:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+                self.queue.task_done()
+                self.stats.discarded += 1
+
+    async def _drain(self) -> None:
+        await self.queue.join()
+        await self._idle.wait()
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = super().get_stats()
+        stats.update({
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait_ms,
+            "pending": len(self._pending),
+            "batch_size": self.batch_size.as_dict(),
+            "batch_wait_ms": self.batch_wait_ms.as_dict(),
+        })
+        return stats
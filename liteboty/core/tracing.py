@@ -0,0 +1,142 @@
+"""
+端到端延迟追踪
+
+开启 TRACING 后，服务发布的每条消息在信封中带有 trace ID、经过的发布环节列表和微秒级发布时间戳，
+订阅方在处理前后记录三类直方图（按频道）：
+
+- latency_ms: 发布到处理函数开始执行的延迟（跨主机时依赖时钟同步）
+- queue_wait_ms: 消息到达本进程到处理函数开始执行的排队时间
+- handler_ms: 处理函数的执行时间
+
+处理函数中发布的新消息自动沿用正在处理的消息的 trace ID 与环节列表，多级流水线的每一级都会追加一个环节，
+通过 parse_hops 可以看出每一级的耗时。
+"""
+import time
+import uuid
+
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Tuple
+
+from .message import Message, TRACE_ATTRIBUTE, HOPS_ATTRIBUTE, SENT_AT_ATTRIBUTE
+from .metrics import Histogram, LATENCY_MS_BUCKETS
+
+DEFAULT_MAX_HOPS = 16
+
+# 正在处理的消息的 (trace ID, 环节列表)，处理函数中发布的消息从这里继承
+_current_trace: ContextVar[Optional[Tuple[str, str]]] = ContextVar("liteboty_trace", default=None)
+
+
+def now_us() -> int:
+    """微秒级墙上时钟，用于跨进程比较"""
+    return time.time_ns() // 1000
+
+
+def current_trace_id() -> Optional[str]:
+    """当前处理中的消息的 trace ID，不在处理函数中时为 None"""
+    trace = _current_trace.get()
+    return trace[0] if trace else None
+
+
+def parse_hops(message: Message) -> List[Tuple[str, str, int]]:
+    """消息经过的发布环节列表 [(服务名, 频道, 发布时间微秒), ...]"""
+    hops = message.envelope.get(HOPS_ATTRIBUTE)
+    result = []
+    for entry in hops.split(",") if hops else ():
+        service, rest = entry.split("@", 1)
+        channel, _, sent_us = rest.rpartition("@")
+        result.append((service, channel, int(sent_us)))
+    return result
+
+
+class ChannelTrace:
+    """一个频道的追踪直方图"""
+
+    def __init__(self):
+        self.latency_ms = Histogram(LATENCY_MS_BUCKETS)
+        self.queue_wait_ms = Histogram(LATENCY_MS_BUCKETS)
+        self.handler_ms = Histogram(LATENCY_MS_BUCKETS)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "latency_ms": self.latency_ms.as_dict(),
+            "queue_wait_ms": self.queue_wait_ms.as_dict(),
+            "handler_ms": self.handler_ms.as_dict(),
+        }
+
+
+class Tracer:
+    """服务的追踪器
+
+    Args:
+        service_name: 写入环节列表的服务名
+        max_hops: 环节列表最多保留的条数（保留最近的）
+    """
+
+    def __init__(self, service_name: str, max_hops: int = DEFAULT_MAX_HOPS):
+        self.service_name = service_name
+        self.max_hops = max_hops
+        self.channels: Dict[str, ChannelTrace] = {}
+        self.published = 0
+
+    def channel(self, channel: str) -> ChannelTrace:
+        trace = self.channels.get(channel)
+        if trace is None:
+            trace = self.channels[channel] = ChannelTrace()
+        return trace
+
+    def stamp(self, message: Message, channel: str) -> Message:
+        """发布前调用，返回带有追踪字段的浅拷贝（不修改调用方的 Message，它可能正被其他本地订阅方读取）"""
+        envelope = dict(message.envelope)
+        trace_id = envelope.get(TRACE_ATTRIBUTE)
+        hops = envelope.get(HOPS_ATTRIBUTE)
+        if trace_id is None:
+            inherited = _current_trace.get()
+            if inherited is not None:
+                trace_id, hops = inherited
+            else:
+                trace_id, hops = uuid.uuid4().hex[:16], None
+        sent_us = now_us()
+        hop = f"{self.service_name}@{channel}@{sent_us}"
+        if hops:
+            entries = hops.split(",")
+            entries.append(hop)
+            hop = ",".join(entries[-self.max_hops:])
+        envelope[TRACE_ATTRIBUTE] = trace_id
+        envelope[HOPS_ATTRIBUTE] = hop
+        envelope[SENT_AT_ATTRIBUTE] = str(sent_us)
+        self.published += 1
+        return Message(message.data, message.msg_type, message.metadata, codec=message.codec, envelope=envelope)
+
+    def arrived(self, channel: str, message: Optional[Message], received_at: Optional[float]) -> ChannelTrace:
+        """消息即将被处理时调用，记录发布到处理的延迟与排队时间"""
+        trace = self.channel(channel)
+        if received_at is not None:
+            trace.queue_wait_ms.observe((time.perf_counter() - received_at) * 1000)
+        if message is not None:
+            sent_us = message.envelope.get(SENT_AT_ATTRIBUTE)
+            if sent_us is not None:
+                trace.latency_ms.observe(max(now_us() - int(sent_us), 0) / 1000)
+        return trace
+
+    def begin(self, channel: str, message: Optional[Message], received_at: Optional[float]):
+        """处理函数开始前调用：记录延迟与排队时间，并设置处理中的 trace 上下文，返回 end 所需的状态"""
+        trace = self.arrived(channel, message, received_at)
+        token = None
+        if message is not None:
+            trace_id = message.envelope.get(TRACE_ATTRIBUTE)
+            if trace_id is not None:
+                token = _current_trace.set((trace_id, message.envelope.get(HOPS_ATTRIBUTE)))
+        return trace, time.perf_counter(), token
+
+    @staticmethod
+    def end(state) -> None:
+        trace, started, token = state
+        trace.handler_ms.observe((time.perf_counter() - started) * 1000)
+        if token is not None:
+            _current_trace.reset(token)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "published": self.published,
+            "channels": {channel: trace.as_dict() for channel, trace in self.channels.items()},
+        }
@@ -1,30 +1,64 @@
 import asyncio
 
+from typing import Optional, Union
+
+from .scheduler import (
+    OverrunPolicy, DEFAULT_OVERRUN_POLICY, TimerScheduler, TimerStats, get_timer_scheduler
+)
+
 
 class TimerLoop:
-    def __init__(self,  name, interval, callback, count=None):
+    """定时器：按 interval 秒的固定节拍执行 callback，由所在事件循环的 TimerScheduler 统一调度
+
+    Args:
+        count: 执行次数，None 表示不限
+        policy: 回调耗时超过间隔时的处理方式，见 OverrunPolicy
+        jitter: 每次截止时间额外增加 [0, jitter) 秒的随机延迟，用于错开大量同周期的定时器（如心跳）
+    """
+
+    def __init__(self, name, interval, callback, count=None,
+                 policy: Union[str, OverrunPolicy] = DEFAULT_OVERRUN_POLICY, jitter: float = 0.0):
         self.interval = interval
         self.callback = callback
         self.name = name
         self.count = count
+        self.policy = OverrunPolicy(policy)
+        self.jitter = jitter
+        self.stats = TimerStats()
+        self._scheduler: Optional[TimerScheduler] = None
+        self._entry = 0  # 堆中有效条目的序号
+        self._grid = 0.0  # 当前节拍的截止时间（不含 jitter）
+        self._task: Optional[asyncio.Task] = None  # 正在执行的回调
+        self._done: Optional[asyncio.Future] = None
 
     def __str__(self):
         return f"TimerLoop({self.name}, {self.interval})"
 
+    @property
+    def runs(self) -> int:
+        return self.stats.runs
+
+    @property
+    def overruns(self) -> int:
+        return self.stats.overruns
+
+    def start(self) -> None:
+        get_timer_scheduler().add(self)
+
     async def run(self):
-        run_count = 0
-        while self.count is None or run_count < self.count:
-            start_time = asyncio.get_event_loop().time()
-            await self.callback()
-            end_time = asyncio.get_event_loop().time()
-            elapsed_time = end_time - start_time
-            await asyncio.sleep(max(0, self.interval - elapsed_time))
-
-            if self.count is not None:
-                run_count += 1
-
-    def stop(self):
-        self.count = -1
+        """开始调度并等待定时器结束（执行完 count 次或被 stop）"""
+        self.start()
+        try:
+            await asyncio.shield(self._done)
+        except asyncio.CancelledError:
+            self.stop()
+            raise
+
+    def stop(self) -> Optional[asyncio.Task]:
+        """停止定时器，返回被取消的正在执行的回调任务"""
+        if self._scheduler is None:
+            return None
+        return self._scheduler.remove(self)
 
 
 def get_service_name_from_path(service_path: str) -> str:
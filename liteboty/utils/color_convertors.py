@@ -0,0 +1,168 @@
+"""
+YUV 帧的零拷贝视图与颜色空间转换
+
+- *_view 系列函数直接在输入缓冲区上构造 NumPy 视图，不拷贝数据；输入为 bytes 时视图只读。
+- convert_yuv 通过 cv2.cvtColor 转换到 BGR / RGB / GRAY，可以传入 dst 让结果写入调用方预先分配的数组。
+- FrameBufferPool 按形状复用输出数组，避免多路相机逐帧分配内存。
+"""
+import threading
+
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+_CONVERSION_CODES = {
+    ("nv12", "bgr"): cv2.COLOR_YUV2BGR_NV12,
+    ("nv12", "rgb"): cv2.COLOR_YUV2RGB_NV12,
+    ("nv12", "gray"): cv2.COLOR_YUV2GRAY_NV12,
+    ("nv21", "bgr"): cv2.COLOR_YUV2BGR_NV21,
+    ("nv21", "rgb"): cv2.COLOR_YUV2RGB_NV21,
+    ("nv21", "gray"): cv2.COLOR_YUV2GRAY_NV21,
+    ("i420", "bgr"): cv2.COLOR_YUV2BGR_I420,
+    ("i420", "rgb"): cv2.COLOR_YUV2RGB_I420,
+    ("i420", "gray"): cv2.COLOR_YUV2GRAY_I420,
+    ("yuyv", "bgr"): cv2.COLOR_YUV2BGR_YUYV,
+    ("yuyv", "rgb"): cv2.COLOR_YUV2RGB_YUYV,
+    ("yuyv", "gray"): cv2.COLOR_YUV2GRAY_YUYV,
+}
+
+
+def _frame_view(buffer, rows: int, width: int, stride: Optional[int], channels: int = 1) -> np.ndarray:
+    """在 buffer 上构造 (rows, width[, channels]) 的 uint8 视图，stride 为每行字节数（含对齐填充）"""
+    row_bytes = width * channels
+    stride = stride or row_bytes
+    frame = np.frombuffer(buffer, dtype=np.uint8, count=rows * stride).reshape(rows, stride)
+    if stride != row_bytes:
+        frame = frame[:, :row_bytes]
+    if channels > 1:
+        frame = frame.reshape(rows, width, channels)
+    return frame
+
+
+def nv12_view(buffer, width: int, height: int, stride: Optional[int] = None) -> np.ndarray:
+    """NV12 / NV21 帧视图，形状 (height * 3 / 2, width)：Y 平面后接交错的 UV 平面"""
+    return _frame_view(buffer, height + height // 2, width, stride)
+
+
+def nv12_planes(buffer, width: int, height: int, stride: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """NV12 / NV21 的 Y 平面 (height, width) 与 UV 平面 (height / 2, width / 2, 2) 视图"""
+    frame = nv12_view(buffer, width, height, stride)
+    return frame[:height], frame[height:].reshape(height // 2, width // 2, 2)
+
+
+def i420_view(buffer, width: int, height: int) -> np.ndarray:
+    """I420 (YUV420p) 帧视图，形状 (height * 3 / 2, width)：Y、U、V 三个平面依次存储"""
+    return _frame_view(buffer, height + height // 2, width, None)
+
+
+def i420_planes(buffer, width: int, height: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """I420 的 Y (height, width)、U、V (height / 2, width / 2) 平面视图"""
+    y_size = width * height
+    uv_size = y_size // 4
+    flat = np.frombuffer(buffer, dtype=np.uint8, count=y_size + 2 * uv_size)
+    y = flat[:y_size].reshape(height, width)
+    u = flat[y_size:y_size + uv_size].reshape(height // 2, width // 2)
+    v = flat[y_size + uv_size:].reshape(height // 2, width // 2)
+    return y, u, v
+
+
+def yuyv_view(buffer, width: int, height: int, stride: Optional[int] = None) -> np.ndarray:
+    """YUYV (YUY2) 帧视图，形状 (height, width, 2)"""
+    return _frame_view(buffer, height, width, stride, channels=2)
+
+
+def yuv_view(buffer, fmt: str, width: int, height: int, stride: Optional[int] = None) -> np.ndarray:
+    """按格式名 (nv12 / nv21 / i420 / yuyv) 构造帧视图"""
+    if fmt in ("nv12", "nv21"):
+        return nv12_view(buffer, width, height, stride)
+    if fmt == "i420":
+        if stride not in (None, width):
+            raise ValueError("i420 does not support row stride")
+        return i420_view(buffer, width, height)
+    if fmt == "yuyv":
+        return yuyv_view(buffer, width, height, stride)
+    raise ValueError(f"Unsupported YUV format: {fmt}")
+
+
+def output_shape(width: int, height: int, to: str = "bgr") -> Tuple[int, ...]:
+    """颜色转换结果的形状，可用于预先分配 dst"""
+    return (height, width) if to == "gray" else (height, width, 3)
+
+
+def convert_yuv(buffer, fmt: str, width: int, height: int, to: str = "bgr",
+                dst: Optional[np.ndarray] = None, stride: Optional[int] = None) -> np.ndarray:
+    """将 YUV 帧转换为 BGR / RGB / GRAY
+
+    Args:
+        buffer: 帧数据（bytes / bytearray / memoryview / np.ndarray），不会被拷贝
+        fmt: nv12 / nv21 / i420 / yuyv
+        width: 帧宽度
+        height: 帧高度
+        to: bgr / rgb / gray
+        dst: 预先分配的输出数组，形状见 output_shape，dtype 为 uint8；为 None 时新建
+        stride: 每行字节数（硬件解码器常见的行对齐），None 表示无填充
+    """
+    try:
+        code = _CONVERSION_CODES[(fmt, to)]
+    except KeyError:
+        raise ValueError(f"Unsupported conversion: {fmt} -> {to}") from None
+
+    src = yuv_view(buffer, fmt, width, height, stride)
+    if dst is None:
+        return cv2.cvtColor(src, code)
+    if dst.shape != output_shape(width, height, to) or dst.dtype != np.uint8:
+        raise ValueError(f"dst must be uint8 with shape {output_shape(width, height, to)}, got {dst.dtype} {dst.shape}")
+    result = cv2.cvtColor(src, code, dst=dst)
+    if result is not dst:
+        # dst 不是 C 连续时 OpenCV 会返回新数组
+        np.copyto(dst, result)
+    return dst
+
+
+class FrameBufferPool:
+    """按 (shape, dtype) 复用的输出缓冲池
+
+    Example:
+        pool = FrameBufferPool()
+        with pool.borrow(output_shape(1920, 1080)) as bgr:
+            convert_yuv(frame_bytes, "nv12", 1920, 1080, dst=bgr)
+            ...
+
+        # 需要把结果交给其他协程时，手动 acquire / release
+        bgr = pool.acquire(output_shape(1920, 1080))
+        pool.release(bgr)
+    """
+
+    def __init__(self, max_per_shape: int = 4):
+        self.max_per_shape = max_per_shape
+        self._free: Dict[Tuple[Tuple[int, ...], str], List[np.ndarray]] = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, shape: Tuple[int, ...], dtype=np.uint8) -> np.ndarray:
+        key = (tuple(shape), np.dtype(dtype).str)
+        with self._lock:
+            free = self._free.get(key)
+            if free:
+                return free.pop()
+        return np.empty(shape, dtype=dtype)
+
+    def release(self, array: np.ndarray) -> None:
+        key = (array.shape, array.dtype.str)
+        with self._lock:
+            free = self._free.setdefault(key, [])
+            if len(free) < self.max_per_shape:
+                free.append(array)
+
+    @contextmanager
+    def borrow(self, shape: Tuple[int, ...], dtype=np.uint8):
+        array = self.acquire(shape, dtype)
+        try:
+            yield array
+        finally:
+            self.release(array)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._free.clear()
@@ -1,49 +1,153 @@
 import base64
+import struct
+import asyncio
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Sequence
 
 import cv2
 import numpy as np
 
+from .color_convertors import nv12_view
+
+# raw 格式: magic(4) + height(4) + width(4) + channels(4) + dtype_len(1) + dtype，随后为像素数据
+RAW_IMAGE_MAGIC = b"LBRI"
+_RAW_HEADER = struct.Struct("<4sIIIB")
+
+IMAGE_CODECS = ("png", "jpeg", "webp", "raw")
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
 
-def bytes_to_cv_image(byte_image):
-    """将二进制图像转换成 CV 可读图像"""
+
+def bytes_to_cv_image(byte_image, flags=cv2.IMREAD_COLOR):
+    """将二进制图像转换成 CV 可读图像，支持 png/jpeg/webp 等压缩格式和 raw 格式"""
+    if memoryview(byte_image)[:4].tobytes() == RAW_IMAGE_MAGIC:
+        return _decode_raw(byte_image)
 
     # 将二进制数据解码为 NumPy 数组
     nparr = np.frombuffer(byte_image, np.uint8)
 
     # 解码为 OpenCV 图像格式
-    image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+    image = cv2.imdecode(nparr, flags)
     return image
 
 
-def ndarray_to_bytes(ndarray_image):
-    _, buffer = cv2.imencode('.png', ndarray_image)
+def ndarray_to_bytes(ndarray_image, codec="png", quality=None, compression=None):
+    """将图像编码为二进制
+
+    Args:
+        ndarray_image: OpenCV 图像
+        codec: png / jpeg / webp / raw，raw 不压缩，只附加 shape 与 dtype 头
+        quality: jpeg (0-100) / webp (1-100) 的编码质量，None 使用 OpenCV 默认值
+        compression: png 压缩级别 (0-9)，None 使用 OpenCV 默认值
+    """
+    if codec == "raw":
+        return _encode_raw(ndarray_image)
+
+    if codec == "png":
+        params = [] if compression is None else [cv2.IMWRITE_PNG_COMPRESSION, int(compression)]
+    elif codec == "jpeg":
+        params = [] if quality is None else [cv2.IMWRITE_JPEG_QUALITY, int(quality)]
+    elif codec == "webp":
+        params = [] if quality is None else [cv2.IMWRITE_WEBP_QUALITY, int(quality)]
+    else:
+        raise ValueError(f"Unsupported image codec: {codec}, expected one of {IMAGE_CODECS}")
+
+    ok, buffer = cv2.imencode(f".{codec}", ndarray_image, params)
+    if not ok:
+        raise ValueError(f"Failed to encode image as {codec}")
     bin_image = buffer.tobytes()
     return bin_image
 
 
-def bytes_to_base64(byte_image):
-    return base64.b64encode(byte_image).decode('utf-8')
+def _encode_raw(image):
+    image = np.ascontiguousarray(image)
+    height, width = image.shape[:2]
+    channels = image.shape[2] if image.ndim == 3 else 0
+    dtype = image.dtype.str.encode("ascii")
+    header = _RAW_HEADER.pack(RAW_IMAGE_MAGIC, height, width, channels, len(dtype)) + dtype
+    return b"".join((header, image.reshape(-1).view(np.uint8)))
 
 
-def base64_to_bytes(base64_image):
-    return base64.b64decode(base64_image.encode('utf-8'))
+def _decode_raw(byte_image):
+    """raw 格式解码为只读视图，不拷贝像素数据"""
+    _, height, width, channels, dtype_len = _RAW_HEADER.unpack_from(byte_image)
+    offset = _RAW_HEADER.size + dtype_len
+    dtype = np.dtype(bytes(byte_image[_RAW_HEADER.size:offset]).decode("ascii"))
+    shape = (height, width, channels) if channels else (height, width)
+    image = np.frombuffer(byte_image, dtype=dtype, offset=offset).reshape(shape)
+    image.flags.writeable = False
+    return image
+
+
+def get_image_executor() -> ThreadPoolExecutor:
+    """图像编解码线程池，cv2.imencode / cv2.imdecode 执行时释放 GIL，可以真正并行"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=min(4, cv2.getNumberOfCPUs()),
+                                           thread_name_prefix="liteboty_image")
+        return _executor
+
+
+def set_image_executor_workers(max_workers: int) -> None:
+    """调整图像编解码线程池大小，已提交的任务会在旧线程池中执行完"""
+    global _executor
+    with _executor_lock:
+        old, _executor = _executor, ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="liteboty_image")
+    if old is not None:
+        old.shutdown(wait=False)
+
 
+async def ndarray_to_bytes_async(ndarray_image, codec="png", quality=None, compression=None):
+    """在线程池中编码图像，避免阻塞事件循环"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        get_image_executor(), ndarray_to_bytes, ndarray_image, codec, quality, compression
+    )
 
-def nv12_bytes_to_nv12(nv12_data_bytes, width, height):
-    # NV12 格式: Y平面 + UV平面 (交错存储)
-    # Y平面大小: width * height
-    # UV平面大小: width * height / 2
 
-    y_size = width * height
+async def bytes_to_cv_image_async(byte_image, flags=cv2.IMREAD_COLOR):
+    """在线程池中解码图像，避免阻塞事件循环"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_image_executor(), bytes_to_cv_image, byte_image, flags)
 
-    # 从字节流中提取 Y 和 UV 平面
-    y_plane = np.frombuffer(nv12_data_bytes[:y_size], dtype=np.uint8).reshape((height, width))
-    uv_plane = np.frombuffer(nv12_data_bytes[y_size:], dtype=np.uint8).reshape((height // 2, width // 2, 2))
 
-    # 合并 Y 和 UV 平面
-    # 这里将 UV 平面和 Y 平面合并成一个单一的 NV12 格式图像
-    nv12_image = np.empty((height + height // 2, width), dtype=np.uint8)
-    nv12_image[:height, :] = y_plane
-    nv12_image[height:, :] = uv_plane.reshape((-1, width))
+def ndarrays_to_bytes(images: Sequence[np.ndarray], codec="png", quality=None, compression=None) -> List[bytes]:
+    """批量编码图像，在线程池中并行执行"""
+    executor = get_image_executor()
+    futures = [executor.submit(ndarray_to_bytes, image, codec, quality, compression) for image in images]
+    return [future.result() for future in futures]
+
+
+def bytes_to_cv_images(byte_images: Sequence[bytes], flags=cv2.IMREAD_COLOR) -> List[np.ndarray]:
+    """批量解码图像，在线程池中并行执行"""
+    executor = get_image_executor()
+    futures = [executor.submit(bytes_to_cv_image, byte_image, flags) for byte_image in byte_images]
+    return [future.result() for future in futures]
+
+
+async def ndarrays_to_bytes_async(images: Sequence[np.ndarray], codec="png", quality=None, compression=None):
+    return await asyncio.gather(*(ndarray_to_bytes_async(image, codec, quality, compression) for image in images))
+
+
+async def bytes_to_cv_images_async(byte_images: Sequence[bytes], flags=cv2.IMREAD_COLOR):
+    return await asyncio.gather(*(bytes_to_cv_image_async(byte_image, flags) for byte_image in byte_images))
+
+
+def bytes_to_base64(byte_image):
+    return base64.b64encode(byte_image).decode('utf-8')
+
+
+def base64_to_bytes(base64_image):
+    return base64.b64decode(base64_image.encode('utf-8'))
+
 
-    return nv12_image
+def nv12_bytes_to_nv12(nv12_data_bytes, width, height, copy=True):
+    # NV12 格式: Y平面 (width * height) 后接交错存储的 UV平面 (width * height / 2)，
+    # 在内存中本就是连续的 (height * 3 / 2, width) 数组，一次拷贝即可，不再逐平面拷贝。
+    # 默认返回可写的拷贝；copy=False 时返回共享输入缓冲区的视图（输入为 bytes 时只读）
+    image = nv12_view(nv12_data_bytes, width, height)
+    return image.copy() if copy else image
@@ -0,0 +1,18 @@
+import pytest
+
+
+@pytest.fixture
+def fake_server():
+    """进程内的 Redis 替身（fakeredis），同一个 server 上的客户端共享数据"""
+    fakeredis = pytest.importorskip("fakeredis")
+    return fakeredis.FakeServer()
+
+
+@pytest.fixture
+def make_redis(fake_server):
+    from fakeredis import aioredis
+
+    def factory():
+        return aioredis.FakeRedis(server=fake_server)
+
+    return factory
@@ -0,0 +1,55 @@
+import asyncio
+import time
+
+from liteboty.core.cluster import NodeRegistry, NODE_INDEX_KEY, cluster_view
+from liteboty.core.heartbeat import HEARTBEAT_INDEX_KEY, live_services, read_heartbeats, write_heartbeats
+
+
+def _payload(name):
+    return {"name": name, "status": "running", "timestamp": time.time()}
+
+
+class _Service:
+    def __init__(self, name):
+        self.name = name
+        self._start_time = time.time()
+
+
+def test_short_ttl_writer_keeps_entries_of_longer_ttl_writers(make_redis):
+    async def main():
+        redis_client = make_redis()
+        await write_heartbeats(redis_client, [_payload("slow")], ttl=600)
+        await write_heartbeats(redis_client, [_payload("fast")], ttl=2)
+        # 已过期的条目会在下一次写入时清除
+        await redis_client.zadd(HEARTBEAT_INDEX_KEY, {"gone": time.time() - 1})
+        await write_heartbeats(redis_client, [_payload("fast")], ttl=2)
+        index = await redis_client.zrange(HEARTBEAT_INDEX_KEY, 0, -1)
+        alive = await live_services(redis_client)
+        details = await read_heartbeats(redis_client, [name for name, _ in alive])
+        return index, alive, details
+
+    index, alive, details = asyncio.run(main())
+    assert sorted(index) == [b"fast", b"slow"]
+    assert [name for name, _ in alive] == ["fast", "slow"]
+    assert all(expires_at > time.time() for _, expires_at in alive)
+    assert details["slow"]["status"] == "running"
+
+
+def test_node_index_is_pruned_by_each_node_expiry(make_redis, monkeypatch):
+    async def main():
+        redis_client = make_redis()
+        long_lived = NodeRegistry(redis_client, "edge-01", ttl=600)
+        short_lived = NodeRegistry(redis_client, "edge-02", ttl=30)
+        # edge-01 在 100 秒前刷新，仍在自己的 600 秒 TTL 内
+        now = time.time()
+        monkeypatch.setattr(time, "time", lambda: now - 100)
+        await long_lived.set_service(_Service("camera"))
+        monkeypatch.undo()
+        await short_lived.set_service(_Service("detector"))
+        await short_lived.refresh()
+        return await redis_client.zrange(NODE_INDEX_KEY, 0, -1), await cluster_view(redis_client)
+
+    index, view = asyncio.run(main())
+    assert sorted(index) == [b"edge-01", b"edge-02"]
+    assert set(view["edge-01"]) == {"camera"}
+    assert set(view["edge-02"]) == {"detector"}
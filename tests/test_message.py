@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+
+from liteboty.core.exceptions import CodecError
+from liteboty.core.message import LazyMessage, Message, MessageType
+
+
+def _round_trip(data, msg_type=MessageType.NUMPY, metadata=None):
+    return Message.decode(Message.encode(Message(data, msg_type, metadata)))
+
+
+@pytest.mark.parametrize("array", [
+    np.array(3.5),
+    np.arange(12, dtype=np.int16).reshape(3, 4),
+    np.arange(24, dtype=np.float32).reshape(2, 3, 4)[:, ::2, 1:],
+    np.zeros((0, 3), dtype=np.uint8),
+    np.array([1 + 2j, 3 - 4j]),
+    np.array(["2024-01-01", "2024-06-30"], dtype="datetime64[D]"),
+    np.arange(6, dtype=">i4"),
+])
+def test_numpy_round_trip_preserves_shape_and_dtype(array):
+    decoded = _round_trip(array).data
+    assert decoded.shape == array.shape
+    assert decoded.dtype == array.dtype
+    np.testing.assert_array_equal(decoded, array)
+
+
+def test_numpy_payload_is_aligned_read_only_view():
+    decoded = _round_trip(np.arange(1000, dtype=np.float64)).data
+    assert not decoded.flags.writeable
+    assert decoded.ctypes.data % 16 == 0
+
+
+@pytest.mark.parametrize("array", [
+    np.zeros(3, dtype=[("x", "<f4"), ("y", "<i8")]),
+    np.array([{"a": 1}, None], dtype=object),
+])
+def test_numpy_rejects_dtypes_the_frame_cannot_describe(array):
+    with pytest.raises(CodecError):
+        Message.encode(Message(array, MessageType.NUMPY))
+
+
+
+def test_decode_lazy_defers_payload_decoding():
+    encoded = Message.encode(Message({"values": [1, 2, 3]}, MessageType.JSON, {"camera": "front"}))
+    message = Message.decode_lazy(encoded)
+    assert isinstance(message, LazyMessage)
+    assert message.metadata["camera"] == "front"
+    assert not message.is_decoded
+    assert message.data == {"values": [1, 2, 3]}
+    assert message.is_decoded
+    assert message.payload is None
+
+
+
+def test_lazy_message_decodes_once():
+    message = Message.decode_lazy(Message.encode(Message({"a": [1]}, MessageType.JSON)))
+    assert message.data is message.data
+
+
+def test_lazy_numpy_message_is_a_view_of_the_received_buffer():
+    encoded = bytearray(Message.encode(Message(np.arange(8, dtype=np.int32), MessageType.NUMPY)))
+    message = Message.decode_lazy(encoded)
+    assert np.shares_memory(message.data, np.frombuffer(encoded, dtype=np.uint8))
+
+
+def test_encode_many_matches_single_encode():
+    messages = [
+        Message({"i": 1}, MessageType.JSON, {"k": "v"}),
+        Message(b"\x00\x01", MessageType.BINARY),
+        Message(np.arange(4), MessageType.NUMPY),
+    ]
+    encoded = Message.encode_many(messages)
+    for lazy in (False, True):
+        decoded = Message.decode_many(encoded, lazy=lazy)
+        assert decoded[0].data == {"i": 1}
+        assert decoded[0].metadata["k"] == "v"
+        assert bytes(decoded[1].data) == b"\x00\x01"
+        np.testing.assert_array_equal(decoded[2].data, np.arange(4))
@@ -0,0 +1,36 @@
+import asyncio
+
+from liteboty.core.message import Message, MessageType
+from liteboty.core.service import Service
+
+
+class _Service(Service):
+    async def run(self):
+        pass
+
+
+def test_publish_many_sends_every_message_in_order(make_redis):
+    async def main():
+        redis_client = make_redis()
+        pubsub = redis_client.pubsub()
+        await pubsub.subscribe("/a", "/b")
+        service = _Service("svc", {}, {"HEARTBEAT": {"enabled": False}}, need_redis=False)
+        service.redis_client = redis_client
+
+        await service.publish_many("/a", [Message({"i": i}, MessageType.JSON) for i in range(5)])
+        await service.publish_many([("/b", Message({"i": 5}, MessageType.JSON)),
+                                    ("/a", Message({"i": 6}, MessageType.JSON))])
+        received = []
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + 2
+        while len(received) < 7 and loop.time() < deadline:
+            # 订阅确认消息被忽略时也返回 None
+            message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=0.1)
+            if message is None:
+                continue
+            received.append((message["channel"].decode(), Message.decode(message["data"]).data["i"]))
+        await pubsub.aclose()
+        return received
+
+    received = asyncio.run(main())
+    assert received == [("/a", i) for i in range(5)] + [("/b", 5), ("/a", 6)]
@@ -0,0 +1,100 @@
+import asyncio
+
+from liteboty.core.message import Message, MessageType
+from liteboty.core.pubsub_hub import PubSubHub
+from liteboty.core.service import Service
+
+
+class _Service(Service):
+    async def run(self):
+        pass
+
+
+def _service(name, redis_client, hub):
+    service = _Service(name, {}, {"HEARTBEAT": {"enabled": False}}, need_redis=False)
+    service.use_shared_connections(redis_client, hub)
+    return service
+
+
+async def _wait_for(predicate, timeout=2.0):
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while not predicate() and loop.time() < deadline:
+        await asyncio.sleep(0.01)
+
+
+def test_decoded_subscriptions_get_their_own_message_copy(make_redis):
+    async def main():
+        redis_client = make_redis()
+        hub = PubSubHub(redis_client)
+        received = {}
+
+        def first(message):
+            message.metadata["touched"] = "yes"
+            received["first"] = message
+
+        def second(message):
+            received["second"] = message
+
+        services = [_service("first", redis_client, hub), _service("second", redis_client, hub)]
+        services[0].add_subscription("/c", first, decode=True)
+        services[1].add_subscription("/c", second, decode=True)
+        for service in services:
+            await service.start()
+        await services[0].publish("/c", {"value": [1, 2, 3]}, MessageType.JSON, {"k": "v"})
+        await _wait_for(lambda: len(received) == 2)
+        stats = hub.get_stats()
+        for service in services:
+            await service.stop()
+        await hub.close()
+        return received, stats
+
+    received, stats = asyncio.run(main())
+    first, second = received["first"], received["second"]
+    assert first is not second
+    assert "touched" not in second.metadata
+    assert second.metadata["k"] == "v"
+    # 载荷只解码一次，各副本共享解码结果
+    assert first.data is second.data
+    assert stats["shared_decodes"] == 1
+
+
+def test_reader_survives_dispatch_errors(make_redis):
+    async def main():
+        redis_client = make_redis()
+        hub = PubSubHub(redis_client)
+        received = []
+        service = _service("svc", redis_client, hub)
+        service.add_subscription("/c", lambda message: received.append(message.data), decode=True)
+        await service.start()
+
+        dispatch = hub._dispatch
+        failures = []
+
+        async def failing_dispatch(message):
+            if not failures:
+                failures.append(message)
+                raise RuntimeError("boom")
+            await dispatch(message)
+
+        hub._dispatch = failing_dispatch
+        await service.publish("/c", "lost", MessageType.JSON)
+        await _wait_for(lambda: failures)
+        await service.publish("/c", "kept", MessageType.JSON)
+        await _wait_for(lambda: received)
+        alive = not hub._task.done()
+        await service.stop()
+        await hub.close()
+        return received, alive
+
+    received, alive = asyncio.run(main())
+    assert received == ["kept"]
+    assert alive
+
+
+def test_lazy_message_shallow_copy_shares_decoded_payload():
+    lazy = Message.decode_lazy(Message.encode(Message({"a": 1}, MessageType.JSON, {"k": "v"})))
+    copy = lazy.shallow_copy()
+    copy.metadata["k"] = "changed"
+    assert lazy.metadata["k"] == "v"
+    assert copy.data is lazy.data
@@ -0,0 +1,35 @@
+import asyncio
+
+from liteboty.core.registry import ServiceRegistry
+from liteboty.core.service import Service
+
+
+class _Service(Service):
+    async def run(self):
+        pass
+
+
+def test_restart_rebuilds_components_from_new_config(make_redis):
+    async def main():
+        global_config = {"HEARTBEAT": {"enabled": False}}
+        service = _Service("svc", {}, global_config, need_redis=False)
+        service.redis_client = make_redis()
+        registry = ServiceRegistry()
+        registry.register(service)
+        await registry.start_service("svc")
+        before = service.publish_stats(), service.trace_stats()
+
+        await registry.restart_service(
+            "svc",
+            {"publish_batching": {"enabled": True, "max_batch": 8}},
+            {**global_config, "TRACING": {"enabled": True}},
+        )
+        after = service.publish_stats(), service.trace_stats(), service._publish_batcher.max_batch
+        await registry.stop_all()
+        return before, after
+
+    before, after = asyncio.run(main())
+    assert before == (None, None)
+    assert after[0] is not None
+    assert after[1] is not None
+    assert after[2] == 8
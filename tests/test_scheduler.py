@@ -0,0 +1,92 @@
+import asyncio
+
+from liteboty.core.utils import TimerLoop
+
+
+def _run_timer(interval, callback_duration, policy, duration, count=None):
+    async def main():
+        loop = asyncio.get_running_loop()
+        starts = []
+
+        async def callback():
+            starts.append(loop.time())
+            if callback_duration:
+                await asyncio.sleep(callback_duration)
+
+        timer = TimerLoop("t", interval, callback, count=count, policy=policy)
+        timer.start()
+        if count is not None:
+            await asyncio.wait_for(asyncio.shield(timer._done), duration)
+        else:
+            await asyncio.sleep(duration)
+        task = timer.stop()
+        if task is not None:
+            await asyncio.gather(task, return_exceptions=True)
+        return timer, starts
+
+    return asyncio.run(main())
+
+
+def test_zero_interval_timer_keeps_running():
+    timer, starts = _run_timer(0, 0, "coalesce", 1.0, count=5)
+    assert timer.runs == 5
+    assert timer.overruns == 0
+
+
+def test_zero_interval_timer_without_count_runs_repeatedly():
+    timer, _ = _run_timer(0, 0.001, "coalesce", 0.1)
+    assert timer.runs > 5
+
+
+def test_errors_do_not_stop_the_timer():
+    async def main():
+        runs = []
+
+        async def callback():
+            runs.append(1)
+            raise RuntimeError("boom")
+
+        timer = TimerLoop("t", 0.01, callback, count=3)
+        await asyncio.wait_for(timer.run(), 1.0)
+        return timer
+
+    timer = asyncio.run(main())
+    assert timer.runs == 3
+    assert timer.stats.errors == 3
+
+
+def test_skip_policy_drops_missed_periods():
+    # 回调耗时 2.5 个间隔，每次执行后跳过错过的节拍
+    timer, starts = _run_timer(0.04, 0.1, "skip", 0.45)
+    assert timer.stats.skipped >= 2 * (timer.runs - 1)
+    assert timer.runs <= 4
+
+
+def test_coalesce_policy_runs_once_after_an_overrun():
+    timer, starts = _run_timer(0.04, 0.1, "coalesce", 0.45)
+    # 错过的周期合并为一次立即执行：回调首尾相接
+    gaps = [b - a for a, b in zip(starts, starts[1:])]
+    assert all(gap < 0.13 for gap in gaps)
+    assert timer.stats.skipped > 0
+    assert timer.overruns >= 1
+
+
+def test_catch_up_policy_runs_every_missed_period():
+    async def main():
+        loop = asyncio.get_running_loop()
+        starts = []
+
+        async def callback():
+            starts.append(loop.time())
+            if len(starts) == 1:
+                await asyncio.sleep(0.1)
+
+        timer = TimerLoop("t", 0.03, callback, count=6, policy="catch_up")
+        await asyncio.wait_for(timer.run(), 2.0)
+        return timer, starts
+
+    timer, starts = asyncio.run(main())
+    assert timer.runs == 6
+    assert timer.stats.skipped == 0
+    # 第一次回调耗时 0.1 秒，之后的节拍 0.03 / 0.06 / 0.09 立即补执行
+    assert starts[3] - starts[1] < 0.03
@@ -0,0 +1,121 @@
+import asyncio
+
+from liteboty.core.message import Message, MessageType
+from liteboty.core.service import Service
+
+
+class _Service(Service):
+    async def run(self):
+        pass
+
+
+def _service(redis_client, name, **channel_options):
+    channel = {"transport": "stream", "group": "workers", "block_ms": 50, "claim_idle_ms": 300}
+    channel.update(channel_options)
+    service = _Service(name, {"channels": {"/jobs": channel}}, {"HEARTBEAT": {"enabled": False}}, need_redis=False)
+    service.redis_client = redis_client
+    return service
+
+
+async def _publish(redis_client, count):
+    publisher = _service(redis_client, "publisher")
+    await publisher.publish_many("/jobs", [Message({"i": i}, MessageType.JSON) for i in range(count)])
+
+
+def test_acks_registered_during_xack_are_sent(make_redis):
+    async def main():
+        redis_client = make_redis()
+        xack = redis_client.xack
+
+        async def slow_xack(*args):
+            await asyncio.sleep(0.05)
+            return await xack(*args)
+
+        redis_client.xack = slow_xack
+        handled = []
+
+        async def handler(message):
+            handled.append(message.data["i"])
+            await asyncio.sleep(0.01)
+
+        service = _service(redis_client, "worker")
+        service.add_subscription("/jobs", handler, decode=True)
+        await service.start()
+        await _publish(make_redis(), 3)
+        await asyncio.sleep(1.2)
+        pending = await redis_client.xpending("/jobs", "workers")
+        await service.stop()
+        return handled, pending["pending"]
+
+    handled, pending = asyncio.run(main())
+    assert handled == [0, 1, 2]
+    assert pending == 0
+
+
+def test_failed_messages_are_reclaimed_and_acked(make_redis):
+    async def main():
+        redis_client = make_redis()
+        handled, failed = [], set()
+
+        def handler(message):
+            i = message.data["i"]
+            if i == 1 and i not in failed:
+                failed.add(i)
+                raise RuntimeError("boom")
+            handled.append(i)
+
+        service = _service(redis_client, "worker")
+        service.add_subscription("/jobs", handler, decode=True)
+        await service.start()
+        await _publish(make_redis(), 3)
+        await asyncio.sleep(1.0)
+        stats = service.subscription_stats()["/jobs"]["stream"]
+        pending = await redis_client.xpending("/jobs", "workers")
+        await service.stop()
+        return handled, stats, pending["pending"]
+
+    handled, stats, pending = asyncio.run(main())
+    assert sorted(handled) == [0, 1, 2]
+    assert stats["reclaimed"] == 1
+    assert pending == 0
+
+
+def test_autoclaim_continues_past_pages_of_in_flight_entries(make_redis):
+    async def main():
+        redis_client = make_redis()
+        await redis_client.xgroup_create("/jobs", "workers", id="$", mkstream=True)
+        await _publish(redis_client, 6)
+        # 另一个消费者读取后退出，留下 6 条未确认的消息
+        await redis_client.xreadgroup("workers", "gone", {"/jobs": ">"})
+        await asyncio.sleep(0.35)
+
+        handled = []
+        service = _service(redis_client, "worker", count=2, consumer="worker")
+        service.add_subscription("/jobs", lambda message: handled.append(message.data["i"]), decode=True)
+        await service.start()
+        consumer = service._stream_consumers["/jobs"]
+        entries = await redis_client.xrange("/jobs")
+        # 第一页的条目正在本消费者处理中
+        consumer._in_flight.update(entry_id for entry_id, _ in entries[:2])
+        await asyncio.sleep(0.2)
+        await service.stop()
+        return sorted(handled)
+
+    assert asyncio.run(main()) == [2, 3, 4, 5]
+
+
+def test_default_consumer_names_are_unique_per_instance(make_redis):
+    async def main():
+        redis_client = make_redis()
+        first = _service(redis_client, "worker")
+        second = _service(redis_client, "worker")
+        for service in (first, second):
+            service.add_subscription("/jobs", lambda message: None, decode=True)
+            await service.start()
+        names = first._stream_consumers["/jobs"].consumer, second._stream_consumers["/jobs"].consumer
+        await first.stop()
+        await second.stop()
+        return names
+
+    first, second = asyncio.run(main())
+    assert first != second
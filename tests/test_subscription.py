@@ -0,0 +1,87 @@
+import asyncio
+
+from liteboty.core.subscription import BatchSubscription, Subscription
+
+
+async def _decode(raw_message):
+    return raw_message["data"]
+
+
+async def _fill(subscription, values):
+    for value in values:
+        await subscription.dispatch({"type": "message", "channel": b"/c", "data": value})
+
+
+def test_subscription_stop_drains_queue():
+    async def main():
+        handled = []
+
+        async def callback(raw_message):
+            await asyncio.sleep(0.01)
+            handled.append(raw_message["data"])
+
+        subscription = Subscription("/c", callback, concurrency=2)
+        subscription.start()
+        await _fill(subscription, [b"%d" % i for i in range(10)])
+        await subscription.stop(drain_timeout=5)
+        return handled, subscription.stats
+
+    handled, stats = asyncio.run(main())
+    assert len(handled) == 10
+    assert stats.discarded == 0
+
+
+def test_subscription_stop_counts_undrained_messages_as_discarded():
+    async def main():
+        async def callback(raw_message):
+            await asyncio.sleep(0.05)
+
+        subscription = Subscription("/c", callback)
+        subscription.start()
+        await _fill(subscription, [b"x"] * 10)
+        await subscription.stop(drain_timeout=0.12)
+        return subscription.stats
+
+    stats = asyncio.run(main())
+    assert stats.processed + stats.discarded + stats.in_flight <= 10
+    assert stats.processed >= 1
+    assert stats.discarded >= 7
+
+
+def test_batch_stop_flushes_in_progress_and_partial_batches():
+    async def main():
+        batches = []
+
+        async def callback(messages):
+            await asyncio.sleep(0.05)
+            batches.append(list(messages))
+
+        # 第一批处理中调用 stop，剩余 2 条不足一批，也不应等待 max_wait_ms
+        subscription = BatchSubscription("/c", callback, _decode, max_batch=4, max_wait_ms=10_000)
+        subscription.start()
+        await _fill(subscription, [b"%d" % i for i in range(6)])
+        await asyncio.sleep(0.01)
+        await asyncio.wait_for(subscription.stop(drain_timeout=2), 1)
+        return batches, subscription.stats
+
+    batches, stats = asyncio.run(main())
+    assert [len(batch) for batch in batches] == [4, 2]
+    assert stats.processed == 6
+    assert stats.discarded == 0
+
+
+def test_batch_stop_counts_interrupted_batch_as_discarded():
+    async def main():
+        async def callback(messages):
+            await asyncio.sleep(1)
+
+        subscription = BatchSubscription("/c", callback, _decode, max_batch=4, max_wait_ms=5)
+        subscription.start()
+        await _fill(subscription, [b"x"] * 6)
+        await asyncio.sleep(0.01)
+        await subscription.stop(drain_timeout=0.05)
+        return subscription.stats
+
+    stats = asyncio.run(main())
+    assert stats.processed == 0
+    assert stats.discarded == 6